@@ -0,0 +1,169 @@
+# Standard library imports
+from hashlib import sha256
+from typing import Iterable, Optional
+
+# Third-party library imports
+import py_ecc.optimized_bls12_381 as bls_opt
+from py_ecc.fields import optimized_bls12_381_FQ
+from py_ecc.optimized_bls12_381.constants import ISO_11_A, ISO_11_B, ISO_11_Z, ISO_11_MAP_COEFFICIENTS
+
+# Local imports
+from .glv import batch_invert, _double, _add_affine
+
+
+q: int = bls_opt.field_modulus  # The field modulus of the curve coordinates
+
+# The simplified SWU map to the 11-isogenous curve y^2 = x^3 + A' * x + B', and the isogeny map to G1,
+# with the constants of the hash-to-curve RFC for BLS12-381 G1
+SSWU_A: int = int(ISO_11_A)
+SSWU_B: int = int(ISO_11_B)
+SSWU_Z: int = int(ISO_11_Z)
+SQRT_MINUS_Z: int = pow(-SSWU_Z % q, (q + 1) // 4, q)
+ISO_MAP_COEFFICIENTS: tuple[tuple[int, ...], ...] = tuple(tuple(int(coefficient) for coefficient in polynomial)
+                                                          for polynomial in ISO_11_MAP_COEFFICIENTS)
+
+H_EFF: int = 0xd201000000010001  # The cofactor clearing scalar of G1, 1 - z
+
+# expand_message_xmd with SHA-256 for 2 field elements of 64 bytes: the hash state after the zero pad
+# block is shared by every message
+EXPAND_LENGTH: int = 128
+Z_PAD_STATE = sha256(b"\x00" * sha256().block_size)
+
+
+def _hash_to_field(message: bytes, dst_prime: bytes) -> tuple[int, int]:
+    """
+    Hash a message to 2 field elements with expand_message_xmd.
+    """
+    hash_state = Z_PAD_STATE.copy()
+    hash_state.update(message + EXPAND_LENGTH.to_bytes(2, 'big') + b"\x00" + dst_prime)
+    b_0: bytes = hash_state.digest()
+
+    b_i: bytes = sha256(b_0 + b"\x01" + dst_prime).digest()
+    pseudo_random_bytes: bytes = b_i
+    for i in range(2, EXPAND_LENGTH // len(b_0) + 1):
+        b_i = sha256(bytes(a ^ b for a, b in zip(b_0, b_i)) + bytes([i]) + dst_prime).digest()
+        pseudo_random_bytes += b_i
+
+    return int.from_bytes(pseudo_random_bytes[:64], 'big') % q, int.from_bytes(pseudo_random_bytes[64:], 'big') % q
+
+
+def _sswu(u: int) -> tuple[int, int, int]:
+    """
+    Map a field element to the isogenous curve with the simplified SWU map, as (x numerator, x denominator, y).
+
+    The square root of the ratio g(x) = num / den is computed with a single exponentiation, and the
+    division of x is left to the caller.
+    """
+    tv1: int = SSWU_Z * u * u % q
+    tv2: int = (tv1 * tv1 + tv1) % q
+    x_numerator: int = SSWU_B * (tv2 + 1) % q
+    x_denominator: int = SSWU_A * (-tv2 if tv2 else SSWU_Z) % q
+
+    # g(x) = (x_numerator^3 + A' * x_numerator * x_denominator^2 + B' * x_denominator^3) / x_denominator^3
+    x_denominator_squared: int = x_denominator * x_denominator % q
+    gx_denominator: int = x_denominator_squared * x_denominator % q
+    gx_numerator: int = (x_numerator * (x_numerator * x_numerator + SSWU_A * x_denominator_squared) +
+                         SSWU_B * gx_denominator) % q
+
+    # sqrt(num / den) = num * den^3 * (num * den^3)^((q - 3) / 4), times sqrt(-Z) when num / den is not a square
+    numerator_denominator: int = gx_numerator * gx_denominator % q
+    y: int = pow(numerator_denominator * gx_denominator * gx_denominator % q, (q - 3) // 4, q) * \
+        numerator_denominator % q
+    if y * y * gx_denominator % q != gx_numerator:
+        # g(x) is not a square, g(Z * u^2 * x) = (Z * u^2)^3 * g(x) is
+        y = tv1 * u * y * SQRT_MINUS_Z % q
+        x_numerator = tv1 * x_numerator % q
+
+    if u % 2 != y % 2:
+        y = -y % q
+
+    return x_numerator, x_denominator, y
+
+
+def _evaluate(polynomial: tuple[int, ...], x: int) -> int:
+    """
+    Evaluate a polynomial, from its constant coefficient, with Horner's rule.
+    """
+    value: int = polynomial[-1]
+    for coefficient in reversed(polynomial[:-1]):
+        value = (value * x + coefficient) % q
+
+    return value
+
+
+def hash_to_g1_batch(
+    messages: Iterable[bytes],
+    dst: bytes
+) -> list[tuple[optimized_bls12_381_FQ, optimized_bls12_381_FQ, optimized_bls12_381_FQ]]:
+    """
+    Hash messages to G1, the points of `bls_hash.hash_to_G1` with SHA-256, in bulk.
+
+    Every message is hashed to 2 field elements, mapped to the isogenous curve with the simplified
+    SWU map and to G1 with the 11-isogeny, and the sum of the 2 points is multiplied by the cofactor.
+    The field inversions of the SWU maps, the isogeny maps and the sums are done with a single
+    inversion for all the messages at each step, and the field arithmetic on plain integers. Only
+    the square root of each SWU map takes an exponentiation of its own.
+
+    :param messages: The messages to hash.
+    :param dst: The domain separation tag, of 255 bytes at most.
+    :return: The points in py_ecc's projective coordinates (x = X / Z, y = Y / Z), not normalized.
+    """
+    if len(dst) > 255:
+        raise ValueError("DST must be <= 255 bytes")
+    dst_prime: bytes = dst + bytes([len(dst)])
+
+    # The points of the isogenous curve, 2 per message, as x = x_numerator / x_denominator
+    sswu_points: list[tuple[int, int, int]] = [_sswu(u) for message in messages
+                                               for u in _hash_to_field(message, dst_prime)]
+    x_denominator_inverses: list[int] = batch_invert([x_denominator for _, x_denominator, _ in sswu_points])
+
+    # The isogeny map, x = x_num(x') / x_den(x'), y = y' * y_num(x') / y_den(x')
+    x_numerator_polynomial, x_denominator_polynomial, y_numerator_polynomial, y_denominator_polynomial = \
+        ISO_MAP_COEFFICIENTS
+    iso_numerators: list[tuple[int, int]] = []
+    iso_denominators: list[int] = []
+    for (x_numerator, _, y), x_denominator_inverse in zip(sswu_points, x_denominator_inverses):
+        x: int = x_numerator * x_denominator_inverse % q
+        iso_numerators.append((_evaluate(x_numerator_polynomial, x), y * _evaluate(y_numerator_polynomial, x) % q))
+        iso_denominators.append(_evaluate(x_denominator_polynomial, x))
+        iso_denominators.append(_evaluate(y_denominator_polynomial, x))
+    iso_denominator_inverses: list[int] = batch_invert(iso_denominators)
+
+    # A zero denominator maps to the identity, None
+    iso_points: list[Optional[tuple[int, int]]] = [
+        (x_numerator * x_inverse % q, y_numerator * y_inverse % q) if x_inverse and y_inverse else None
+        for (x_numerator, y_numerator), x_inverse, y_inverse in zip(iso_numerators, iso_denominator_inverses[0::2],
+                                                                    iso_denominator_inverses[1::2])
+    ]
+
+    # The sums of the 2 points in Jacobian coordinates, then normalized together for the cofactor clearing
+    sums: list[tuple[int, int, int]] = []
+    for point0, point1 in zip(iso_points[0::2], iso_points[1::2]):
+        if point0 is None:
+            point0, point1 = point1, point0
+        if point0 is None:
+            sums.append((1, 1, 0))
+        else:
+            sums.append((*point0, 1) if point1 is None else _add_affine((*point0, 1), *point1))
+    z_inverses: list[int] = batch_invert([z for _, _, z in sums])
+
+    hashes: list[tuple[optimized_bls12_381_FQ, optimized_bls12_381_FQ, optimized_bls12_381_FQ]] = []
+    for (x, y, _), z_inverse in zip(sums, z_inverses):
+        if not z_inverse:
+            hashes.append(bls_opt.Z1)
+            continue
+
+        # Clear the cofactor, H_EFF * (x, y), with double-and-add on the affine sum
+        z_inverse_squared: int = z_inverse * z_inverse % q
+        x, y = x * z_inverse_squared % q, y * z_inverse_squared * z_inverse % q
+        result: tuple[int, int, int] = (x, y, 1)
+        for bit in bin(H_EFF)[3:]:
+            result = _double(result)
+            if bit == "1":
+                result = _add_affine(result, x, y) if result[2] else (x, y, 1)
+
+        # Jacobian (X, Y, Z) is (X * Z, Y, Z^3) in projective coordinates, without an inversion
+        rx, ry, rz = result
+        hashes.append(bls_opt.Z1 if rz == 0 else (bls_opt.FQ(rx * rz), bls_opt.FQ(ry), bls_opt.FQ(rz * rz * rz)))
+
+    return hashes
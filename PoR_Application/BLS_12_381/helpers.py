@@ -1,13 +1,13 @@
 # Standard library imports
 import secrets
-from hashlib import sha256
+from functools import lru_cache
+from typing import Iterable
 
 # Third-party library imports
-import py_ecc.bls.hash_to_curve as bls_hash
-from py_ecc.bls.typing import G1Compressed, G2Compressed
-from py_ecc.fields import optimized_bls12_381_FQ
 import py_ecc.optimized_bls12_381 as bls_opt
-import py_ecc.bls.point_compression as bls_comp
+
+# Local imports
+from .curve_backend import curve, Point
 
 MAC_SIZE: int = 128
 MAC_SIZE_3D: int = 3 * MAC_SIZE    # 3d point authenticator tag
@@ -18,6 +18,10 @@ p: int = bls_opt.curve_order    # The curve order is 524358751751261904794477405
 HASH_INDEX_BYTES = 32
 DST = b"BLS_SIG_BLS12381G1_XMD:SHA-256_SSWU_RO_"
 
+# Multi-sector blocks: a block of s sectors shares one authenticator under the public points u_1..u_s
+SECTOR_SIZE: int = 31   # Bytes of a sector, 248 bits, so the integer of every sector is below p
+SECTOR_DST = b"POR_SECTOR_BLS12381G1_XMD:SHA-256_SSWU_RO_"
+
 
 def generate_x() -> int:
     """
@@ -37,7 +41,7 @@ def generate_g():
     :return: The resulting elliptic curve point g in the G2 group.
     """
     rand_value: int = secrets.randbelow(p)
-    g = bls_opt.multiply(bls_opt.G2, rand_value)
+    g = curve.multiply_g2(curve.g2_generator(), rand_value)
     return g
 
 
@@ -50,7 +54,7 @@ def generate_v(g, x: int):
     :param x: The private key (an integer) used for the multiplication.
     :return: The resulting elliptic curve point v in the G2 group.
     """
-    v = bls_opt.multiply(g, x)  # v = g^x in G2
+    v = curve.multiply_g2(g, x)  # v = g^x in G2
     return v
 
 
@@ -62,33 +66,150 @@ def generate_u():
     :return: The resulting elliptic curve point u in the G1 group.
     """
     rand_value: int = secrets.randbelow(p)
-    u = bls_opt.multiply(bls_opt.G1, rand_value)  # u in G1
+    u = curve.multiply_g1(curve.g1_generator(), rand_value)  # u in G1
     return u
 
 
-def curve_field_element_to_bytes(
-    point: tuple[optimized_bls12_381_FQ, optimized_bls12_381_FQ, optimized_bls12_381_FQ],
-    num_bytes: int
-) -> bytes:
+def curve_field_element_to_bytes(point: Point, num_bytes: int) -> bytes:
     """
     Convert a tuple representing a BLS 12_381 Curve point element on an elliptic curve to its byte representation.
 
     The curve satisfies the equation: y^2 = x^3 + 4.
 
-    :param point: A tuple containing three elements (x, y, z) representing a point on the elliptic curve.
+    :param point: A point on the elliptic curve, written as its projective coordinates (x, y, z).
     :param num_bytes: The desired length of the byte representation for each coordinate.
     :return: A concatenated byte representation of (x, y, z) in big-endian order.
     """
-    x_as_int: int = int(point[0])
-    y_as_int: int = int(point[1])
-    z_as_int: int = int(point[2])
+    return curve_field_elements_to_bytes([point], num_bytes)[0]
+
+
+def curve_field_elements_to_bytes(points: list[Point], num_bytes: int) -> list[bytes]:
+    """
+    Convert BLS 12_381 Curve points to their byte representations, as `curve_field_element_to_bytes` does.
+
+    The points are normalized to z = 1 with a single field inversion for all of them (Montgomery's
+    trick), so the projective coordinates written are the affine ones.
+
+    :param points: The points on the elliptic curve.
+    :param num_bytes: The desired length of the byte representation for each coordinate.
+    :return: The concatenated big-endian (x, y, z) coordinates of each point, z = 0 for the identity.
+    """
+    points_in_bytes: list[bytes] = []
+    for affine_point in curve.to_affine_batch(points):
+        x_as_int, y_as_int, z_as_int = (*affine_point, 1) if affine_point is not None else (1, 1, 0)
+
+        # Convert each integer to a byte array
+        points_in_bytes.append(
+            x_as_int.to_bytes(num_bytes, byteorder='big') +
+            y_as_int.to_bytes(num_bytes, byteorder='big') +
+            z_as_int.to_bytes(num_bytes, byteorder='big')
+        )
+
+    return points_in_bytes
+
+
+def hash_indices_to_G1(indices: Iterable[int]) -> list:
+    """
+    Compute H(i), the hash of a block index to a G1 point, for many block indices at once.
+
+    :param indices: The block indices, e.g. a range of them.
+    :return: The G1 points H(i), in the same order.
+    """
+    return curve.hash_to_g1_batch((index.to_bytes(HASH_INDEX_BYTES, byteorder='big') for index in indices), DST)
+
+
+def get_block_size(sectors: int) -> int:
+    """
+    Get the size of the blocks of a file tagged with s sectors per block.
+
+    A single sector is the whole block of BLOCK_SIZE bytes, reduced modulo p. With s > 1 sectors the
+    block is s sectors of SECTOR_SIZE bytes, each kept whole in Z_p.
+
+    :param sectors: The number of sectors s per block.
+    :return: The size of the blocks in bytes.
+    """
+    return BLOCK_SIZE if sectors == 1 else sectors * SECTOR_SIZE
+
+
+def block_to_sectors(block: bytes, sectors: int, p: int) -> list[int]:
+    """
+    Split a block to its sectors m_i1..m_is in Z_p.
+
+    :param block: The block of bytes, the last block of a file may be short.
+    :param sectors: The number of sectors s per block.
+    :param p: A prime modulus used in some field arithmetic operations.
+    :return: The sectors of the block, a short block has fewer sectors, the missing ones are 0.
+    """
+    if sectors == 1:
+        return [int.from_bytes(block, byteorder='big') % p]
+
+    return [int.from_bytes(block[offset:offset + SECTOR_SIZE], byteorder='big')
+            for offset in range(0, len(block), SECTOR_SIZE)]
+
+
+@lru_cache(maxsize=64)
+def _get_sector_generators(u_compressed: bytes, sectors: int) -> tuple:
+    return (curve.decompress_g1(u_compressed),) + tuple(curve.hash_to_g1_batch(
+        (u_compressed + j.to_bytes(HASH_INDEX_BYTES, byteorder='big') for j in range(2, sectors + 1)), SECTOR_DST))
+
+
+def get_sector_generators(u: Point, sectors: int) -> list[Point]:
+    """
+    Get the public points u_1..u_s of the sectors of a file: u_1 = u, and u_j = H(u || j) for j > 1.
+
+    The points after u are hashed from it, so the escrow only holds u, and no one knows the discrete
+    logarithms between them, which would let a prover keep a combination of the sectors instead of them.
+
+    :param u: The public G1 point u of the file.
+    :param sectors: The number of sectors s per block.
+    :return: The points u_1..u_s.
+    """
+    return list(_get_sector_generators(curve.compress_g1(u), sectors))
+
+
+def get_blocks_authenticators(
+        blocks: list[bytes],
+        first_block_index: int,
+        p: int,
+        x: int,
+        u: Point,
+        mac_size: int,
+        sectors: int = 1
+) -> list[bytes]:
+    """
+    Compute the authenticators of consecutive blocks of a file, σ_i = [H(i) * Π(u_j^(m_ij))]^x.
+
+    :param blocks: The blocks of bytes.
+    :param first_block_index: The index of the first block in the file.
+    :param p: A prime modulus used in some field arithmetic operations.
+    :param x: A scalar value used in multiplication operations.
+    :param u: The elliptic curve point (u) used in cryptographic computations.
+    :param mac_size: Size of the message authentication code (MAC) in bytes.
+    :param sectors: The number of sectors s per block, see `get_block_size`.
+    :return: The authenticator of each block, in the same order.
+    """
+    authenticators: list[Point] = []
+
+    # Compute H(i) for every block index i at once
+    H_values: list[Point] = hash_indices_to_G1(range(first_block_index, first_block_index + len(blocks)))
+    u_values: list[Point] = get_sector_generators(u, sectors)
 
-    # Convert each integer to a byte array
-    return (
-        x_as_int.to_bytes(num_bytes, byteorder='big') +
-        y_as_int.to_bytes(num_bytes, byteorder='big') +
-        z_as_int.to_bytes(num_bytes, byteorder='big')
-    )
+    for block, H_i in zip(blocks, H_values):
+        m_i: list[int] = block_to_sectors(block, sectors, p)  # m_i1..m_is
+
+        # Compute Π(u_j^(m_ij)), u^(m_i) for a single sector
+        u_m_i = curve.multiply_g1(u, m_i[0]) if sectors == 1 else curve.multiexp_g1(u_values[:len(m_i)], m_i)
+
+        # Compute H(i) * Π(u_j^(m_ij))
+        H_i_add_u_m_i = curve.add_g1(H_i, u_m_i)
+
+        # Compute σ_i = [H(i) * Π(u_j^(m_ij))]^x
+        σ_i = curve.multiply_g1(H_i_add_u_m_i, x)
+
+        authenticators.append(σ_i)
+
+    # Convert the σ_i to bytes, normalized together with a single inversion
+    return curve_field_elements_to_bytes(authenticators, mac_size)
 
 
 def get_blocks_authenticators_by_file_path(
@@ -96,8 +217,9 @@ def get_blocks_authenticators_by_file_path(
         block_size: int,
         p: int,
         x: int,
-        u: tuple[optimized_bls12_381_FQ, optimized_bls12_381_FQ, optimized_bls12_381_FQ],
-        mac_size: int
+        u: Point,
+        mac_size: int,
+        sectors: int = 1
 ) -> list[tuple[bytes, bytes]]:
     """
     Process a file into blocks with their corresponding cryptographic authenticators.
@@ -106,45 +228,23 @@ def get_blocks_authenticators_by_file_path(
     :param block_size: Size of each block in bytes.
     :param p: A prime modulus used in some field arithmetic operations.
     :param x: A scalar value used in multiplication operations.
-    :param u: A tuple representing an elliptic curve point (u) used in cryptographic computations.
+    :param u: The elliptic curve point (u) used in cryptographic computations.
     :param mac_size: Size of the message authentication code (MAC) in bytes.
+    :param sectors: The number of sectors s per block, the block size is `get_block_size(sectors)`.
     :return: A list of tuples, where each tuple contains a block of bytes and its corresponding authenticator.
     """
-    blocks_with_authenticators: list[tuple[bytes, bytes]] = []
+    blocks: list[bytes] = []
 
-    # Open the file for reading
+    # Read the file into blocks
     with open(file_path, "rb") as f:
-        block_index: int = 0
-
         while True:
-            # Read the next block
             block: bytes = f.read(block_size)
             if not block:  # End of file
                 break
 
-            block_in_z_p: int = int.from_bytes(block, byteorder='big') % p  # m_i
-
-            # Compute u^(m_i)
-            u_m_i = bls_opt.multiply(u, block_in_z_p)
-
-            # Compute H(i) where i is the block index
-            H_i = bls_hash.hash_to_G1(block_index.to_bytes(HASH_INDEX_BYTES, byteorder='big'), DST, sha256)
-
-            # Compute H(i) * u^(m_i)
-            H_i_add_u_m_i = bls_opt.add(H_i, u_m_i)
+            blocks.append(block)
 
-            # Compute σ_i = [H(i) * u^(m_i)]^x
-            σ_i = bls_opt.multiply(H_i_add_u_m_i, x)
-
-            # Convert σ_i to bytes
-            σ_i_in_bytes: bytes = curve_field_element_to_bytes(σ_i, mac_size)
-
-            # Append the block and its corresponding authenticator
-            blocks_with_authenticators.append((block, σ_i_in_bytes))
-
-            block_index += 1
-
-    return blocks_with_authenticators
+    return list(zip(blocks, get_blocks_authenticators(blocks, 0, p, x, u, mac_size, sectors)))
 
 
 def compress_g1_to_hex(g1_point) -> str:
@@ -154,9 +254,18 @@ def compress_g1_to_hex(g1_point) -> str:
     :param g1_point: The G1 point (typically an elliptic curve point) to compress.
     :return: A hexadecimal string representing the compressed G1 point.
     """
-    g1_comp: G1Compressed = bls_comp.compress_G1(g1_point)
-    g1_comp_as_bytes: bytes = g1_comp.to_bytes(48, 'big')
-    return g1_comp_as_bytes.hex()
+    return curve.compress_g1(g1_point).hex()
+
+
+def compress_g1_points_to_hex(g1_points: list) -> list[str]:
+    """
+    Compress G1 points to hexadecimal strings as `compress_g1_to_hex` does, normalizing them with a
+    single field inversion for all of them.
+
+    :param g1_points: The G1 points to be compressed.
+    :return: The hexadecimal string representations of the compressed points.
+    """
+    return [compressed_point.hex() for compressed_point in curve.compress_g1_batch(g1_points)]
 
 
 def compress_g2_to_hex(g2_point) -> str:
@@ -166,6 +275,24 @@ def compress_g2_to_hex(g2_point) -> str:
     :param g2_point: The G2 point (typically an elliptic curve point) to compress.
     :return: A hexadecimal string representing the compressed G2 point.
     """
-    g2_comp: G2Compressed = bls_comp.compress_G2(g2_point)
-    g2_comp_as_bytes: bytes = g2_comp[0].to_bytes(48, 'big') + g2_comp[1].to_bytes(48, 'big')
-    return g2_comp_as_bytes.hex()
+    return curve.compress_g2(g2_point).hex()
+
+
+def decompress_g1_from_hex(g1_hex: str):
+    """
+    Decompress a G1 point from the hexadecimal string representation produced by `compress_g1_to_hex`.
+
+    :param g1_hex: A hexadecimal string representing the compressed G1 point.
+    :return: The G1 point.
+    """
+    return curve.decompress_g1(bytes.fromhex(g1_hex))
+
+
+def decompress_g2_from_hex(g2_hex: str):
+    """
+    Decompress a G2 point from the hexadecimal string representation produced by `compress_g2_to_hex`.
+
+    :param g2_hex: A hexadecimal string representing the compressed G2 point.
+    :return: The G2 point.
+    """
+    return curve.decompress_g2(bytes.fromhex(g2_hex))
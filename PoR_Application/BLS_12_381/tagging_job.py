@@ -0,0 +1,378 @@
+# Standard library imports
+import json
+import os
+import secrets
+from hashlib import sha256
+from typing import Callable, Optional
+
+# Local imports
+from .curve_backend import curve, Point
+from .helpers import get_blocks_authenticators, compress_g1_to_hex, compress_g2_to_hex
+
+
+TAGGING_CHUNK_BLOCKS: int = 1024    # Blocks tagged and written between two checkpoints
+VERIFY_SAMPLE_BLOCKS: int = 8       # Blocks of the written prefix tagged again on resume, besides the last one
+
+CHECKPOINT_SUFFIX: str = ".checkpoint"
+PARTIAL_SUFFIX: str = ".partial"
+
+
+class InconsistentCheckpointError(ValueError):
+    """
+    The blocks a tagging job wrote before its checkpoint are not consistent with the input file or the keys,
+    the job can only start over, with `discard_tagging_job`.
+    """
+
+
+def get_key_fingerprint(u: Point, g: Point, v: Point, block_size: int, mac_size: int, sectors: int = 1) -> str:
+    """
+    Fingerprint the public parameters of a tagging, to tell whether a checkpoint was made with them.
+
+    :param u: The public G1 point u.
+    :param g: The public G2 point g.
+    :param v: The public G2 point v = g^x.
+    :param block_size: Size of each block in bytes.
+    :param mac_size: Size of each coordinate of the authenticators in bytes.
+    :param sectors: The number of sectors s per block.
+    :return: The SHA-256 of the parameters, as a hexadecimal string.
+    """
+    parameters: str = f"{compress_g1_to_hex(u)}:{compress_g2_to_hex(g)}:{compress_g2_to_hex(v)}:{block_size}:{mac_size}"
+    if sectors != 1:
+        parameters += f":{sectors}"     # The checkpoints of single-sector taggings keep their fingerprint
+    return sha256(parameters.encode()).hexdigest()
+
+
+def get_checkpoint_path(output_path: str) -> str:
+    return output_path + CHECKPOINT_SUFFIX
+
+
+def load_tagging_checkpoint(output_path: str) -> Optional[dict]:
+    """
+    Load the checkpoint of an interrupted tagging job.
+
+    :param output_path: The path of the tagged file the job writes.
+    :return: The checkpoint, or None if there is no job to resume.
+    """
+    try:
+        with open(get_checkpoint_path(output_path), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _save_checkpoint(output_path: str, checkpoint: dict) -> None:
+    """
+    Write the checkpoint of a tagging job atomically, a crash leaves the previous checkpoint.
+    """
+    checkpoint_path: str = get_checkpoint_path(output_path)
+    with open(checkpoint_path + ".tmp", "w") as f:
+        json.dump(checkpoint, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def _remove_checkpoint(output_path: str) -> None:
+    try:
+        os.remove(get_checkpoint_path(output_path))
+    except FileNotFoundError:
+        pass
+
+
+def discard_tagging_job(output_path: str) -> None:
+    """
+    Remove the checkpoint and the partial file of an interrupted tagging job, to start it over.
+
+    :param output_path: The path of the tagged file the job writes.
+    """
+    _remove_checkpoint(output_path)
+    try:
+        os.remove(output_path + PARTIAL_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+def _get_chunk_digest(previous_digest: str, chunk: bytes) -> str:
+    """
+    Chain the digest of the written blocks with a chunk of blocks: SHA-256(previous digest || chunk).
+    """
+    return sha256(bytes.fromhex(previous_digest) + chunk).hexdigest()
+
+
+def _is_written_prefix_consistent(input_path: str, partial_path: str, checkpoint: dict, x: int, u: Point,
+                                  p: int) -> bool:
+    """
+    Check the blocks a job wrote before its checkpoint: their data must be the data of the input
+    file, their bytes must chain to the digest of the checkpoint, and a sample of them, with the last
+    one, must have the authenticators of the keys.
+    """
+    block_size: int = checkpoint["block_size"]
+    mac_size: int = checkpoint["mac_size"]
+    sectors: int = checkpoint.get("sectors", 1)
+    chunk_blocks: int = checkpoint["chunk_blocks"]
+    tagged_blocks: int = checkpoint["tagged_blocks"]
+
+    if not os.path.exists(input_path) or os.path.getsize(input_path) != checkpoint["input_size"]:
+        return False
+    if tagged_blocks == 0:
+        return True
+    if not os.path.exists(partial_path):
+        return False
+
+    sampled_blocks: set[int] = {tagged_blocks - 1} | {secrets.randbelow(tagged_blocks)
+                                                      for _ in range(VERIFY_SAMPLE_BLOCKS)}
+    prefix_digest: str = ""
+    with open(input_path, "rb") as in_f, open(partial_path, "rb") as partial_f:
+        for first_block_index in range(0, tagged_blocks, chunk_blocks):
+            chunk_hash = sha256(bytes.fromhex(prefix_digest))
+            for block_index in range(first_block_index, min(first_block_index + chunk_blocks, tagged_blocks)):
+                block: bytes = in_f.read(block_size)
+                full_block: bytes = partial_f.read(len(block) + 3 * mac_size)
+                if full_block[:len(block)] != block:
+                    return False
+
+                if block_index in sampled_blocks and \
+                        get_blocks_authenticators([block], block_index, p, x, u, mac_size, sectors)[0] != full_block[len(block):]:
+                    return False
+
+                chunk_hash.update(full_block)
+            prefix_digest = chunk_hash.hexdigest()
+
+    return prefix_digest == checkpoint["prefix_digest"]
+
+
+def run_tagging_job(
+        input_path: str,
+        output_path: str,
+        x: int,
+        u: Point,
+        g: Point,
+        v: Point,
+        block_size: int,
+        p: int,
+        mac_size: int,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        sectors: int = 1
+) -> bool:
+    """
+    Tag a file into blocks followed by their authenticators, the layout of
+    `write_file_by_blocks_with_authenticators`, resuming an interrupted run of the job.
+
+    The tagged blocks are appended to `<output_path>.partial` by chunks of TAGGING_CHUNK_BLOCKS,
+    and after each chunk the progress is saved to `<output_path>.checkpoint`, with the fingerprint
+    of the keys and a digest chained over the chunks written. A run with a checkpoint made with the same keys checks the blocks written before
+    it, then continues after them, and raises if they are not consistent with the input file.
+    Once every block is tagged, the partial file replaces the output file, which may be the input file.
+
+    :param input_path: Path to the input file.
+    :param output_path: Path to the tagged file.
+    :param x: The private key x.
+    :param u: The public G1 point u.
+    :param g: The public G2 point g.
+    :param v: The public G2 point v = g^x.
+    :param block_size: Size of each block in bytes.
+    :param p: A prime modulus used in some field arithmetic operations.
+    :param mac_size: Size of each coordinate of the authenticators in bytes.
+    :param on_progress: Called with the numbers of tagged blocks and of blocks after each chunk.
+    :param should_stop: Called before each chunk, the job pauses when it returns True.
+    :param sectors: The number of sectors s per block, the block size is `get_block_size(sectors)`.
+    :return: True if the file is tagged, False if the job was paused.
+    :raises ValueError: If x is not the private key of v, or the checkpoint was made with other keys.
+    :raises InconsistentCheckpointError: If the blocks written before the checkpoint are not consistent, the
+        checkpoint is kept for the caller to discard.
+    """
+    if compress_g2_to_hex(curve.multiply_g2(g, x)) != compress_g2_to_hex(v):
+        raise ValueError("The private key x does not match the public key v = g^x")
+
+    partial_path: str = output_path + PARTIAL_SUFFIX
+    key_fingerprint: str = get_key_fingerprint(u, g, v, block_size, mac_size, sectors)
+
+    checkpoint: Optional[dict] = load_tagging_checkpoint(output_path)
+    if checkpoint is not None:
+        if checkpoint["key_fingerprint"] != key_fingerprint:
+            raise ValueError(f"The checkpoint of {output_path} was made with other keys, "
+                             f"remove {get_checkpoint_path(output_path)} to start over")
+
+        if checkpoint.get("completed"):
+            # Interrupted while replacing the output file, the tagged file is the partial file or the output file
+            if os.path.exists(partial_path):
+                os.replace(partial_path, output_path)
+            _remove_checkpoint(output_path)
+            return True
+
+        if not _is_written_prefix_consistent(input_path, partial_path, checkpoint, x, u, p):
+            raise InconsistentCheckpointError(f"The blocks tagged before the checkpoint of {output_path} "
+                                              f"are not consistent with the input file")
+
+    if checkpoint is None:
+        input_size: int = os.path.getsize(input_path)
+        checkpoint = {
+            "input_path": os.path.abspath(input_path),
+            "input_size": input_size,
+            "block_size": block_size,
+            "mac_size": mac_size,
+            "sectors": sectors,
+            "number_of_blocks": -(-input_size // block_size),
+            "chunk_blocks": TAGGING_CHUNK_BLOCKS,
+            "tagged_blocks": 0,
+            "prefix_digest": "",
+            "key_fingerprint": key_fingerprint,
+            "u": compress_g1_to_hex(u),
+            "g": compress_g2_to_hex(g),
+            "v": compress_g2_to_hex(v)
+        }
+        _save_checkpoint(output_path, checkpoint)
+
+    number_of_blocks: int = checkpoint["number_of_blocks"]
+    chunk_blocks: int = checkpoint["chunk_blocks"]
+    tagged_blocks: int = checkpoint["tagged_blocks"]
+
+    with open(input_path, "rb") as in_f, open(partial_path, "r+b" if tagged_blocks else "wb") as partial_f:
+        # Drop what was written after the checkpoint, the last block of the file is the only short one
+        in_f.seek(tagged_blocks * block_size)
+        partial_f.seek(tagged_blocks * (block_size + 3 * mac_size))
+        partial_f.truncate()
+
+        while tagged_blocks < number_of_blocks:
+            if should_stop is not None and should_stop():
+                return False
+
+            blocks: list[bytes] = [in_f.read(block_size)
+                                   for _ in range(min(chunk_blocks, number_of_blocks - tagged_blocks))]
+            authenticators: list[bytes] = get_blocks_authenticators(blocks, tagged_blocks, p, x, u, mac_size, sectors)
+
+            # The chunk is on disk before the checkpoint counts it
+            chunk: bytes = b"".join(block + authenticator for block, authenticator in zip(blocks, authenticators))
+            partial_f.write(chunk)
+            partial_f.flush()
+            os.fsync(partial_f.fileno())
+
+            tagged_blocks += len(blocks)
+            checkpoint["tagged_blocks"] = tagged_blocks
+            checkpoint["prefix_digest"] = _get_chunk_digest(checkpoint["prefix_digest"], chunk)
+            _save_checkpoint(output_path, checkpoint)
+
+            if on_progress is not None:
+                on_progress(tagged_blocks, number_of_blocks)
+
+    checkpoint["completed"] = True
+    _save_checkpoint(output_path, checkpoint)
+    os.replace(partial_path, output_path)
+    _remove_checkpoint(output_path)
+    return True
+
+
+def get_tagged_data_size(tagged_file_path: str, block_size: int, mac_size: int) -> int:
+    """
+    Return the size of the data of a tagged file, without the authenticators of its blocks.
+
+    :param tagged_file_path: Path to the tagged file.
+    :param block_size: Size of each block in bytes.
+    :param mac_size: Size of each coordinate of the authenticators in bytes.
+    :return: The size of the data in bytes.
+    """
+    file_size: int = os.path.getsize(tagged_file_path)
+    return file_size - -(-file_size // (block_size + 3 * mac_size)) * 3 * mac_size
+
+
+def read_tagged_data(tagged_file_path: str, data_offset: int, block_size: int, mac_size: int) -> bytes:
+    """
+    Read the data of a tagged file from an offset of its data to its end, skipping the authenticators.
+
+    :param tagged_file_path: Path to the tagged file.
+    :param data_offset: The offset in the data, without the authenticators.
+    :param block_size: Size of each block in bytes.
+    :param mac_size: Size of each coordinate of the authenticators in bytes.
+    :return: The data from the offset.
+    """
+    data: bytearray = bytearray()
+    with open(tagged_file_path, "rb") as f:
+        f.seek((data_offset // block_size) * (block_size + 3 * mac_size))
+        while full_block := f.read(block_size + 3 * mac_size):
+            data += full_block[:-3 * mac_size]
+
+    return bytes(data[data_offset % block_size:])
+
+
+def append_tagged_blocks(
+        tagged_file_path: str,
+        appended_data_path: str,
+        data_offset: int,
+        delta_path: str,
+        x: int,
+        u: Point,
+        g: Point,
+        v: Point,
+        block_size: int,
+        p: int,
+        mac_size: int,
+        sectors: int = 1
+) -> int:
+    """
+    Extend a tagged file with appended data, tagging only the blocks from the one the data starts in.
+
+    H(i) depends only on the index of a block, so the blocks before it keep their authenticators. The
+    block at the offset, the short last block of the file, is tagged again with the appended data after
+    its data before the offset. The tagged blocks, the delta to upload to the storage server, are written
+    to `delta_path`, then replace the blocks of the tagged file from the first of them.
+
+    :param tagged_file_path: Path to the tagged file, extended in place.
+    :param appended_data_path: Path to the data to write at the offset, e.g. its Reed-Solomon encoding.
+    :param data_offset: The offset in the data of the tagged file, without the authenticators, at most its size.
+    :param delta_path: Path to the tagged blocks from the first block tagged.
+    :param x: The private key x.
+    :param u: The public G1 point u.
+    :param g: The public G2 point g.
+    :param v: The public G2 point v = g^x.
+    :param block_size: Size of each block in bytes.
+    :param p: A prime modulus used in some field arithmetic operations.
+    :param mac_size: Size of each coordinate of the authenticators in bytes.
+    :param sectors: The number of sectors s per block of the tagged file.
+    :return: The index of the first block of the delta.
+    :raises ValueError: If x is not the private key of v, or the tagged file was tagged with other keys.
+    """
+    if compress_g2_to_hex(curve.multiply_g2(g, x)) != compress_g2_to_hex(v):
+        raise ValueError("The private key x does not match the public key v = g^x")
+
+    record_size: int = block_size + 3 * mac_size
+    data_size: int = get_tagged_data_size(tagged_file_path, block_size, mac_size)
+    if not 0 <= data_offset <= data_size:
+        raise ValueError(f"The offset {data_offset} is out of the {data_size} bytes of data of {tagged_file_path}")
+
+    first_block_index: int = data_offset // block_size
+
+    # The last block tagged is tagged again with the same keys, or the keys are not the keys of the file
+    if data_size:
+        last_block_index: int = -(-data_size // block_size) - 1
+        with open(tagged_file_path, "rb") as f:
+            f.seek(last_block_index * record_size)
+            full_block: bytes = f.read()
+        if get_blocks_authenticators([full_block[:-3 * mac_size]], last_block_index, p, x, u, mac_size, sectors)[0] != \
+                full_block[-3 * mac_size:]:
+            raise ValueError(f"{tagged_file_path} was not tagged with these keys")
+
+    # The data of the first block before the offset
+    head: bytes = read_tagged_data(tagged_file_path, first_block_index * block_size, block_size, mac_size)
+    head = head[:data_offset - first_block_index * block_size]
+
+    with open(appended_data_path, "rb") as in_f, open(delta_path, "wb") as delta_f:
+        block_index: int = first_block_index
+        data: bytes = head + in_f.read(TAGGING_CHUNK_BLOCKS * block_size - len(head))
+        while data:
+            blocks: list[bytes] = [data[offset:offset + block_size] for offset in range(0, len(data), block_size)]
+            authenticators: list[bytes] = get_blocks_authenticators(blocks, block_index, p, x, u, mac_size, sectors)
+            delta_f.write(b"".join(block + authenticator for block, authenticator in zip(blocks, authenticators)))
+
+            block_index += len(blocks)
+            data = in_f.read(TAGGING_CHUNK_BLOCKS * block_size)
+
+    # Replace the blocks of the tagged file from the first block of the delta
+    with open(tagged_file_path, "r+b") as tagged_f, open(delta_path, "rb") as delta_f:
+        tagged_f.seek(first_block_index * record_size)
+        tagged_f.truncate()
+        while chunk := delta_f.read(TAGGING_CHUNK_BLOCKS * record_size):
+            tagged_f.write(chunk)
+
+    return first_block_index
@@ -1,6 +1,7 @@
 # Standard library imports
 import math
 import secrets
+from typing import Callable, Iterable
 
 
 def bytes_needed(number: int) -> int:
@@ -27,12 +28,16 @@ def bytes_needed(number: int) -> int:
     return power_of_two_bytes
 
 
-def secure_random_sample(maxIndex: int, number_of_indices: int) -> list[int]:
+def _partial_shuffle_sample(maxIndex: int, number_of_indices: int, random_below: Callable[[int], int]) -> list[int]:
     """
-    Generate a secure random sample of indices from a range.
+    Select indices with the first `number_of_indices` steps of a Fisher-Yates shuffle of range(maxIndex).
+
+    Only the swapped positions are kept, in a dictionary, so time and memory are O(number_of_indices)
+    instead of O(maxIndex), while the sample has exactly the distribution of a full shuffle.
 
     :param maxIndex: The upper limit (exclusive) of the range of indices.
     :param number_of_indices: The number of random indices to select.
+    :param random_below: Returns a uniformly random integer in [0, bound) for a given bound.
     :return: A list of randomly selected indices.
     :raises ValueError: If the sample size is larger than the range.
     """
@@ -40,18 +45,87 @@ def secure_random_sample(maxIndex: int, number_of_indices: int) -> list[int]:
     if number_of_indices > maxIndex:
         raise ValueError("Sample size l cannot be larger than the range n.")
 
-    # Create a list of indices from 0 to maxIndex - 1
-    indices: list[int] = list(range(maxIndex))
+    # Positions whose value differs from the position itself, i.e. that were swapped
+    swapped: dict[int, int] = {}
+    indices: list[int] = []
+
+    for i in range(number_of_indices):
+        # Get a secure random position in [i, maxIndex) to swap with
+        j: int = i + random_below(maxIndex - i)
+
+        # Swap the elements at positions i and j, the value at i is final
+        indices.append(swapped.get(j, j))
+        swapped[j] = swapped.pop(i, i)
 
-    # Shuffle the list using cryptographically secure randomness
-    for i in range(len(indices) - 1, 0, -1):
-        # Get a secure random index to swap with
-        j: int = secrets.randbelow(i + 1)
-        # Swap the elements at positions i and j
-        indices[i], indices[j] = indices[j], indices[i]
+    return indices
+
+
+def secure_random_sample(maxIndex: int, number_of_indices: int) -> list[int]:
+    """
+    Generate a secure random sample of indices from a range.
+
+    :param maxIndex: The upper limit (exclusive) of the range of indices.
+    :param number_of_indices: The number of random indices to select.
+    :return: A list of randomly selected indices.
+    :raises ValueError: If the sample size is larger than the range.
+    """
+    # Shuffle using cryptographically secure randomness
+    return _partial_shuffle_sample(maxIndex, number_of_indices, secrets.randbelow)
+
+
+def secure_random_sample_batch(maxIndex: int, number_of_indices: int) -> list[int]:
+    """
+    Generate a secure random sample of indices from a range, deriving all the indices from a
+    single draw of random bytes instead of one CSPRNG call per index.
+
+    Each random position is taken by rejection sampling from the drawn bytes, so the sample has the
+    same distribution as `secure_random_sample`. More bytes are drawn only if the rejections use up
+    the first draw, which is twice the expected need.
+
+    :param maxIndex: The upper limit (exclusive) of the range of indices.
+    :param number_of_indices: The number of random indices to select.
+    :return: A list of randomly selected indices.
+    :raises ValueError: If the sample size is larger than the range.
+    """
+    bytes_per_draw: int = max(math.ceil((maxIndex - 1).bit_length() / 8), 1)
+    random_bytes: bytes = secrets.token_bytes(2 * number_of_indices * bytes_per_draw)
+    position: int = 0
+
+    def random_below(bound: int) -> int:
+        nonlocal random_bytes, position
+
+        mask: int = (1 << (bound - 1).bit_length()) - 1
+        while True:
+            if position + bytes_per_draw > len(random_bytes):
+                random_bytes += secrets.token_bytes(number_of_indices * bytes_per_draw)
+
+            value: int = int.from_bytes(random_bytes[position:position + bytes_per_draw], byteorder='big') & mask
+            position += bytes_per_draw
+
+            if value < bound:
+                return value
+
+    return _partial_shuffle_sample(maxIndex, number_of_indices, random_below)
+
+
+def normalize_challenge(queries: Iterable[tuple[int, int]], modulus: int) -> dict[int, int]:
+    """
+    Merge the queries of a challenge into a map of the challenged block indices, in increasing
+    order, to their coefficients.
+
+    The same block index can be queried several times, e.g. by the queries generated on-chain
+    as `slot % number_of_blocks`. Its coefficients are summed, as Σ(v_ij * x_i) = (Σv_ij) * x_i
+    for both σ and μ, so each challenged block is read and processed once.
+
+    :param queries: The queries, as (block index, coefficient) pairs.
+    :param modulus: The modulus of the coefficients, the order of the group.
+    :return: The coefficient of each challenged block index, sorted by index.
+    """
+    challenge: dict[int, int] = {}
+    for block_index, coefficient in queries:
+        challenge[block_index] = (challenge.get(block_index, 0) + coefficient) % modulus
 
-    # Return the first `number_of_indices` - `l` items as the sample
-    return indices[:number_of_indices]
+    return dict(sorted(challenge.items()))
 
 
 def write_file_by_blocks_with_authenticators(output_file: str, blocks_with_authenticators: list[tuple[bytes, bytes]]) -> None:
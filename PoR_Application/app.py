@@ -1,18 +1,22 @@
 # Standard library imports
 import os
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, simpledialog
 from tkinter import ttk
+from typing import Optional
 
 # Third-party library imports
 from enum import Enum
 from PIL import ImageTk, Image
 
 # Local imports
-from BLS_12_381.helpers import get_blocks_authenticators_by_file_path, p, MAC_SIZE, BLOCK_SIZE, generate_x, \
-    generate_g, generate_v, generate_u, compress_g2_to_hex, compress_g1_to_hex, MAC_SIZE_3D
-from Common.helpers import write_file_by_blocks_with_authenticators, write_file_by_blocks
-from Common.ReedSolomon.reedSolomon import encode_file_with_rs, decode_file_with_rs
+from BLS_12_381.helpers import p, MAC_SIZE, generate_x, generate_g, generate_v, generate_u, get_block_size, \
+    compress_g2_to_hex, compress_g1_to_hex, decompress_g1_from_hex, decompress_g2_from_hex, MAC_SIZE_3D
+from BLS_12_381.tagging_job import run_tagging_job, load_tagging_checkpoint, discard_tagging_job, append_tagged_blocks, \
+    get_tagged_data_size, read_tagged_data, InconsistentCheckpointError
+from Common.helpers import write_file_by_blocks
+from Common.ReedSolomon.reedSolomon import encode_file_with_rs, decode_file_with_rs, encode_appended_file_with_rs, \
+    RS_CODEWORD_SIZE
 from Common.Constants.BLS12_381Constants import G1_COMPRESS_POINT_HEX_STRING_LENGTH, G2_COMPRESS_POINT_HEX_STRING_LENGTH
 from Common.Providers.solanaApiGatewayProvider import SolanaGatewayClientProvider
 from Common.Constants.SolanaConstants import SOLANA_PRIVATE_KEY_BASE58_CHARACTERS_LEN, \
@@ -20,6 +24,10 @@ from Common.Constants.SolanaConstants import SOLANA_PRIVATE_KEY_BASE58_CHARACTER
 
 INCLUDES_REED_SOLOMON: bool = True
 
+# Sectors s per block: 1 for blocks of 1024 bytes reduced to a single scalar, s > 1 for blocks of s sectors of
+# 31 bytes sharing one authenticator, the storage server and the decoding must use the same s
+SECTORS_PER_BLOCK: int = int(os.environ.get("SECTORS_PER_BLOCK", 1))
+
 
 class Page(Enum):
     ENCODING = "Encoding"
@@ -95,9 +103,10 @@ def generate_ecc_file() -> None:
     Generates an ECC-encoded file by:
     - Checking if a file has been selected.
     - Asking the user to choose a destination folder.
+    - Offering to resume an interrupted encoding of the file, with its private key.
     - Optionally applying Reed-Solomon encoding.
     - Generating cryptographic keys and authenticators.
-    - Processing the file into cryptographic blocks.
+    - Processing the file into cryptographic blocks, with checkpoints to resume from.
     - Saving the encoded file and displaying key values.
 
     Returns:
@@ -124,35 +133,67 @@ def generate_ecc_file() -> None:
         print(f"Destination folder: {save_path}")
         print(f"Encoded file path: {encoded_file_path}")
 
-        # Apply Reed-Solomon encoding if enabled
-        if INCLUDES_REED_SOLOMON:
-            print("Reed-Solomon encoding enabled. Starting RS encoding...")
-            encoded_file_path: str = encode_file_with_rs(file_path, encoded_file_path)
-            print("Reed-Solomon encoding completed.")
+        # An interrupted encoding of the file resumes from its checkpoint, with the private key it was started with
+        checkpoint: Optional[dict] = load_tagging_checkpoint(encoded_file_path)
+        resume: bool = checkpoint is not None and messagebox.askyesno(
+            "Resume Encoding",
+            f"An interrupted encoding of {file_name} tagged {checkpoint['tagged_blocks']} of "
+            f"{checkpoint['number_of_blocks']} blocks. Resume it?")
+        if checkpoint is not None and not resume:
+            discard_tagging_job(encoded_file_path)
 
         try:
-            # Generate cryptographic values
-            x: int = generate_x()   # Private key x
-            g = generate_g()        # g in G2
-            v = generate_v(g, x)    # v = g^x in G2
-            u = generate_u()        # u in G1
-
-            print(f"Generated x (private key): {x}")
-            print(f"Generated g (G2 point): {compress_g2_to_hex(g)}")
-            print(f"Generated v (g^x in G2): {compress_g2_to_hex(v)}")
-            print(f"Generated u (G1 point): {compress_g1_to_hex(u)}")
-
-            # Process the file into blocks with cryptographic authenticators
-            blocks_with_authenticators: list[tuple[bytes, bytes]] = get_blocks_authenticators_by_file_path(encoded_file_path,
-                                                                                                           BLOCK_SIZE,
-                                                                                                           p,
-                                                                                                           x,
-                                                                                                           u,
-                                                                                                           MAC_SIZE)
-            print(f"Total blocks with authenticators generated: {len(blocks_with_authenticators)}")
-
-            # Write the processed blocks to the encoded file
-            write_file_by_blocks_with_authenticators(encoded_file_path, blocks_with_authenticators)
+            if resume:
+                x_input: str = simpledialog.askstring("Resume Encoding",
+                                                      "Private key x of the interrupted encoding:") or ""
+                if not is_number(x_input):
+                    messagebox.showwarning("Warning", "Please Enter the Private Key x of the Interrupted Encoding.")
+                    return
+
+                # The file to tag and the public keys are the ones of the checkpoint
+                file_to_tag_path: str = checkpoint["input_path"]
+                x: int = int(x_input)
+                g = decompress_g2_from_hex(checkpoint["g"])
+                v = decompress_g2_from_hex(checkpoint["v"])
+                u = decompress_g1_from_hex(checkpoint["u"])
+                sectors: int = checkpoint.get("sectors", 1)
+                print(f"Resuming the encoding of {file_to_tag_path}")
+            else:
+                file_to_tag_path: str = file_path
+                sectors: int = SECTORS_PER_BLOCK
+
+                # Apply Reed-Solomon encoding if enabled
+                if INCLUDES_REED_SOLOMON:
+                    print("Reed-Solomon encoding enabled. Starting RS encoding...")
+                    file_to_tag_path = encode_file_with_rs(file_path, encoded_file_path)
+                    print("Reed-Solomon encoding completed.")
+
+                # Generate cryptographic values
+                x: int = generate_x()   # Private key x
+                g = generate_g()        # g in G2
+                v = generate_v(g, x)    # v = g^x in G2
+                u = generate_u()        # u in G1
+
+                print(f"Generated x (private key): {x}")
+                print(f"Generated g (G2 point): {compress_g2_to_hex(g)}")
+                print(f"Generated v (g^x in G2): {compress_g2_to_hex(v)}")
+                print(f"Generated u (G1 point): {compress_g1_to_hex(u)}")
+
+            # Process the file into blocks with cryptographic authenticators, and write them to the encoded file
+            def tag_file() -> None:
+                run_tagging_job(file_to_tag_path, encoded_file_path, x, u, g, v, get_block_size(sectors), p, MAC_SIZE,
+                                on_progress=lambda tagged_blocks, number_of_blocks:
+                                print(f"Tagged {tagged_blocks} of {number_of_blocks} blocks"),
+                                sectors=sectors)
+
+            try:
+                tag_file()
+            except InconsistentCheckpointError as e:
+                # The blocks of the interrupted encoding can not be kept, it can only start over with the same keys
+                if not messagebox.askyesno("Resume Encoding", f"{e}. Start the encoding over?"):
+                    return
+                discard_tagging_job(encoded_file_path)
+                tag_file()
             print(f"Encoded file successfully written to {encoded_file_path}")
 
             # Display values in the UI
@@ -162,6 +203,7 @@ def generate_ecc_file() -> None:
             encoding_output_text.insert(tk.END, f"v (g^x in G2): {compress_g2_to_hex(v)}\n")
             encoding_output_text.insert(tk.END, f"u (in G1): {compress_g1_to_hex(u)}\n")
             encoding_output_text.insert(tk.END, f"x (private key): {x}\n")
+            encoding_output_text.insert(tk.END, f"s (sectors per block): {sectors}\n")
             encoding_output_text.config(state=tk.DISABLED)
 
             messagebox.showinfo("Success", f"ECC File Copied to {encoded_file_path}")
@@ -170,6 +212,98 @@ def generate_ecc_file() -> None:
             print(f"Error: Failed to encode file: {e}")
 
 
+def append_to_ecc_file() -> None:
+    """
+    Appends the selected file to an ECC-encoded file by:
+    - Checking if a file has been selected.
+    - Asking the user to choose the encoded file to extend.
+    - Fetching the public keys of the file from its escrow, and asking for its private key x.
+    - Optionally applying Reed-Solomon encoding to the appended data, with the last codeword of the encoded file.
+    - Tagging only the blocks from the last block of the encoded file, and appending them to it.
+    - Saving the tagged blocks to a delta file, to upload to the storage server with `/api/append`.
+
+    Returns:
+        None
+    """
+
+    # Check if a file has been selected
+    if not file_path_to_encode_var.get():
+        messagebox.showwarning("Warning", "Please Select a File First.")
+        print("Warning: No file selected for appending.")
+        return
+
+    # Ask user to select the encoded file to extend
+    encoded_file_path: str = filedialog.askopenfilename(title="Select the Encoded File to Extend",
+                                                        filetypes=[("Encoded Files", "*.encoded")])
+    if not encoded_file_path:
+        return
+
+    escrow_public_key: str = (simpledialog.askstring("Append to Encoded File",
+                                                     "Escrow public key of the encoded file:") or "").strip()
+    if len(escrow_public_key) != SOLANA_PUBLIC_KEY_BASE58_CHARACTERS_LEN:
+        messagebox.showwarning("Warning", "Please Enter the Escrow Public Key of the Encoded File.")
+        return
+
+    x_input: str = simpledialog.askstring("Append to Encoded File", "Private key x of the encoded file:") or ""
+    if not is_number(x_input):
+        messagebox.showwarning("Warning", "Please Enter the Private Key x of the Encoded File.")
+        return
+
+    file_path: str = file_path_to_encode_var.get()
+    delta_file_path: str = encoded_file_path + ".delta"
+    print(f"Appending {file_path} to {encoded_file_path}")
+
+    try:
+        # The public keys of the file are the keys of its escrow
+        response = SolanaGatewayClientProvider().get_escrow_data(escrow_public_key)
+        if not 200 <= response.status_code < 300:
+            messagebox.showerror("Error", f"Failed to Get the Escrow Data: {response.text}")
+            print(f"Error: Request failed with status {response.status_code} - {response.text}")
+            return
+
+        escrow_data: dict = response.json()
+        x: int = int(x_input)
+        g = decompress_g2_from_hex(escrow_data["g"])
+        v = decompress_g2_from_hex(escrow_data["v"])
+        u = decompress_g1_from_hex(escrow_data["u"])
+
+        block_size: int = get_block_size(SECTORS_PER_BLOCK)
+        data_size: int = get_tagged_data_size(encoded_file_path, block_size, MAC_SIZE)
+        data_offset: int = data_size
+        appended_data_path: str = file_path
+
+        # Encode the appended data with the short last codeword of the file, which is encoded again
+        if INCLUDES_REED_SOLOMON:
+            print("Reed-Solomon encoding enabled. Starting RS encoding of the appended data...")
+            data_offset = data_size - data_size % RS_CODEWORD_SIZE
+            last_codeword: bytes = read_tagged_data(encoded_file_path, data_offset, block_size, MAC_SIZE)
+            appended_data_path = encode_appended_file_with_rs(last_codeword, file_path, delta_file_path + ".rs")
+            print("Reed-Solomon encoding completed.")
+
+        try:
+            first_block_index: int = append_tagged_blocks(encoded_file_path, appended_data_path, data_offset,
+                                                          delta_file_path, x, u, g, v, block_size, p, MAC_SIZE,
+                                                          SECTORS_PER_BLOCK)
+        finally:
+            if appended_data_path != file_path:
+                os.remove(appended_data_path)
+
+        print(f"Encoded file extended from block {first_block_index}, delta written to {delta_file_path}")
+
+        # Display values in the UI
+        encoding_output_text.config(state=tk.NORMAL)
+        encoding_output_text.delete("1.0", tk.END)
+        encoding_output_text.insert(tk.END, f"Encoded file: {encoded_file_path}\n")
+        encoding_output_text.insert(tk.END, f"Delta file: {delta_file_path}\n")
+        encoding_output_text.insert(tk.END, f"First block index: {first_block_index}\n")
+        encoding_output_text.config(state=tk.DISABLED)
+
+        messagebox.showinfo("Success", f"Encoded File Extended, Upload {delta_file_path} from Block {first_block_index}")
+    except Exception as e:
+        messagebox.showerror("Error", f"Failed to Append to Encoded File: {e}")
+        print(f"Error: Failed to append to encoded file: {e}")
+
+
 def decode_ecc_file() -> None:
     """
     Decodes an ECC-encoded file by:
@@ -219,8 +353,8 @@ def decode_ecc_file() -> None:
                 while True:
                     # Read the next block (data + authenticator)
                     full_block: bytes = f.read(
-                        BLOCK_SIZE + MAC_SIZE_3D
-                    )  # Up to 1024-byte data, 4-byte * 3 for 3D point authenticator tag
+                        get_block_size(SECTORS_PER_BLOCK) + MAC_SIZE_3D
+                    )  # Up to the block size of data, 128-byte * 3 for 3D point authenticator tag
                     if not full_block:
                         break  # End of file reached
 
@@ -769,6 +903,9 @@ def update_content(option: Page) -> None:
         save_copy_button = ttk.Button(content_frame, text="Generate ECC File", command=generate_ecc_file, style="Rounded.TButton")
         save_copy_button.pack(pady=10)
 
+        append_button = ttk.Button(content_frame, text="Append to Encoded File", command=append_to_ecc_file, style="Rounded.TButton")
+        append_button.pack(pady=(0, 10))
+
         global encoding_output_text
         encoding_output_text = tk.Text(content_frame, height=15, width=80, wrap=tk.WORD)
         encoding_output_text.pack(pady=10)
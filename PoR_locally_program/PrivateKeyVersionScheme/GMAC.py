@@ -1,13 +1,25 @@
 # Standard library imports
+import mmap
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, Optional
 
 # Third-party library imports
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 
 BLOCK_SIZE: int = 1024
 NONCE_SIZE: int = 12
 GMAC_SIZE: int = 16
+KEY_SIZE: int = 32
+SALT_SIZE: int = 16     # The random salt of a tagged file, its header, the key of the file is derived from it
+FILE_KEY_INFO: bytes = b"PoR GMAC file key"
+BATCH_BLOCKS: int = 4096    # Number of blocks read, tagged and written per batch
+VALIDATION_WORKERS: int = os.cpu_count() or 1
 
 
 def convert_index_to_bytes(index: int, max_bytes_size: int = 32) -> bytes:
@@ -26,76 +38,192 @@ def convert_index_to_bytes(index: int, max_bytes_size: int = 32) -> bytes:
     return index_in_bytes
 
 
-def process_file_with_gmac(file_path: str, block_size: int = 1024) -> (list[tuple[int, bytes, bytes]], bytes):
+def nonce_for_block(block_index: int) -> bytes:
     """
-    Processes a file and generates GMAC (Galois Message Authentication Code) for each block using AES-GCM.
+    Derives the AES-GCM nonce of a block from its index (a 96-bit big-endian counter).
+
+    The nonces are unique per block, and the same for every file, so each file is tagged with a key
+    of its own, derived by `derive_file_key` from a random salt.
 
     Args:
-    - file_path (str): Path to the file to be processed.
-    - block_size (int): Size of each block to read from the file (default 1024 bytes).
+    - block_index (int): The index of the block.
 
     Returns:
-    - list[tuple[int, bytes, bytes]]: List of tuples where each tuple contains:
-        - block number (int),
-        - nonce (bytes),
-        - block with appended GMAC (bytes).
-    - bytes: The randomly generated 256-bit AES key used for encryption.
+    - bytes: The 12-byte nonce of the block.
+    """
+    return block_index.to_bytes(NONCE_SIZE, byteorder='big')
+
 
-    Logs:
-    - Information and error logs during file processing.
+def derive_file_key(key: bytes, salt: bytes) -> bytes:
     """
-    # Generate a random 256-bit (32-byte) AES key
-    key: bytes = os.urandom(32)
+    Derives the AES key that tags a file from the key of the owner and the random salt of the file (HKDF-SHA256).
 
-    # Open the file for reading
-    with open(file_path, "rb") as f:
-        blocks_with_mac: list[tuple[int, bytes, bytes]] = []  # To store blocks with appended GMAC
-        block_number: int = 0
+    Args:
+    - key (bytes): The 256-bit AES key of the owner, which may tag several files.
+    - salt (bytes): The salt of the file, the header of the tagged file.
+
+    Returns:
+    - bytes: The 256-bit AES key of the file.
+    """
+    return HKDF(algorithm=SHA256(), length=KEY_SIZE, salt=salt, info=FILE_KEY_INFO).derive(key)
+
+
+def read_file_salt(f: BinaryIO) -> bytes:
+    """
+    Reads the salt at the start of a file written by `process_file_with_gmac`.
+
+    Raises:
+    - ValueError: If the file is too short to hold a salt.
+    """
+    salt: bytes = f.read(SALT_SIZE)
+    if len(salt) < SALT_SIZE:
+        raise ValueError("The file is too short to be a GMAC-tagged file")
+
+    return salt
+
+
+def gmac_tag_block(aesgcm: AESGCM, block: bytes, block_index: int) -> bytes:
+    """
+    Generates the stored record of a single block: nonce, block and GMAC.
+
+    Args:
+    - aesgcm (AESGCM): The shared AES-GCM cipher context.
+    - block (bytes): The block data.
+    - block_index (int): The index of the block (authenticated together with the data).
+
+    Returns:
+    - bytes: nonce (12 bytes) + block + GMAC tag (16 bytes).
+    """
+    nonce: bytes = nonce_for_block(block_index)
+    block_with_number: bytes = block + convert_index_to_bytes(block_index)
+
+    # Generate GMAC (encrypt empty plaintext with block as AAD)
+    gmac_tag: bytes = aesgcm.encrypt(nonce, b"", block_with_number)
 
-        while True:
-            # Read the next block
-            block = f.read(block_size)
-            if not block:  # End of file
-                break
+    return nonce + block + gmac_tag
 
-            # Generate a random nonce (12 bytes recommended for AES-GCM)
-            nonce: bytes = os.urandom(NONCE_SIZE)
 
-            # Initialize AES-GCM
-            aesgcm = AESGCM(key)
+def iter_block_batches(f: BinaryIO, block_size: int, batch_blocks: int = BATCH_BLOCKS) -> Iterator[list[bytes]]:
+    """
+    Reads a file as consecutive batches of blocks, so only one batch is held in memory.
 
-            block_number_bytes: bytes = convert_index_to_bytes(block_number)
-            block_with_number: bytes = block + block_number_bytes
+    Args:
+    - f (BinaryIO): The opened file.
+    - block_size (int): Size of each block in bytes.
+    - batch_blocks (int): Maximum number of blocks per batch.
 
-            # Generate GMAC (encrypt empty plaintext with block as AAD)
-            gmac_tag: bytes = aesgcm.encrypt(nonce, b"", block_with_number)
+    Yields:
+    - list[bytes]: The next batch of blocks (the last block of the file may be shorter).
+    """
+    while True:
+        data: bytes = f.read(block_size * batch_blocks)
+        if not data:  # End of file
+            return
 
-            # Append GMAC to the block
-            block_with_mac: bytes = block + gmac_tag
-            blocks_with_mac.append((block_number, nonce, block_with_mac))
+        yield [data[offset:offset + block_size] for offset in range(0, len(data), block_size)]
 
-            # Increment block number
-            block_number += 1
 
-    return blocks_with_mac, key  # Return processed blocks and the key for verification
+def _tag_blocks(aesgcm: AESGCM, blocks: list[bytes], first_block_index: int) -> bytes:
+    """
+    Tags consecutive blocks and returns their stored records concatenated.
+    """
+    return b"".join(gmac_tag_block(aesgcm, block, first_block_index + i) for i, block in enumerate(blocks))
 
 
-def write_blocks_to_file(blocks_with_mac: list[tuple[int, bytes, bytes]], output_file: str) -> None:
+def process_file_with_gmac(
+        file_path: str,
+        output_file: str,
+        block_size: int = BLOCK_SIZE,
+        key: Optional[bytes] = None,
+        workers: int = 1
+) -> bytes:
     """
-    Writes processed blocks with GMAC to a new output file.
+    Streams a file through AES-GCM, generating a GMAC (Galois Message Authentication Code) for each
+    block, and writes a random salt followed by nonce + block + GMAC records to the output file.
+
+    The blocks are tagged with a key derived from the key and the salt, so a key can tag several
+    files without reusing a nonce under the same key.
+
+    A single cipher context is shared by all blocks, nonces are derived from the block index and
+    the input is processed in batches of `BATCH_BLOCKS` blocks, so memory use does not grow with
+    the file size. With `workers` > 1 every batch is split across a thread pool; the AES work runs
+    in OpenSSL outside the GIL.
 
     Args:
-    - blocks_with_mac (list[tuple[int, bytes, bytes]]): List of blocks, each containing:
-        - block number (int),
-        - nonce (bytes),
-        - block with appended GMAC (bytes).
+    - file_path (str): Path to the file to be processed.
     - output_file (str): Path to the output file where the processed blocks will be written.
+    - block_size (int): Size of each block to read from the file (default 1024 bytes).
+    - key (bytes, optional): 256-bit AES key, which may tag several files. A random key is generated when not given.
+    - workers (int): Number of tagging threads (default 1, no thread pool).
+
+    Returns:
+    - bytes: The 256-bit AES key used for tagging, needed for verification.
+    """
+    if key is None:
+        # Generate a random 256-bit (32-byte) AES key
+        key = os.urandom(KEY_SIZE)
+
+    salt: bytes = os.urandom(SALT_SIZE)
+    aesgcm = AESGCM(derive_file_key(key, salt))
+    executor: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    try:
+        with open(file_path, "rb") as f, open(output_file, "wb") as out_f:
+            out_f.write(salt)
+            block_number: int = 0
+
+            for blocks in iter_block_batches(f, block_size):
+                if executor is None:
+                    out_f.write(_tag_blocks(aesgcm, blocks, block_number))
+                else:
+                    # Split the batch into one contiguous slice per worker; map() keeps the file order
+                    slice_size: int = -(-len(blocks) // workers)
+                    starts: list[int] = list(range(0, len(blocks), slice_size))
+                    for records in executor.map(lambda start: _tag_blocks(aesgcm,
+                                                                          blocks[start:start + slice_size],
+                                                                          block_number + start),
+                                                starts):
+                        out_f.write(records)
+
+                block_number += len(blocks)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return key  # Return the key for verification
+
+
+def verify_block_with_cipher(aesgcm: AESGCM, block: bytes, block_index: int) -> bool:
     """
-    # Write processed blocks with GMAC to a new file
-    with open(output_file, "wb") as out_f:
-        for _, nonce, block_with_mac in blocks_with_mac:
-            # Write nonce (12 bytes), block, and its GMAC
-            out_f.write(nonce + block_with_mac)
+    Validates a stored block record against a shared AES-GCM cipher context.
+
+    The stored nonce must be the nonce of the block index, a record tagged under another nonce, e.g.
+    the record of another block, is rejected.
+
+    Args:
+    - aesgcm (AESGCM): The shared AES-GCM cipher context, keyed with the key of the file.
+    - block (bytes): The stored record: nonce (12 bytes), data and GMAC tag (last 16 bytes).
+    - block_index (int): The index of the block (used as additional authenticated data).
+
+    Returns:
+    - bool: True if the GMAC is valid and the block is authentic, False otherwise.
+    """
+    # block (nonce + data + GMAC)
+    nonce: bytes = block[:NONCE_SIZE]
+    data: bytes = block[NONCE_SIZE:-GMAC_SIZE]
+    gmac_tag: bytes = block[-GMAC_SIZE:]
+
+    if nonce != nonce_for_block(block_index):
+        return False
+
+    data_with_index: bytes = data + convert_index_to_bytes(block_index)
+
+    try:
+        # Try to verify the GMAC by decrypting (recompute GMAC)
+        aesgcm.decrypt(nonce, gmac_tag, data_with_index)
+        return True
+    except InvalidTag:
+        return False
 
 
 def validate_block_with_gmac(block: bytes, block_index: int, key: bytes) -> bool:
@@ -108,62 +236,184 @@ def validate_block_with_gmac(block: bytes, block_index: int, key: bytes) -> bool
         - data (the actual data),
         - GMAC tag (last 16 bytes).
     - block_index (int): The index of the block (used as additional authenticated data).
-    - key (bytes): The AES key used for the decryption and GMAC verification (256-bit key).
+    - key (bytes): The AES key of the file, derived by `derive_file_key` from the key and the salt of the file.
 
     Returns:
     - bool: True if the GMAC is valid and the block is authentic, False if the GMAC is invalid.
     """
-    # block (nonce + data + GMAC)
-    # Extract the nonce (first 12 bytes)
-    nonce: bytes = block[:12]
+    return verify_block_with_cipher(AESGCM(key), block, block_index)
 
-    # Extract the data (everything in between)
-    data: bytes = block[12:-16]
 
-    # Extract the GMAC (last 16 bytes)
-    gmac_tag: bytes = block[-16:]
+def validate_file_with_gmac(file_path: str, key: bytes, block_size: int = BLOCK_SIZE) -> Optional[int]:
+    """
+    Streams a GMAC-tagged file and validates its blocks in order with a single cipher context.
 
-    index_in_bytes: bytes = convert_index_to_bytes(block_index)
-    data_with_index: bytes = data + index_in_bytes
+    Args:
+    - file_path (str): Path to the file written by `process_file_with_gmac`.
+    - key (bytes): The AES key used for tagging.
+    - block_size (int): Size of the data part of each block (default 1024 bytes).
 
-    # Recompute GMAC for the block
-    aesgcm = AESGCM(key)
-    try:
-        # Try to verify the GMAC by decrypting (recompute GMAC)
-        aesgcm.decrypt(nonce, gmac_tag, data_with_index)
-        return True
-    except Exception as e:
-        return False
+    Returns:
+    - Optional[int]: The index of the first block that failed authentication, or None if all blocks are authentic.
 
+    Raises:
+    - ValueError: If the file is too short to hold a salt.
+    """
+    record_size: int = NONCE_SIZE + block_size + GMAC_SIZE  # 12-byte nonce (IV), up-to 1024-byte data, 16-byte GMAC tag
 
-def validate_file_with_gmac(file_path: str, key: bytes, block_size: int = 1024):
     with open(file_path, "rb") as f:
+        aesgcm = AESGCM(derive_file_key(key, read_file_salt(f)))
         block_index: int = 0
-        while True:
-            # Read the next block (nonce + data + GMAC)
-            full_block: bytes = f.read(NONCE_SIZE + block_size + GMAC_SIZE)  # 12-byte nonce (IV), up-to 1024-byte data, 16-byte GMAC tag
-            if not full_block:
-                break  # End of file
-            isValid: bool = validate_block_with_gmac(full_block, block_index, key)
-
-            if isValid:
-                print(f"Block {block_index} is authenticated.")
+
+        for records in iter_block_batches(f, record_size):
+            for record in records:
+                if not verify_block_with_cipher(aesgcm, record, block_index):
+                    return block_index
+
+                block_index += 1
+
+    return None
+
+
+def merge_block_ranges(block_ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Merges sorted half-open block ranges that touch or overlap.
+
+    Args:
+    - block_ranges (list[tuple[int, int]]): Ranges of block indices as (start, end), sorted by start.
+
+    Returns:
+    - list[tuple[int, int]]: The merged ranges.
+    """
+    merged: list[tuple[int, int]] = []
+    for start, end in block_ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def _find_corrupt_block_ranges(
+        aesgcm: AESGCM,
+        mapped_file: mmap.mmap,
+        record_size: int,
+        first_block_index: int,
+        end_block_index: int,
+        stop_event: Optional[threading.Event]
+) -> list[tuple[int, int]]:
+    """
+    Validates the blocks [first_block_index, end_block_index) of a memory-mapped file, after its salt, and
+    returns the corrupt blocks as half-open ranges. Stops early once `stop_event` is set.
+    """
+    corrupt_ranges: list[tuple[int, int]] = []
+
+    for block_index in range(first_block_index, end_block_index):
+        if stop_event is not None and stop_event.is_set():
+            break
+
+        offset: int = SALT_SIZE + block_index * record_size
+        record: bytes = mapped_file[offset:offset + record_size]
+
+        # A record too short to hold a nonce and a GMAC can not be authentic
+        is_valid: bool = (len(record) > NONCE_SIZE + GMAC_SIZE and
+                          verify_block_with_cipher(aesgcm, record, block_index))
+
+        if not is_valid:
+            if corrupt_ranges and corrupt_ranges[-1][1] == block_index:
+                corrupt_ranges[-1] = (corrupt_ranges[-1][0], block_index + 1)
             else:
-                print(f"Block {block_index} authentication failed")
-                break
+                corrupt_ranges.append((block_index, block_index + 1))
 
-            block_index += 1
+            if stop_event is not None:
+                stop_event.set()
 
+    return corrupt_ranges
 
-# Example usage
-example_file_path = "../PoR.pdf"
-example_output_file = "../processed_with_gmac.txt"
 
-example_blocks_with_mac, example_key = process_file_with_gmac(example_file_path, BLOCK_SIZE)
-write_blocks_to_file(example_blocks_with_mac, example_output_file)
+def validate_file_with_gmac_parallel(
+        file_path: str,
+        key: bytes,
+        block_size: int = BLOCK_SIZE,
+        workers: int = VALIDATION_WORKERS,
+        chunk_blocks: int = BATCH_BLOCKS,
+        stop_at_first_failure: bool = False
+) -> dict:
+    """
+    Validates every block of a GMAC-tagged file in parallel and reports the corrupt blocks.
 
-print(f"Processed file saved to {example_output_file}")
-print(f"AES Key (hex): {example_key.hex()}")
+    The file is memory-mapped and split into chunks of `chunk_blocks` blocks that are validated by a
+    thread pool sharing one cipher context; the AES work runs in OpenSSL outside the GIL. The
+    reported ranges can be fed directly into Reed-Solomon repair.
 
-# Example usage
-validate_file_with_gmac(example_output_file, example_key)
+    Args:
+    - file_path (str): Path to the file written by `process_file_with_gmac`.
+    - key (bytes): The AES key used for tagging.
+    - block_size (int): Size of the data part of each block (default 1024 bytes).
+    - workers (int): Number of validation threads (default: number of CPUs).
+    - chunk_blocks (int): Number of blocks validated per task.
+    - stop_at_first_failure (bool): Stop all workers once a corrupt block is found. The report then
+      holds the corrupt blocks found until that point, not necessarily all of them.
+
+    Returns:
+    - dict: A report with:
+        - "total_blocks" (int): The number of blocks in the file,
+        - "corrupt_blocks" (int): The number of corrupt blocks found,
+        - "corrupt_ranges" (list[tuple[int, int]]): The corrupt blocks as sorted half-open (start, end) ranges.
+
+    Raises:
+    - ValueError: If the file is too short to hold a salt.
+    """
+    record_size: int = NONCE_SIZE + block_size + GMAC_SIZE  # 12-byte nonce (IV), up-to 1024-byte data, 16-byte GMAC tag
+    with open(file_path, "rb") as f:
+        aesgcm = AESGCM(derive_file_key(key, read_file_salt(f)))
+    total_blocks: int = -(-(os.path.getsize(file_path) - SALT_SIZE) // record_size)
+
+    corrupt_ranges: list[tuple[int, int]] = []
+
+    if total_blocks > 0:
+        stop_event: Optional[threading.Event] = threading.Event() if stop_at_first_failure else None
+
+        with open(file_path, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            chunk_starts: range = range(0, total_blocks, chunk_blocks)
+            chunks_corrupt_ranges = executor.map(
+                lambda start: _find_corrupt_block_ranges(aesgcm,
+                                                         mapped_file,
+                                                         record_size,
+                                                         start,
+                                                         min(start + chunk_blocks, total_blocks),
+                                                         stop_event),
+                chunk_starts
+            )
+
+            for chunk_corrupt_ranges in chunks_corrupt_ranges:
+                corrupt_ranges.extend(chunk_corrupt_ranges)
+
+    corrupt_ranges = merge_block_ranges(corrupt_ranges)
+
+    return {
+        "total_blocks": total_blocks,
+        "corrupt_blocks": sum(end - start for start, end in corrupt_ranges),
+        "corrupt_ranges": corrupt_ranges
+    }
+
+
+if __name__ == "__main__":
+    # Example usage
+    example_file_path = "../PoR.pdf"
+    example_output_file = "../processed_with_gmac.txt"
+
+    example_key = process_file_with_gmac(example_file_path, example_output_file, BLOCK_SIZE)
+
+    print(f"Processed file saved to {example_output_file}")
+    print(f"AES Key (hex): {example_key.hex()}")
+
+    # Example usage
+    first_invalid_block = validate_file_with_gmac(example_output_file, example_key)
+    if first_invalid_block is None:
+        print("All blocks are authenticated.")
+    else:
+        print(f"Block {first_invalid_block} authentication failed")
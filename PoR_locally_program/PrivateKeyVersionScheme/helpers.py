@@ -6,7 +6,7 @@ import galois
 from galois import FieldArray
 
 # Local imports
-from PRFs import hmac_prf
+from PRFs import HmacPRF
 
 
 def galois_field_element_to_bytes(element: FieldArray, num_bytes: int) -> bytes:
@@ -54,6 +54,7 @@ def get_blocks_authenticators_by_file_path(
     # Open the file for reading
     with open(file_path, "rb") as f:
         GF: Type[FieldArray] = galois.GF(p)  # Define the finite field GF(p)
+        prf: HmacPRF = HmacPRF(k)  # Key the PRF once for all blocks
         block_index: int = 0
 
         while True:
@@ -63,7 +64,7 @@ def get_blocks_authenticators_by_file_path(
                 break
 
             # Generate the block-specific value for HMAC
-            f_k_i: FieldArray = GF(hmac_prf(k, block_index) % p)
+            f_k_i: FieldArray = GF(prf(block_index) % p)
             block_in_z_p: FieldArray = GF(int.from_bytes(block, byteorder='big') % p)
 
             # Calculate the authenticator for the block using finite field arithmetic
@@ -0,0 +1,45 @@
+# Standard library imports
+import secrets
+import time
+from typing import Callable
+
+# Local imports
+from PRFs import hmac_prf, HmacPRF, Blake2bPRF, AesCtrPRF
+
+
+NUMBER_OF_INDICES: int = 100_000
+
+
+def time_prf(name: str, evaluate: Callable[[list[int]], list[int]], indices: list[int]) -> float:
+    """
+    Time a single evaluation of a PRF over all the given indices and print the throughput.
+
+    :param name: Display name of the PRF variant.
+    :param evaluate: Function that evaluates the PRF over a list of indices.
+    :param indices: Input values (ints).
+    :return: Elapsed time in seconds.
+    """
+    start: float = time.perf_counter()
+    evaluate(indices)
+    elapsed: float = time.perf_counter() - start
+
+    print(f"{name:<28} {elapsed:8.3f} s   {len(indices) / elapsed:14,.0f} evaluations/s")
+    return elapsed
+
+
+k: int = secrets.randbelow(2**256)
+indices: list[int] = list(range(NUMBER_OF_INDICES))
+
+# The keyed HMAC object must stay output-compatible with the original PRF
+assert HmacPRF(k).prf_many(indices[:1000]) == [hmac_prf(k, i) for i in indices[:1000]]
+
+print(f"Evaluating each PRF over {NUMBER_OF_INDICES:,} indices")
+baseline: float = time_prf("hmac_prf (per call)", lambda xs: [hmac_prf(k, i) for i in xs], indices)
+
+for prf_name, prf in (
+        ("HmacPRF.prf_many", HmacPRF(k)),
+        ("Blake2bPRF.prf_many", Blake2bPRF(k)),
+        ("AesCtrPRF.prf_many", AesCtrPRF(k)),
+):
+    elapsed: float = time_prf(prf_name, prf.prf_many, indices)
+    print(f"{'':<28} speedup x{baseline / elapsed:.2f}")
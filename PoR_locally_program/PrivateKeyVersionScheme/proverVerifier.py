@@ -9,10 +9,11 @@ from galois import FieldArray
 from Common.helpers import (
     bytes_needed,
     secure_random_sample,
-    write_file_by_blocks_with_authenticators
+    write_file_by_blocks_with_authenticators,
+    normalize_challenge
 )
 from Common.Constants.primes import PRIME_NUMBER_16_BYTES
-from PRFs import hmac_prf
+from PRFs import HmacPRF
 from helpers import get_blocks_authenticators_by_file_path
 
 p: int = PRIME_NUMBER_16_BYTES
@@ -47,6 +48,9 @@ l: int = secrets.randbelow(n)
 indices: list[int] = secure_random_sample(n, l)
 coefficients: list[int] = [secrets.randbelow(p) for _ in range(l)]
 
+# Merge the queries of the challenge, each challenged block is processed once
+challenge: dict[int, int] = normalize_challenge(zip(indices, coefficients), p)
+
 σ: FieldArray = GF(0)
 μ: FieldArray = GF(0)
 
@@ -62,8 +66,8 @@ with open(output_file, "rb") as f:
         m_i: FieldArray = GF(int.from_bytes(full_block[:-MAC_SIZE], byteorder='big') % p)
         σ_i: FieldArray = GF(int.from_bytes(full_block[-MAC_SIZE:], byteorder='big') % p)
 
-        if block_index in indices:
-            v_i: FieldArray = GF(coefficients[indices.index(block_index)] % p)
+        if block_index in challenge:
+            v_i: FieldArray = GF(challenge[block_index])
             σ += v_i * σ_i
             μ += v_i * m_i
 
@@ -71,9 +75,10 @@ with open(output_file, "rb") as f:
 
 # Verify σ
 Σ: FieldArray = GF(0)
-for i, coefficient in zip(indices, coefficients):
-    v_i: FieldArray = GF(coefficient % p)
-    f_k_i: FieldArray = GF(hmac_prf(k, i) % p)
+f_k: list[int] = HmacPRF(k).prf_many(challenge)
+for f_k_i_as_int, coefficient in zip(f_k, challenge.values()):
+    v_i: FieldArray = GF(coefficient)
+    f_k_i: FieldArray = GF(f_k_i_as_int % p)
     Σ += v_i * f_k_i
 
 calculated_σ_to_verify: FieldArray = α * μ + Σ
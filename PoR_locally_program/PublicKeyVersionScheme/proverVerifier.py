@@ -7,7 +7,7 @@ import py_ecc.bls.hash_to_curve as bls_hash
 import py_ecc.optimized_bls12_381 as bls_opt
 
 # Local imports
-from Common.helpers import secure_random_sample, write_file_by_blocks_with_authenticators
+from Common.helpers import secure_random_sample, write_file_by_blocks_with_authenticators, normalize_challenge
 from helpers import get_blocks_authenticators_by_file_path, DST, HASH_INDEX_BYTES, p, MAC_SIZE, BLOCK_SIZE, generate_x, \
     generate_g, generate_v, generate_u, MAC_SIZE_3D
 
@@ -41,6 +41,9 @@ l: int = secrets.randbelow(n)
 indices: list[int] = secure_random_sample(n, l)
 coefficients: list[int] = [secrets.randbelow(p) for _ in range(l)]
 
+# Merge the queries of the challenge, each challenged block is processed once
+challenge: dict[int, int] = normalize_challenge(zip(indices, coefficients), p)
+
 σ = None
 μ: int = 0
 
@@ -69,8 +72,8 @@ with open(output_file, "rb") as f:
                bls_opt.FQ(mac_y_coordinate_as_int),
                bls_opt.FQ(mac_z_coordinate_as_int))
 
-        if block_index in indices:
-            v_i: int = coefficients[indices.index(block_index)]
+        if block_index in challenge:
+            v_i: int = challenge[block_index]
             σ_i_power_v_i = bls_opt.multiply(σ_i, v_i)   # (σ_i)^(v_i)
 
             if σ is None:
@@ -88,9 +91,7 @@ with open(output_file, "rb") as f:
 left_pairing = bls_opt.pairing(g, σ)   # e(σ, g)
 
 Π_H_i_multiply_v_i = None
-for i, coefficient in zip(indices, coefficients):
-    v_i: int = coefficient
-
+for i, v_i in challenge.items():
     H_i = bls_hash.hash_to_G1(i.to_bytes(HASH_INDEX_BYTES, byteorder='big'), DST, sha256)  # H(i)
 
     H_i_multiply_v_i = bls_opt.multiply(H_i, v_i)  # H(i)^(v_i)
@@ -3,7 +3,7 @@ import secrets
 
 # Local imports
 from Common.Constants.primes import LOW_PRIME
-from Common.helpers import secure_random_sample, write_file_by_blocks_with_authenticators
+from Common.helpers import secure_random_sample, write_file_by_blocks_with_authenticators, normalize_challenge
 from PublicKeyVersionScheme.helpers import MAC_SIZE, MAC_SIZE_3D
 from helpers import get_blocks_authenticators_by_file_path, add, multiply, hash, pairing
 
@@ -45,6 +45,9 @@ l: int = secrets.randbelow(n)
 indices: list[int] = secure_random_sample(n, l)
 coefficients: list[int] = [secrets.randbelow(p) for _ in range(l)]
 
+# Merge the queries of the challenge, each challenged block is processed once
+challenge: dict[int, int] = normalize_challenge(zip(indices, coefficients), p)
+
 σ = None
 μ: int = 0
 
@@ -71,8 +74,8 @@ with open(output_file, "rb") as f:
 
         σ_i = mac_x_coordinate_as_int
 
-        if block_index in indices:
-            v_i: int = coefficients[indices.index(block_index)]
+        if block_index in challenge:
+            v_i: int = challenge[block_index]
             σ_i_power_v_i = multiply(σ_i, v_i)   # (σ_i)^(v_i)
 
             if σ is None:
@@ -90,9 +93,7 @@ with open(output_file, "rb") as f:
 left_pairing = pairing(g, σ)   # e(σ, g)
 
 Π_H_i_multiply_v_i = None
-for i, coefficient in zip(indices, coefficients):
-    v_i: int = coefficient
-
+for i, v_i in challenge.items():
     H_i = hash(i)  # H(i)
 
     H_i_multiply_v_i = multiply(H_i, v_i)  # H(i)^(v_i)
@@ -0,0 +1,449 @@
+# Standard library imports
+import argparse
+import json
+import os
+import platform
+import secrets
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable
+
+REPO_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "PoR_Application"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "storage_server"))
+sys.path.append(os.path.join(REPO_ROOT, "PoR_locally_program", "PrivateKeyVersionScheme"))
+
+# Third-party library imports
+import py_ecc.optimized_bls12_381 as bls_opt
+
+# Local imports
+from BLS_12_381.helpers import get_blocks_authenticators_by_file_path, curve_field_element_to_bytes, p, MAC_SIZE, \
+    BLOCK_SIZE, generate_x, generate_g, generate_v, generate_u, compress_g1_points_to_hex, hash_indices_to_G1, \
+    HASH_INDEX_BYTES, DST, get_block_size
+from BLS_12_381.glv import multiply_g1
+from BLS_12_381.curve_backend import curve, PyEccCurveBackend
+from Common.helpers import secure_random_sample, normalize_challenge
+from Common.ReedSolomon.reedSolomon import encode_file_with_rs, decode_file_with_rs
+from GMAC import process_file_with_gmac, validate_file_with_gmac_parallel
+
+
+BENCHMARKS: tuple[str, ...] = ("tag", "prove", "verify", "multiply", "normalize", "hash", "rs", "gmac")
+SIZE_UNITS: dict[str, int] = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+WRITE_CHUNK_BLOCKS: int = 1024
+MULTIPLY_BATCH: int = 100  # G1 scalar multiplications per run of the multiply benchmark
+NORMALIZE_BATCH: int = 1000  # G1 points per run of the normalize benchmark
+HASH_BATCH: int = 100  # Block indices hashed to G1 per run of the hash benchmark
+
+
+def parse_size(size: str) -> int:
+    """
+    Parse a size such as "512KB", "16MB" or "2GB" (or a plain number of bytes).
+
+    :param size: The size to parse.
+    :return: The size in bytes.
+    """
+    size = size.strip().upper()
+    for unit, multiplier in SIZE_UNITS.items():
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * multiplier)
+
+    return int(size)
+
+
+def format_size(size: int) -> str:
+    """
+    Format a size in bytes with the largest unit that divides it.
+
+    :param size: The size in bytes.
+    :return: The formatted size.
+    """
+    for unit, multiplier in reversed(SIZE_UNITS.items()):
+        if size >= multiplier and size % multiplier == 0:
+            return f"{size // multiplier}{unit}"
+
+    return f"{size}B"
+
+
+def write_random_file(file_path: str, size: int) -> None:
+    """
+    Write a file of random bytes, one chunk at a time.
+
+    :param file_path: The path of the file to write.
+    :param size: The size of the file in bytes.
+    """
+    with open(file_path, "wb") as f:
+        remaining: int = size
+        while remaining > 0:
+            chunk_size: int = min(remaining, WRITE_CHUNK_BLOCKS * BLOCK_SIZE)
+            f.write(os.urandom(chunk_size))
+            remaining -= chunk_size
+
+
+def write_synthetic_tagged_file(file_path: str, size: int) -> int:
+    """
+    Write a file in the stored layout (data block followed by its 3d point authenticator) with
+    random data and one valid G1 point repeated as the authenticator of every block.
+
+    The prover does the same work for any valid point, so this gives realistic proving times for
+    files far too large to be tagged for real.
+
+    :param file_path: The path of the file to write.
+    :param size: The size of the data in bytes.
+    :return: The number of blocks in the file.
+    """
+    authenticator: bytes = curve_field_element_to_bytes(curve.multiply_g1(curve.g1_generator(), secrets.randbelow(p)),
+                                                        MAC_SIZE)
+    number_of_blocks: int = -(-size // BLOCK_SIZE)
+
+    with open(file_path, "wb") as f:
+        for first_block in range(0, number_of_blocks, WRITE_CHUNK_BLOCKS):
+            data: bytes = os.urandom(min(WRITE_CHUNK_BLOCKS * BLOCK_SIZE, size - first_block * BLOCK_SIZE))
+            f.write(b"".join(data[offset:offset + BLOCK_SIZE] + authenticator
+                             for offset in range(0, len(data), BLOCK_SIZE)))
+
+    return number_of_blocks
+
+
+class StubResponse:
+    """
+    The subset of `requests.Response` used by the storage server.
+    """
+
+    def __init__(self, body: dict, status_code: int = 200):
+        self.body = body
+        self.status_code = status_code
+
+    def json(self) -> dict:
+        return self.body
+
+
+class StubGatewayClientProvider:
+    """
+    Stands in for `SolanaGatewayClientProvider` in the prover, answering with random queries
+    of `query_size` blocks and accepting every proof, without any network round trip.
+    """
+
+    number_of_blocks: int = 1
+    query_size: int = 1
+
+    def generate_queries(self, user_private_key: str, escrow_pubkey: str) -> StubResponse:
+        return StubResponse({"message": "Queries generated successfully"})
+
+    def get_queries_by_escrow(self, escrow_pubkey: str) -> StubResponse:
+        indices: list[int] = [secrets.randbelow(self.number_of_blocks) for _ in range(self.query_size)]
+        return StubResponse({"queries": [[i, format(secrets.randbelow(p), "064x")] for i in indices]})
+
+    def prove(self, seller_private_key: str, escrow_public_key: str, sigma: str, mu: str) -> StubResponse:
+        return StubResponse({"message": "Subscription extended successfully"})
+
+
+def verify_proof(challenge: dict[int, int], σ, μ: int, u, g, v) -> bool:
+    """
+    Verify a proof the way the escrow program does: e(σ, g) == e(Π(H(i)^(v_i)) * u^μ, v), over
+    the challenge merged by `normalize_challenge`.
+    """
+    from StorageServer.BLS12_381.helpers import hash_indices_to_G1
+
+    Π_H_i_multiply_v_i = curve.multiexp_g1(hash_indices_to_G1(challenge), challenge.values())
+    return curve.pairings_equal(σ, g, curve.add_g1(Π_H_i_multiply_v_i, curve.multiply_g1(u, μ)), v)
+
+
+def measure(function: Callable[[], object], repeat: int) -> list[float]:
+    """
+    Run a function `repeat` times and return the elapsed time of every run in seconds.
+    """
+    timings: list[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def result_label(name: str, file_size: int, query_size: int) -> str:
+    """
+    Format the name, file size and query size of a benchmark as aligned columns.
+    """
+    file_size_column: str = format_size(file_size) if file_size else ""
+    query_size_column: str = f"l={query_size}" if query_size else ""
+    return f"{name:<24} {file_size_column:>8} {query_size_column:>8}"
+
+
+def make_result(name: str, timings: list[float], file_size: int = 0, query_size: int = 0) -> dict:
+    """
+    Build the JSON record of a benchmark and print a line for it.
+    """
+    median: float = statistics.median(timings)
+    result = {
+        "name": name,
+        "file_size": file_size,
+        "query_size": query_size,
+        "repeat": len(timings),
+        "seconds_min": min(timings),
+        "seconds_median": median,
+        "mb_per_second": file_size / SIZE_UNITS["MB"] / median if file_size and median > 0 else None
+    }
+
+    throughput: str = f"{result['mb_per_second']:10.2f} MB/s" if result["mb_per_second"] is not None else ""
+    print(f"{result_label(name, file_size, query_size)} {median:10.3f} s {throughput}")
+    return result
+
+
+def run_benchmarks(args: argparse.Namespace, work_dir: str) -> list[dict]:
+    """
+    Run the selected benchmarks in `work_dir` and return their results.
+    """
+    # The storage server creates its storage directory on import, keep it inside the work directory
+    os.chdir(work_dir)
+    from StorageServer import api
+
+    api.SolanaGatewayClientProvider = StubGatewayClientProvider
+    api.UPLOAD_FOLDER = work_dir
+
+    results: list[dict] = []
+
+    for size in args.sizes:
+        data_path: str = os.path.join(work_dir, "data.bin")
+
+        if "tag" in args.benchmarks and size <= args.max_tag_size:
+            write_random_file(data_path, size)
+            x: int = generate_x()
+            u = generate_u()
+            for sectors in args.sectors:
+                # The legacy single sector blocks keep the name of the results they are compared with
+                results.append(make_result("tag" if sectors == 1 else f"tag_{sectors}_sectors", measure(
+                    lambda: get_blocks_authenticators_by_file_path(data_path, get_block_size(sectors), p, x, u,
+                                                                   MAC_SIZE, sectors),
+                    args.repeat), file_size=size))
+
+        if "prove" in args.benchmarks:
+            StubGatewayClientProvider.number_of_blocks = write_synthetic_tagged_file(
+                os.path.join(work_dir, "tagged.bin"), size)
+            for query_size in args.query_sizes:
+                StubGatewayClientProvider.query_size = query_size
+                results.append(make_result("prove", measure(
+                    lambda: api.calculate_sigma_mu_and_prove("tagged.bin", "escrow"),
+                    args.repeat), file_size=size, query_size=query_size))
+            os.remove(os.path.join(work_dir, "tagged.bin"))
+
+        if "rs" in args.benchmarks and size <= args.max_rs_size:
+            write_random_file(data_path, size)
+            encoded_path: str = os.path.join(work_dir, "data.rs")
+            results.append(make_result("rs_encode", measure(
+                lambda: encode_file_with_rs(data_path, encoded_path), args.repeat), file_size=size))
+            results.append(make_result("rs_decode", measure(
+                lambda: decode_file_with_rs(encoded_path, os.path.join(work_dir, "data.decoded")),
+                args.repeat), file_size=size))
+
+        if "gmac" in args.benchmarks:
+            write_random_file(data_path, size)
+            gmac_path: str = os.path.join(work_dir, "data.gmac")
+            key: bytes = process_file_with_gmac(data_path, gmac_path)
+            results.append(make_result("gmac_tag", measure(
+                lambda: process_file_with_gmac(data_path, gmac_path, key=key, workers=args.workers),
+                args.repeat), file_size=size))
+            results.append(make_result("gmac_validate", measure(
+                lambda: validate_file_with_gmac_parallel(gmac_path, key, workers=args.workers),
+                args.repeat), file_size=size))
+
+        for file_name in os.listdir(work_dir):
+            if os.path.isfile(os.path.join(work_dir, file_name)):
+                os.remove(os.path.join(work_dir, file_name))
+
+    if "verify" in args.benchmarks:
+        # Verification cost depends on the number of queries only, not on the file size
+        x: int = generate_x()
+        g = generate_g()
+        v = generate_v(g, x)
+        u = generate_u()
+        σ = curve.multiply_g1(curve.g1_generator(), secrets.randbelow(p))
+        for query_size in args.query_sizes:
+            indices: list[int] = secure_random_sample(max(query_size, 1 << 20), query_size)
+            challenge: dict[int, int] = normalize_challenge(((i, secrets.randbelow(p)) for i in indices), p)
+            results.append(make_result("verify", measure(
+                lambda: verify_proof(challenge, σ, secrets.randbelow(p), u, g, v),
+                args.repeat), query_size=query_size))
+
+    if "multiply" in args.benchmarks:
+        # Cross-check the GLV multiplication and the curve backend's with py_ecc's on random points and
+        # scalars, then time them
+        py_ecc_curve = PyEccCurveBackend()
+        points_and_scalars: list[tuple] = [(bls_opt.multiply(bls_opt.G1, secrets.randbelow(p)), secrets.randbelow(p))
+                                           for _ in range(MULTIPLY_BATCH)]
+        backend_points_and_scalars: list[tuple] = [(curve.decompress_g1(py_ecc_curve.compress_g1(point)), scalar)
+                                                   for point, scalar in points_and_scalars]
+        for (point, scalar), (backend_point, _) in zip(points_and_scalars, backend_points_and_scalars):
+            product: bytes = py_ecc_curve.compress_g1(bls_opt.multiply(point, scalar))
+            if py_ecc_curve.compress_g1(multiply_g1(point, scalar)) != product:
+                raise AssertionError(f"multiply_g1 differs from bls_opt.multiply for the scalar {scalar}")
+            if curve.compress_g1(curve.multiply_g1(backend_point, scalar)) != product:
+                raise AssertionError(f"The {curve.name} backend differs from bls_opt.multiply for the scalar {scalar}")
+
+        results.append(make_result("g1_multiply_py_ecc", measure(
+            lambda: [bls_opt.multiply(point, scalar) for point, scalar in points_and_scalars],
+            args.repeat), query_size=MULTIPLY_BATCH))
+        results.append(make_result("g1_multiply_glv", measure(
+            lambda: [multiply_g1(point, scalar) for point, scalar in points_and_scalars],
+            args.repeat), query_size=MULTIPLY_BATCH))
+        if curve.name != py_ecc_curve.name:
+            results.append(make_result(f"g1_multiply_{curve.name}", measure(
+                lambda: [curve.multiply_g1(point, scalar) for point, scalar in backend_points_and_scalars],
+                args.repeat), query_size=MULTIPLY_BATCH))
+
+    if "normalize" in args.benchmarks:
+        from StorageServer.BLS12_381.helpers import bytes_to_curve_field_element, bytes_to_curve_field_elements
+
+        # Points as the multiplications leave them, not normalized, and their authenticator bytes
+        points: list = [curve.multiply_g1(curve.g1_generator(), secrets.randbelow(p))]
+        for _ in range(NORMALIZE_BATCH - 1):
+            points.append(curve.add_g1(points[-1], curve.g1_generator()))
+        authenticators: list[bytes] = [b"".join(coordinate.to_bytes(MAC_SIZE, 'big')
+                                                for coordinate in curve.to_projective(point))
+                                       for point in points]
+
+        # Cross-check the batch normalization with the normalization of every point on its own
+        if compress_g1_points_to_hex(points) != [curve.compress_g1(point).hex() for point in points]:
+            raise AssertionError("compress_g1_points_to_hex differs from compress_g1")
+        if [curve.compress_g1(point) for point in bytes_to_curve_field_elements(authenticators, MAC_SIZE)] != \
+                [curve.compress_g1(point) for point in points]:
+            raise AssertionError("bytes_to_curve_field_elements differs from the points of the authenticators")
+
+        results.append(make_result("g1_parse_per_point", measure(
+            lambda: [bytes_to_curve_field_element(authenticator, MAC_SIZE) for authenticator in authenticators],
+            args.repeat), query_size=NORMALIZE_BATCH))
+        results.append(make_result("g1_parse_batch", measure(
+            lambda: bytes_to_curve_field_elements(authenticators, MAC_SIZE),
+            args.repeat), query_size=NORMALIZE_BATCH))
+        results.append(make_result("g1_compress_per_point", measure(
+            lambda: [curve.compress_g1(point) for point in points],
+            args.repeat), query_size=NORMALIZE_BATCH))
+        results.append(make_result("g1_compress_batch", measure(
+            lambda: compress_g1_points_to_hex(points),
+            args.repeat), query_size=NORMALIZE_BATCH))
+
+    if "hash" in args.benchmarks:
+        # Cross-check the bulk hashing of block indices with the hashing of every index on its own
+        indices: range = range(HASH_BATCH)
+        messages: list[bytes] = [index.to_bytes(HASH_INDEX_BYTES, 'big') for index in indices]
+        if compress_g1_points_to_hex(hash_indices_to_G1(indices)) != \
+                compress_g1_points_to_hex([curve.hash_to_g1(message, DST) for message in messages]):
+            raise AssertionError("hash_indices_to_G1 differs from hash_to_g1")
+
+        results.append(make_result("hash_to_g1_per_index", measure(
+            lambda: [curve.hash_to_g1(message, DST) for message in messages],
+            args.repeat), query_size=HASH_BATCH))
+        results.append(make_result("hash_to_g1_batch", measure(
+            lambda: hash_indices_to_G1(indices),
+            args.repeat), query_size=HASH_BATCH))
+
+    return results
+
+
+def compare_results(results: list[dict], baseline_path: str, tolerance: float) -> bool:
+    """
+    Compare results with a baseline results file and print the ratio of every common benchmark.
+
+    :return: True if no benchmark is slower than the baseline by more than `tolerance`.
+    """
+    with open(baseline_path) as f:
+        baseline: dict = json.load(f)
+
+    baseline_medians: dict = {(r["name"], r["file_size"], r["query_size"]): r["seconds_median"]
+                              for r in baseline["results"]}
+
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%}):")
+    is_within_tolerance: bool = True
+    for result in results:
+        key = (result["name"], result["file_size"], result["query_size"])
+        if key not in baseline_medians or baseline_medians[key] == 0:
+            continue
+
+        ratio: float = result["seconds_median"] / baseline_medians[key]
+        is_regression: bool = ratio > 1 + tolerance
+        is_within_tolerance = is_within_tolerance and not is_regression
+        print(f"{result_label(*key)} x{ratio:6.2f} {'REGRESSION' if is_regression else ''}")
+
+    return is_within_tolerance
+
+
+def get_git_commit() -> str:
+    """
+    Return the commit of the working tree, or "unknown" outside a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark tagging, proving, verifying, Reed-Solomon and GMAC.")
+    parser.add_argument("--benchmarks", type=lambda s: s.split(","), default=list(BENCHMARKS),
+                        help=f"Comma separated benchmarks to run, out of {','.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--sizes", type=lambda s: [parse_size(size) for size in s.split(",")], default=[parse_size("1MB")],
+                        help="Comma separated synthetic file sizes, e.g. 1MB,64MB,2GB (default: 1MB)")
+    parser.add_argument("--query-sizes", type=lambda s: [int(q) for q in s.split(",")], default=[1, 10, 100],
+                        help="Comma separated query sizes for proving and verifying (default: 1,10,100)")
+    parser.add_argument("--sectors", type=lambda s: [int(sectors) for sectors in s.split(",")], default=[1],
+                        help="Comma separated sectors per block to tag with, e.g. 1,8,33 (default: 1)")
+    parser.add_argument("--max-tag-size", type=parse_size, default=parse_size("1MB"),
+                        help="Largest file size tagged for real, tagging is the slowest step (default: 1MB)")
+    parser.add_argument("--max-rs-size", type=parse_size, default=parse_size("64MB"),
+                        help="Largest file size Reed-Solomon encoded and decoded (default: 64MB)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="GMAC threads (default: CPUs)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of every benchmark (default: 3)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Path of the JSON results file")
+    parser.add_argument("--compare", help="Path of a baseline JSON results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown relative to the baseline before failing (default: 0.2)")
+    args = parser.parse_args()
+
+    unknown_benchmarks: set[str] = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown_benchmarks:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown_benchmarks))}")
+
+    output_path: str = os.path.abspath(args.output)
+    baseline_path: str = os.path.abspath(args.compare) if args.compare else None
+
+    with tempfile.TemporaryDirectory(prefix="por_benchmark_") as work_dir:
+        results: list[dict] = run_benchmarks(args, work_dir)
+        os.chdir(REPO_ROOT)
+
+    report = {
+        "created": datetime.now().isoformat(),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "curve_backend": curve.name,
+        "parameters": {
+            "benchmarks": args.benchmarks,
+            "sizes": args.sizes,
+            "query_sizes": args.query_sizes,
+            "sectors": args.sectors,
+            "max_tag_size": args.max_tag_size,
+            "max_rs_size": args.max_rs_size,
+            "workers": args.workers,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+    if baseline_path and not compare_results(results, baseline_path, args.tolerance):
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
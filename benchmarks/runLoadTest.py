@@ -0,0 +1,520 @@
+# Standard library imports
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import re
+import secrets
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+REPO_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "gateway_simulator"))
+
+# Third-party library imports
+import requests
+
+# Local imports
+from runBenchmarks import parse_size, format_size, write_random_file, get_git_commit
+from BLS_12_381.helpers import get_blocks_authenticators_by_file_path, compress_g1_to_hex, compress_g2_to_hex, p, \
+    MAC_SIZE, BLOCK_SIZE, generate_x, generate_g, generate_v, generate_u
+from Common.helpers import write_file_by_blocks_with_authenticators
+from Common.ReedSolomon.reedSolomon import encode_file_with_rs
+
+
+SOL_IN_LAMPORTS: int = 1_000_000_000
+MIN_SUBSCRIPTION_DURATION: int = 3  # Proofs of the escrow program before the seller is paid for each proof
+QUANTILES: tuple[float, ...] = (0.5, 0.95, 0.99)
+METRIC_LINE_PATTERN = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(?P<labels>[^}]*)\})? (?P<value>\S+)$')
+LABEL_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+
+# Summary figures compared across releases, and whether a higher value is better
+COMPARED_FIGURES: dict[str, bool] = {
+    "proof_success_rate": True,
+    "proofs_per_second": True,
+    "validation_window_misses": False,
+    "overdue_escrows_ratio": False,
+    "scheduler_lag_p95_seconds": False,
+    "scheduler_lag_p99_seconds": False,
+    "proof_latency_p95_seconds": False,
+    "proof_latency_p99_seconds": False
+}
+
+
+def parse_distribution(value: str) -> list[tuple[int, int, float]]:
+    """
+    Parse a distribution of integers, comma separated choices such as "60,120,300", weighted
+    choices such as "60:3,300:1", or uniform ranges such as "60-300" (weighted as well).
+
+    :param value: The distribution to parse.
+    :return: The choices as (low, high, weight) tuples.
+    """
+    choices: list[tuple[int, int, float]] = []
+    for choice in value.split(","):
+        choice, _, weight = choice.partition(":")
+        low, _, high = choice.partition("-")
+        choices.append((int(low), int(high or low), float(weight or 1)))
+
+    return choices
+
+
+def sample_distribution(choices: list[tuple[int, int, float]], rng: random.Random) -> int:
+    """
+    Draw an integer from a distribution parsed by `parse_distribution`.
+    """
+    low, high, _ = rng.choices(choices, weights=[weight for _, _, weight in choices])[0]
+    return rng.randint(low, high)
+
+
+def create_tagged_file(task: tuple[str, int]) -> dict:
+    """
+    Create a synthetic file the way the PoR application encodes one: random data, Reed-Solomon
+    encoded, and tagged with fresh keys, each block followed by its authenticator.
+
+    Runs in the worker processes of the tagging pool.
+
+    :param task: The path of the encoded file to write and the size of its data in bytes.
+    :return: The path, the number of blocks and the public parameters (u, g, v) of the file.
+    """
+    encoded_path, size = task
+    data_path: str = encoded_path + ".data"
+    write_random_file(data_path, size)
+    encode_file_with_rs(data_path, encoded_path)
+    os.remove(data_path)
+
+    x: int = generate_x()
+    g = generate_g()
+    v = generate_v(g, x)
+    u = generate_u()
+
+    blocks_with_authenticators: list[tuple[bytes, bytes]] = get_blocks_authenticators_by_file_path(
+        encoded_path, BLOCK_SIZE, p, x, u, MAC_SIZE)
+    write_file_by_blocks_with_authenticators(encoded_path, blocks_with_authenticators)
+
+    return {
+        "path": encoded_path,
+        "number_of_blocks": len(blocks_with_authenticators),
+        "u": compress_g1_to_hex(u),
+        "g": compress_g2_to_hex(g),
+        "v": compress_g2_to_hex(v)
+    }
+
+
+def gateway_request(gateway_url: str, endpoint: str, payload: dict) -> dict:
+    """
+    Send a request to the Solana API Gateway, or its simulator.
+
+    :return: The JSON response.
+    :raises RuntimeError: If the gateway responds with an error.
+    """
+    response = requests.post(f"{gateway_url}/{endpoint}", json=payload, timeout=60)
+    if not 200 <= response.status_code < 300:
+        raise RuntimeError(f"{endpoint} failed with {response.status_code}: {response.text}")
+
+    return response.json()
+
+
+def subscribe_and_upload(subscription: dict, args: argparse.Namespace, seller_pubkey: str, start_time: float) -> dict:
+    """
+    Start the subscription of a tagged file, fund it for the whole run and upload the file to the
+    storage server at its scheduled time.
+
+    :return: The subscription with its escrow public key and the time of its upload.
+    """
+    time.sleep(max(0.0, start_time + subscription["upload_offset"] - time.monotonic()))
+    buyer_private_key: str = subscription["buyer_private_key"]
+
+    escrow_pubkey: str = gateway_request(args.gateway_url, "start_subscription", {
+        "buyer_private_key": buyer_private_key,
+        "seller_pubkey": seller_pubkey,
+        "u": subscription["u"],
+        "g": subscription["g"],
+        "v": subscription["v"],
+        "query_size": subscription["query_size"],
+        "number_of_blocks": subscription["number_of_blocks"],
+        "validate_every": subscription["validate_every"]
+    })["escrow_pubkey"]
+
+    # Pay every proof of the run, twice over, so no proof is skipped for lack of balance
+    proofs: int = args.ramp_up // subscription["validate_every"] + args.duration // subscription["validate_every"] + 1
+    amount: int = 2 * max(proofs - MIN_SUBSCRIPTION_DURATION, 1) * \
+        math.ceil((1.0 + 0.05 * subscription["query_size"]) * SOL_IN_LAMPORTS)
+    gateway_request(args.gateway_url, "add_funds_to_subscription", {
+        "buyer_private_key": buyer_private_key, "escrow_pubkey": escrow_pubkey, "amount": amount})
+
+    with open(subscription["path"], "rb") as f:
+        response = requests.post(f"{args.server_url}/api/upload", data={"escrow_public_key": escrow_pubkey},
+                                 files={"file": (os.path.basename(subscription["path"]), f)}, timeout=300)
+    if not 200 <= response.status_code < 300:
+        raise RuntimeError(f"Upload of {subscription['path']} failed with {response.status_code}: {response.text}")
+    os.remove(subscription["path"])
+
+    return dict(subscription, escrow_pubkey=escrow_pubkey, uploaded_at=time.time())
+
+
+def scrape_metrics(metrics_url: str) -> dict[tuple[str, tuple[tuple[str, str], ...]], float]:
+    """
+    Scrape the metrics of the storage server in the Prometheus text exposition format.
+
+    :return: The value of every sample, by metric name and sorted labels.
+    """
+    response = requests.get(metrics_url, timeout=30)
+    response.raise_for_status()
+
+    samples: dict = {}
+    for line in response.text.splitlines():
+        match = METRIC_LINE_PATTERN.match(line)
+        if match is None:
+            continue
+
+        labels: tuple = tuple(sorted(LABEL_PATTERN.findall(match.group("labels") or "")))
+        samples[(match.group("name"), labels)] = float(match.group("value"))
+
+    return samples
+
+
+def counter_delta(previous: dict, current: dict, name: str, **labels) -> float:
+    """
+    The increase of a counter between two scrapes, summed over the series matching `labels`.
+    """
+    def total(samples: dict) -> float:
+        return sum(value for (sample_name, sample_labels), value in samples.items()
+                   if sample_name == name and set(labels.items()) <= set(sample_labels))
+
+    return max(total(current) - total(previous), 0.0)
+
+
+def histogram_delta(previous: dict, current: dict, name: str, **labels) -> list[tuple[float, float]]:
+    """
+    The cumulative bucket counts a histogram gained between two scrapes.
+
+    :return: (upper bound, cumulative count) pairs, by increasing upper bound.
+    """
+    buckets: dict[float, float] = {}
+    for samples, sign in ((current, 1), (previous, -1)):
+        for (sample_name, sample_labels), value in samples.items():
+            sample_labels = dict(sample_labels)
+            if sample_name == f"{name}_bucket" and labels.items() <= sample_labels.items():
+                upper_bound: float = float(sample_labels["le"])
+                buckets[upper_bound] = buckets.get(upper_bound, 0.0) + sign * value
+
+    return sorted((upper_bound, max(count, 0.0)) for upper_bound, count in buckets.items())
+
+
+def histogram_quantile(buckets: list[tuple[float, float]], quantile: float) -> Optional[float]:
+    """
+    Estimate a quantile from cumulative bucket counts, interpolating linearly within the bucket
+    that holds it, as Prometheus does. Observations past the last finite bound count as that bound.
+
+    :return: The quantile, or None without observations.
+    """
+    if not buckets or buckets[-1][1] == 0:
+        return None
+
+    rank: float = quantile * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for upper_bound, count in buckets:
+        if count >= rank:
+            if math.isinf(upper_bound):
+                return lower_bound
+            if count == lower_count:
+                return upper_bound
+            return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = upper_bound, count
+
+    return lower_bound
+
+
+def count_overdue_escrows(subscriptions: list[dict], args: argparse.Namespace, rng: random.Random) -> tuple[int, int]:
+    """
+    Check a sample of the escrows on the gateway: an escrow is overdue when its last proof, or its
+    upload before the first proof, is older than its `validate_every` plus the grace period.
+
+    :return: The number of overdue escrows and of checked escrows.
+    """
+    sample: list[dict] = rng.sample(subscriptions, min(args.escrow_sample, len(subscriptions)))
+
+    def is_overdue(subscription: dict) -> Optional[bool]:
+        try:
+            escrow: dict = gateway_request(args.gateway_url, "get_escrow_data",
+                                           {"escrow_pubkey": subscription["escrow_pubkey"]})
+        except (requests.RequestException, RuntimeError):
+            return None     # Unreachable, not counted
+
+        last_proof: float = max(escrow["last_prove_date"], subscription["uploaded_at"])
+        return time.time() - last_proof > subscription["validate_every"] + args.grace
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results: list[Optional[bool]] = list(executor.map(is_overdue, sample))
+
+    checked: list[bool] = [result for result in results if result is not None]
+    return sum(checked), len(checked)
+
+
+def summarize_window(previous: dict, current: dict) -> dict:
+    """
+    Summarize the proofs, the scheduler lag and the proof latency between two scrapes.
+    """
+    successes: float = counter_delta(previous, current, "storage_proofs_total", result="success")
+    failures: float = counter_delta(previous, current, "storage_proofs_total", result="failure")
+    lag_buckets = histogram_delta(previous, current, "storage_scheduler_lag_seconds")
+    latency_buckets = histogram_delta(previous, current, "storage_proof_phase_duration_seconds", phase="total")
+    lag_count: float = lag_buckets[-1][1] if lag_buckets else 0.0
+
+    window: dict = {
+        "proofs_success": int(successes),
+        "proofs_failure": int(failures),
+        "proof_success_rate": successes / (successes + failures) if successes + failures else None,
+        "validation_window_misses": int(counter_delta(previous, current, "storage_validation_window_misses_total")),
+        "scheduler_lag_mean_seconds": counter_delta(previous, current, "storage_scheduler_lag_seconds_sum") / lag_count
+        if lag_count else None
+    }
+    for figure, buckets in (("scheduler_lag", lag_buckets), ("proof_latency", latency_buckets)):
+        for quantile in QUANTILES:
+            window[f"{figure}_p{round(quantile * 100)}_seconds"] = histogram_quantile(buckets, quantile)
+
+    return window
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    """
+    Format an optional duration for the progress lines.
+    """
+    return f"{seconds:7.3f}s" if seconds is not None else "      -"
+
+
+def end_subscriptions(subscriptions: list[dict], args: argparse.Namespace) -> None:
+    """
+    End the subscriptions as their buyers, the storage server then requests the funds and removes
+    the files on its next scheduler run.
+    """
+    def end_subscription(subscription: dict) -> None:
+        try:
+            gateway_request(args.gateway_url, "end_subscription_by_buyer", {
+                "buyer_private_key": subscription["buyer_private_key"],
+                "escrow_pubkey": subscription["escrow_pubkey"]})
+        except (requests.RequestException, RuntimeError) as e:
+            print(f"Failed to end the subscription of {subscription['escrow_pubkey']}: {e}")
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(end_subscription, subscriptions))
+
+
+def run_load_test(args: argparse.Namespace, work_dir: str) -> dict:
+    """
+    Create, subscribe and upload the tagged files, then sample the metrics of the storage server and
+    the escrows on the gateway every interval until the end of the run.
+
+    :return: The setup timings, the windows and the summary of the steady state, after the ramp-up.
+    """
+    # The storage server creates its storage directory on import, keep it inside the work directory
+    os.chdir(work_dir)
+    from gatewaySimulator import base58_encode, pubkey_of
+    from StorageServer.constants import SELLER_PRIVATE_KEY
+
+    rng = random.Random(args.seed)
+    seller_pubkey: str = args.seller_pubkey or pubkey_of(SELLER_PRIVATE_KEY)
+
+    # Tag the files in parallel, tagging is the slowest step of the setup
+    print(f"Tagging {args.subscriptions} files of {format_size(args.file_size)} with {args.workers} workers...")
+    tagging_start: float = time.perf_counter()
+    tasks: list[tuple[str, int]] = [(os.path.join(work_dir, f"load_{i:06d}.encoded"), args.file_size)
+                                    for i in range(args.subscriptions)]
+    with multiprocessing.Pool(args.workers) as pool:
+        subscriptions: list[dict] = list(pool.imap(create_tagged_file, tasks))
+    tagging_seconds: float = time.perf_counter() - tagging_start
+
+    # The uploads are spread over the ramp-up, the subscriptions do not all fall due together
+    for i, subscription in enumerate(subscriptions):
+        subscription["validate_every"] = sample_distribution(args.validate_every, rng)
+        subscription["query_size"] = sample_distribution(args.query_size, rng)
+        subscription["upload_offset"] = args.ramp_up * i / args.subscriptions
+        # A random keypair: the private key holds the public key in its last 32 bytes
+        subscription["buyer_private_key"] = base58_encode(secrets.token_bytes(64))
+
+    print(f"Subscribing and uploading over {args.ramp_up}s, then measuring for {args.duration}s...")
+    previous: dict = scrape_metrics(args.metrics_url)
+    steady_state_start: dict = previous
+    start_time: float = time.monotonic()
+    end_time: float = start_time + args.ramp_up + args.duration
+    windows: list[dict] = []
+
+    with ThreadPoolExecutor(max_workers=args.upload_concurrency) as executor:
+        futures = [executor.submit(subscribe_and_upload, subscription, args, seller_pubkey, start_time)
+                   for subscription in subscriptions]
+
+        while time.monotonic() < end_time:
+            time.sleep(max(0.0, min(args.interval, end_time - time.monotonic())))
+            current: dict = scrape_metrics(args.metrics_url)
+            elapsed: float = time.monotonic() - start_time
+
+            uploaded: list[dict] = [future.result() for future in futures if future.done() and not future.exception()]
+            overdue, checked = count_overdue_escrows(uploaded, args, rng) if uploaded else (0, 0)
+
+            window: dict = {
+                "elapsed_seconds": round(elapsed, 1),
+                "subscriptions": len(uploaded),
+                **summarize_window(previous, current),
+                "overdue_escrows": overdue,
+                "checked_escrows": checked
+            }
+            windows.append(window)
+            print(f"[{elapsed:7.1f}s] subscriptions {len(uploaded):6d}  proofs {window['proofs_success']:5d} ok "
+                  f"{window['proofs_failure']:4d} failed  misses {window['validation_window_misses']:4d}  "
+                  f"overdue {overdue}/{checked}  lag p99 {format_seconds(window['scheduler_lag_p99_seconds'])}  "
+                  f"latency p99 {format_seconds(window['proof_latency_p99_seconds'])}")
+
+            # The steady state starts once every file is uploaded
+            if elapsed <= args.ramp_up:
+                steady_state_start = current
+            previous = current
+
+        errors: list[BaseException] = [future.exception() for future in futures if future.exception()]
+        uploaded = [future.result() for future in futures if not future.exception()]
+
+    for error in errors[:5]:
+        print(f"Subscription failed: {error}")
+
+    steady_state_windows: list[dict] = [window for window in windows if window["elapsed_seconds"] > args.ramp_up]
+    successes: int = sum(window["proofs_success"] for window in steady_state_windows)
+    checked_escrows: int = sum(window["checked_escrows"] for window in steady_state_windows)
+
+    summary: dict = {
+        "subscriptions": len(uploaded),
+        "failed_subscriptions": len(errors),
+        **summarize_window(steady_state_start, previous),
+        "proofs_per_second": successes / args.duration if args.duration else None,
+        "overdue_escrows_ratio": sum(window["overdue_escrows"] for window in steady_state_windows) / checked_escrows
+        if checked_escrows else None
+    }
+
+    if not args.keep_subscriptions:
+        end_subscriptions(uploaded, args)
+
+    return {"setup": {"tagging_seconds": tagging_seconds}, "windows": windows, "summary": summary}
+
+
+def compare_reports(summary: dict, baseline_path: str, tolerance: float) -> bool:
+    """
+    Compare the summary of a run with a baseline report and print the ratio of every figure.
+
+    :return: True if no figure is worse than the baseline by more than `tolerance`.
+    """
+    with open(baseline_path) as f:
+        baseline: dict = json.load(f)
+
+    if baseline["summary"]["subscriptions"] != summary["subscriptions"]:
+        print(f"Warning: the baseline ran {baseline['summary']['subscriptions']} subscriptions, "
+              f"this run {summary['subscriptions']}")
+
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%}):")
+    is_within_tolerance: bool = True
+    for figure, is_higher_better in COMPARED_FIGURES.items():
+        baseline_value, value = baseline["summary"].get(figure), summary.get(figure)
+        if baseline_value is None or value is None:
+            continue
+
+        if baseline_value == 0:
+            # A miss or an overdue escrow where the baseline had none is a regression
+            ratio: float = 1.0 if value == 0 else math.inf
+        else:
+            ratio = value / baseline_value
+
+        is_regression: bool = ratio < 1 - tolerance if is_higher_better else ratio > 1 + tolerance
+        is_within_tolerance = is_within_tolerance and not is_regression
+        print(f"{figure:<28} {baseline_value:12.4f} -> {value:12.4f}  x{ratio:6.2f} {'REGRESSION' if is_regression else ''}")
+
+    return is_within_tolerance
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Load-test a storage server with simulated subscriptions of tagged files, against the gateway "
+                    "simulator, measuring the proof success rate, the scheduler lag and the proof latency over time.")
+    parser.add_argument("--server-url", default="http://127.0.0.1:8000", help="Storage server (default: %(default)s)")
+    parser.add_argument("--metrics-url",
+                        help="Metrics of the process running the scheduler (default: <server-url>/metrics)")
+    parser.add_argument("--gateway-url", default="http://127.0.0.1:3030",
+                        help="Gateway simulator the storage server uses (default: %(default)s)")
+    parser.add_argument("--subscriptions", type=int, default=100, help="Number of subscriptions (default: 100)")
+    parser.add_argument("--file-size", type=parse_size, default=parse_size("4KB"),
+                        help="Size of the files before encoding (default: 4KB)")
+    parser.add_argument("--validate-every", type=parse_distribution, default=parse_distribution("60"),
+                        help="Seconds between the proofs, choices such as 60,120, weighted choices such as 60:3,300:1 "
+                             "or ranges such as 60-300 (default: 60)")
+    parser.add_argument("--query-size", type=parse_distribution, default=parse_distribution("10"),
+                        help="Blocks queried per proof, as --validate-every (default: 10)")
+    parser.add_argument("--ramp-up", type=int, default=60, help="Seconds to spread the uploads over (default: 60)")
+    parser.add_argument("--duration", type=int, default=300,
+                        help="Seconds measured after the ramp-up, the steady state (default: 300)")
+    parser.add_argument("--interval", type=float, default=10.0, help="Seconds per measurement window (default: 10)")
+    parser.add_argument("--escrow-sample", type=int, default=200,
+                        help="Escrows checked for overdue proofs per window (default: 200)")
+    parser.add_argument("--grace", type=float, default=20.0,
+                        help="Seconds past validate_every before an escrow is overdue, one scheduler run (default: 20)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Tagging processes (default: CPUs)")
+    parser.add_argument("--upload-concurrency", type=int, default=8, help="Concurrent uploads (default: 8)")
+    parser.add_argument("--seller-pubkey", help="Public key of the storage server's seller (default: its constant)")
+    parser.add_argument("--keep-subscriptions", action="store_true",
+                        help="Do not end the subscriptions at the end of the run")
+    parser.add_argument("--seed", type=int, help="Seed of the validate_every and query_size draws (default: random)")
+    parser.add_argument("--output", default="load_test_report.json", help="Path of the JSON report")
+    parser.add_argument("--compare", help="Path of a baseline JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed degradation relative to the baseline before failing (default: 0.2)")
+    args = parser.parse_args()
+
+    args.server_url = args.server_url.rstrip("/")
+    args.gateway_url = args.gateway_url.rstrip("/")
+    args.metrics_url = args.metrics_url or f"{args.server_url}/metrics"
+    output_path: str = os.path.abspath(args.output)
+    baseline_path: str = os.path.abspath(args.compare) if args.compare else None
+
+    with tempfile.TemporaryDirectory(prefix="por_load_test_") as work_dir:
+        results: dict = run_load_test(args, work_dir)
+        os.chdir(REPO_ROOT)
+
+    report = {
+        "created": datetime.now().isoformat(),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {
+            "server_url": args.server_url,
+            "subscriptions": args.subscriptions,
+            "file_size": args.file_size,
+            "validate_every": args.validate_every,
+            "query_size": args.query_size,
+            "ramp_up": args.ramp_up,
+            "duration": args.duration,
+            "interval": args.interval,
+            "grace": args.grace,
+            "seed": args.seed
+        },
+        **results
+    }
+
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("\nSteady state:")
+    for figure, value in results["summary"].items():
+        print(f"{figure:<28} {value}")
+    print(f"\nReport saved to {output_path}")
+
+    if baseline_path and not compare_reports(results["summary"], baseline_path, args.tolerance):
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+# Standard library imports
+import argparse
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+from typing import Optional, Union
+
+REPO_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "storage_server"))
+
+# Third-party library imports
+from flask import Flask, jsonify, request
+
+# Local imports
+from StorageServer.BLS12_381.helpers import p, hash_indices_to_G1, decompress_g1_from_hex, decompress_g2_from_hex, \
+    get_sector_generators
+from StorageServer.BLS12_381.curve_backend import curve
+from StorageServer.Common.helpers import normalize_challenge
+from StorageServer.Common.Constants.SolanaConstants import PROOF_SUBMISSION_DEADLINE
+
+
+# Constants of the escrow program
+MIN_SUBSCRIPTION_DURATION: int = 3  # Proofs before the seller is paid for each proof
+BUYER_REFUND_TIMEOUT: int = 60  # Seconds after the last proof before the buyer can reclaim the balance
+SOL_IN_LAMPORTS: int = 1_000_000_000
+
+# The SlotHashes sysvar holds the hashes of the most recent slots, a slot lasts about 400 ms
+SLOT_HASHES_ENTRIES: int = 512
+SLOT_DURATION_IN_SECONDS: float = 0.4
+
+BASE58_ALPHABET: str = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+# The message of the errors of the escrow program
+ERROR_MESSAGES: dict[str, str] = {
+    "InsufficientFunds": "Insufficient funds",
+    "NoValidationNeeded": "No validation needed at this time",
+    "GenerateAnotherQuery": "Generate another query before proving",
+    "Unauthorized": "Unauthorized operation.",
+    "AccountNotFound": "Account not found"
+}
+
+
+class ProgramError(Exception):
+    """
+    An instruction of the escrow program failed, the transaction of the gateway fails.
+    """
+
+    def __init__(self, error_code: str, status_code: int = 500):
+        super().__init__(ERROR_MESSAGES[error_code])
+        self.error_code = error_code
+        self.status_code = status_code
+
+
+def base58_encode(data: bytes) -> str:
+    """
+    Encode bytes in Base58, the encoding of the Solana keys.
+    """
+    number: int = int.from_bytes(data, byteorder='big')
+    encoded: str = ""
+    while number > 0:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+
+    # Each leading zero byte is a leading '1'
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + encoded
+
+
+def base58_decode(encoded: str) -> bytes:
+    """
+    Decode a Base58 string, raises ValueError if it is not Base58.
+    """
+    number: int = 0
+    for character in encoded:
+        number = number * 58 + BASE58_ALPHABET.index(character)
+
+    leading_zeros: int = len(encoded) - len(encoded.lstrip("1"))
+    return b"\0" * leading_zeros + number.to_bytes((number.bit_length() + 7) // 8, byteorder='big')
+
+
+def pubkey_of(private_key: str) -> str:
+    """
+    Return the public key of a Base58 keypair, as the gateway parses it: the secret key followed by the public key.
+
+    The signatures are not simulated, a keypair stands for its public key.
+    """
+    try:
+        keypair: bytes = base58_decode(private_key)
+    except ValueError:
+        raise ProgramError("Unauthorized", 400)
+
+    if len(keypair) != 64:
+        raise ProgramError("Unauthorized", 400)
+
+    return base58_encode(keypair[32:])
+
+
+def format_scalar(value: int) -> str:
+    """
+    Format a scalar as the gateway does, 0x and 64 hex digits.
+    """
+    return f"0x{value:064x}"
+
+
+class SolanaSimulator:
+    """
+    The escrow accounts and the clock of a simulated chain, with the semantics of the escrow program.
+
+    The queries are derived from simulated slot hashes: the slots advance with the wall clock, the
+    hash of a slot is the SHA-256 of a seed and the slot, and `generate_queries` reads the most recent
+    ones as the SlotHashes sysvar does, newest first. Unlike the deployed program, whose pairing check
+    exceeds the compute budget and is mocked, proofs are verified with real pairings.
+    """
+
+    def __init__(self, proof_submission_deadline: int = PROOF_SUBMISSION_DEADLINE, verify_proofs: bool = True,
+                 seed: Optional[bytes] = None):
+        self.proof_submission_deadline = proof_submission_deadline
+        self.verify_proofs = verify_proofs
+        self.seed: bytes = seed if seed is not None else os.urandom(32)
+        self.start_time: float = time.time()
+
+        self.escrows: dict[str, dict] = {}
+        self.last_subscription_id: int = 0
+        self.lock = threading.Lock()
+
+    def current_slot(self) -> int:
+        return int((time.time() - self.start_time) / SLOT_DURATION_IN_SECONDS) + SLOT_HASHES_ENTRIES
+
+    def slot_hashes(self) -> list[tuple[int, bytes]]:
+        """
+        Return the (slot, hash) entries of the SlotHashes sysvar, the most recent slot first.
+        """
+        current_slot: int = self.current_slot()
+        return [(slot, hashlib.sha256(self.seed + slot.to_bytes(8, byteorder='little')).digest())
+                for slot in range(current_slot - 1, current_slot - 1 - SLOT_HASHES_ENTRIES, -1)]
+
+    def get_escrow(self, escrow_pubkey: str) -> dict:
+        escrow: Optional[dict] = self.escrows.get(escrow_pubkey)
+        if escrow is None:
+            raise ProgramError("AccountNotFound", 404)
+
+        return escrow
+
+    def start_subscription(self, buyer_private_key: str, seller_pubkey: str, u: str, g: str, v: str,
+                           query_size: int, number_of_blocks: int, validate_every: int) -> dict:
+        buyer_pubkey: str = pubkey_of(buyer_private_key)
+
+        # The public parameters must decompress, as the program unwraps them when proving
+        try:
+            decompress_g1_from_hex(u)
+            decompress_g2_from_hex(g)
+            decompress_g2_from_hex(v)
+        except (ValueError, AssertionError):
+            raise ProgramError("Unauthorized", 400)
+
+        with self.lock:
+            # The gateway uses the time as the subscription ID, kept unique for the subscriptions started together
+            subscription_id: int = max(int(time.time()), self.last_subscription_id + 1)
+            self.last_subscription_id = subscription_id
+
+            # The escrow is a program derived address of the buyer, the seller and the subscription ID
+            escrow_pubkey: str = base58_encode(hashlib.sha256(
+                b"escrow" + base58_decode(buyer_pubkey) + base58_decode(seller_pubkey)
+                + subscription_id.to_bytes(8, byteorder='little')).digest())
+
+            self.escrows[escrow_pubkey] = {
+                "buyer_pubkey": buyer_pubkey,
+                "seller_pubkey": seller_pubkey,
+                "u": u,
+                "g": g,
+                "v": v,
+                "number_of_blocks": number_of_blocks,
+                "query_size": query_size,
+                "validate_every": validate_every,
+                "last_prove_date": 0,
+                "balance": 0,
+                "queries": [],
+                "queries_generation_time": 0,
+                "is_subscription_ended_by_buyer": False,
+                "is_subscription_ended_by_seller": False,
+                "subscription_duration": 0,
+                "subscription_id": subscription_id
+            }
+
+        return {"escrow_pubkey": escrow_pubkey, "subscription_id": subscription_id}
+
+    def add_funds_to_subscription(self, buyer_private_key: str, escrow_pubkey: str, amount: int) -> None:
+        pubkey_of(buyer_private_key)
+        with self.lock:
+            self.get_escrow(escrow_pubkey)["balance"] += amount
+
+    def generate_queries(self, user_private_key: str, escrow_pubkey: str) -> None:
+        pubkey_of(user_private_key)
+        slot_hashes: list[tuple[int, bytes]] = self.slot_hashes()
+
+        with self.lock:
+            escrow: dict = self.get_escrow(escrow_pubkey)
+
+            # The block index is the slot modulo the number of blocks, the coefficient the slot hash modulo p
+            escrow["queries"] = [(slot % escrow["number_of_blocks"], int.from_bytes(slot_hash, byteorder='big') % p)
+                                 for slot, slot_hash in slot_hashes[:escrow["query_size"]]]
+            escrow["queries_generation_time"] = int(time.time())
+
+    def verify_proof(self, escrow: dict, sigma: str, mu: list[int]) -> bool:
+        """
+        Verify a proof over the queries of the escrow: e(σ, g) == e(Π(H(i)^(v_i)) * Π(u_j^(μ_j)), v).
+
+        A file of s > 1 sectors per block is proved with μ_1..μ_s, its points u_j are hashed from the u
+        of the escrow, a single sector with μ and u.
+        """
+        try:
+            σ = decompress_g1_from_hex(sigma)
+        except (ValueError, AssertionError):
+            return False
+
+        u = decompress_g1_from_hex(escrow["u"])
+        g = decompress_g2_from_hex(escrow["g"])
+        v = decompress_g2_from_hex(escrow["v"])
+
+        challenge: dict[int, int] = normalize_challenge(escrow["queries"], p)
+        Π_H_i_multiply_v_i = curve.multiexp_g1(hash_indices_to_G1(challenge), challenge.values())
+
+        u_μ = curve.multiply_g1(u, mu[0]) if len(mu) == 1 else \
+            curve.multiexp_g1(get_sector_generators(u, len(mu)), mu)  # Π(u_j^(μ_j))
+        multiplication_sum = u_μ if Π_H_i_multiply_v_i is None else curve.add_g1(Π_H_i_multiply_v_i, u_μ)
+
+        return curve.pairings_equal(σ, g, multiplication_sum, v)  # e(σ, g) == e(Π(H(i)^(v_i)) * Π(u_j^(μ_j)), v)
+
+    def prove(self, seller_private_key: str, escrow_pubkey: str, sigma: str, mu: Union[str, list[str]]) -> None:
+        pubkey_of(seller_private_key)
+
+        with self.lock:
+            escrow: dict = dict(self.get_escrow(escrow_pubkey))
+
+        now: int = int(time.time())
+        if now < escrow["last_prove_date"] + escrow["validate_every"]:
+            raise ProgramError("NoValidationNeeded")
+        if now > escrow["queries_generation_time"] + self.proof_submission_deadline:
+            raise ProgramError("GenerateAnotherQuery")
+
+        # The pairings are computed out of the lock, the proofs of the escrows are verified concurrently
+        μ_values: list[int] = [int(mu, 16)] if isinstance(mu, str) else [int(μ_j, 16) for μ_j in mu]
+        if self.verify_proofs and not self.verify_proof(escrow, sigma, μ_values):
+            raise ProgramError("Unauthorized")
+
+        with self.lock:
+            escrow = self.get_escrow(escrow_pubkey)
+
+            # Past the first proofs, the seller is paid for each proof, the program fails on an insufficient balance
+            transfer_amount: int = 0
+            if escrow["subscription_duration"] + 1 > MIN_SUBSCRIPTION_DURATION:
+                transfer_amount = int((1.0 + 0.05 * escrow["query_size"]) * SOL_IN_LAMPORTS)
+                if transfer_amount > escrow["balance"]:
+                    raise ProgramError("InsufficientFunds")
+
+            escrow["subscription_duration"] += 1
+            escrow["balance"] -= transfer_amount
+            escrow["last_prove_date"] = now
+
+    def end_subscription(self, private_key: str, escrow_pubkey: str, by_buyer: bool) -> None:
+        pubkey: str = pubkey_of(private_key)
+        with self.lock:
+            escrow: dict = self.get_escrow(escrow_pubkey)
+            if pubkey != escrow["buyer_pubkey" if by_buyer else "seller_pubkey"]:
+                raise ProgramError("Unauthorized")
+
+            escrow["is_subscription_ended_by_buyer" if by_buyer else "is_subscription_ended_by_seller"] = True
+
+    def request_funds(self, user_private_key: str, escrow_pubkey: str) -> None:
+        user_pubkey: str = pubkey_of(user_private_key)
+        now: int = int(time.time())
+
+        with self.lock:
+            escrow: dict = self.get_escrow(escrow_pubkey)
+
+            if user_pubkey == escrow["buyer_pubkey"]:
+                is_authorized: bool = escrow["is_subscription_ended_by_seller"] or \
+                                      now > escrow["last_prove_date"] + BUYER_REFUND_TIMEOUT
+            elif user_pubkey == escrow["seller_pubkey"]:
+                is_authorized = escrow["is_subscription_ended_by_buyer"]
+            else:
+                is_authorized = False
+
+            if not is_authorized:
+                raise ProgramError("Unauthorized")
+
+            # The balance is transferred to the user and the escrow account is closed
+            del self.escrows[escrow_pubkey]
+
+    def get_escrow_data(self, escrow_pubkey: str) -> dict:
+        with self.lock:
+            escrow: dict = dict(self.get_escrow(escrow_pubkey))
+
+        escrow["queries"] = [(i, format_scalar(v_i)) for i, v_i in escrow["queries"]]
+        return escrow
+
+
+def create_app(simulator: SolanaSimulator, latency_in_seconds: float = 0.0, latency_jitter_in_seconds: float = 0.0,
+               failure_rate: float = 0.0, endpoint_failure_rates: Optional[dict[str, float]] = None) -> Flask:
+    """
+    Create the Flask app of the simulated gateway, with the endpoints and the responses of the gateway.
+
+    Every request is delayed by the latency, uniformly jittered, and fails with a 503 at the failure
+    rate of its endpoint, to load-test the storage server against a slow or flaky gateway. The
+    latency and the failure rates can be changed at runtime with POST /simulator/config.
+    """
+    app = Flask(__name__)
+    config: dict = {
+        "latency_in_seconds": latency_in_seconds,
+        "latency_jitter_in_seconds": latency_jitter_in_seconds,
+        "failure_rate": failure_rate,
+        "endpoint_failure_rates": dict(endpoint_failure_rates or {})
+    }
+
+    def endpoint(name: str, handler):
+        def view():
+            delay: float = config["latency_in_seconds"] + random.uniform(-1, 1) * config["latency_jitter_in_seconds"]
+            if delay > 0:
+                time.sleep(delay)
+
+            if random.random() < config["endpoint_failure_rates"].get(name, config["failure_rate"]):
+                return jsonify({"error": "Injected failure"}), 503
+
+            params: dict = request.get_json(silent=True) or {}
+            try:
+                return jsonify(handler(params))
+            except ProgramError as e:
+                return jsonify({"error": str(e), "error_code": e.error_code}), e.status_code
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({"error": f"Invalid request: {e}"}), 400
+
+        app.add_url_rule(f"/{name}", name, view, methods=["POST"])
+
+    endpoint("start_subscription", lambda params: simulator.start_subscription(
+        params["buyer_private_key"], params["seller_pubkey"], params["u"], params["g"], params["v"],
+        int(params["query_size"]), int(params["number_of_blocks"]), int(params["validate_every"])))
+    endpoint("add_funds_to_subscription", lambda params: simulator.add_funds_to_subscription(
+        params["buyer_private_key"], params["escrow_pubkey"], int(params["amount"]))
+        or {"message": "Funds added successfully"})
+    endpoint("generate_queries", lambda params: simulator.generate_queries(
+        params["user_private_key"], params["escrow_pubkey"]) or {"message": "Queries generated successfully"})
+    endpoint("get_queries_by_escrow", lambda params: {
+        "queries": simulator.get_escrow_data(params["escrow_pubkey"])["queries"]})
+    endpoint("get_escrow_data", lambda params: simulator.get_escrow_data(params["escrow_pubkey"]))
+    endpoint("prove", lambda params: simulator.prove(
+        params["seller_private_key"], params["escrow_pubkey"], params["sigma"], params["mu"])
+        or {"message": "Proof submitted successfully"})
+    endpoint("end_subscription_by_buyer", lambda params: simulator.end_subscription(
+        params["buyer_private_key"], params["escrow_pubkey"], by_buyer=True)
+        or {"message": "Subscription ended successfully"})
+    endpoint("end_subscription_by_seller", lambda params: simulator.end_subscription(
+        params["seller_private_key"], params["escrow_pubkey"], by_buyer=False)
+        or {"message": "Subscription ended successfully"})
+    endpoint("request_funds", lambda params: simulator.request_funds(
+        params["user_private_key"], params["escrow_pubkey"]) or {"message": "Funds requested successfully"})
+
+    @app.route("/simulator/config", methods=["GET", "POST"])
+    def config_endpoint():
+        if request.method == "POST":
+            params: dict = request.get_json(silent=True) or {}
+            config.update({key: value for key, value in params.items() if key in config})
+        return jsonify(config)
+
+    return app
+
+
+def parse_endpoint_failure_rates(value: str) -> dict[str, float]:
+    """
+    Parse comma separated endpoint=rate pairs, e.g. prove=0.1,get_escrow_data=0.05.
+    """
+    return {name: float(rate) for name, rate in (pair.split("=") for pair in value.split(",") if pair)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline stand-in of the Solana API Gateway and the escrow program.")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=3030, help="Port to listen on, the gateway's (default: 3030)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Uniform jitter of the latency in seconds, plus or minus (default: 0)")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of the requests failing with a 503 (default: 0)")
+    parser.add_argument("--endpoint-failure-rates", type=parse_endpoint_failure_rates, default={},
+                        help="Failure rates of specific endpoints, e.g. prove=0.1,get_escrow_data=0.05")
+    parser.add_argument("--proof-deadline", type=int, default=PROOF_SUBMISSION_DEADLINE,
+                        help=f"Seconds to submit a proof after generating its queries (default: {PROOF_SUBMISSION_DEADLINE})")
+    parser.add_argument("--no-verify-proofs", action="store_true",
+                        help="Accept every proof without the pairing check, as the deployed program does")
+    parser.add_argument("--seed", help="Hex seed of the slot hashes, for reproducible queries (default: random)")
+    args = parser.parse_args()
+
+    simulator = SolanaSimulator(args.proof_deadline, not args.no_verify_proofs,
+                                bytes.fromhex(args.seed) if args.seed else None)
+    app = create_app(simulator, args.latency, args.jitter, args.failure_rate, args.endpoint_failure_rates)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 # Local imports
 from StorageServer import create_app
+from StorageServer.config import reset_storage
 
 
-# Create the app instance
-app = create_app()
+# The development server starts from an empty storage
+reset_storage()
+
+# Create the app instance, the subscriptions of the files of the development server end with it
+app = create_app(end_subscriptions_on_exit=True)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000, debug=True)
+    # The reloader would import the app in a second process and start the scheduler twice
+    app.run(host="0.0.0.0", port=8000, debug=True, use_reloader=False)
@@ -0,0 +1,326 @@
+# Standard library imports
+import os
+from hashlib import sha256
+from typing import Any, Iterable, Optional
+
+# Third-party library imports
+import py_ecc.bls.hash_to_curve as bls_hash
+import py_ecc.bls.point_compression as bls_comp
+import py_ecc.optimized_bls12_381 as bls_opt
+from py_ecc.bls.typing import G1Compressed, G2Compressed
+try:
+    import py_arkworks_bls12381 as arkworks
+except ImportError:     # The native backend is optional, py_ecc is the fallback
+    arkworks = None
+
+# Local imports
+from .glv import multiply_g1 as glv_multiply_g1, batch_invert
+from .hash_to_g1 import hash_to_g1_batch
+
+
+# The curve backend: "arkworks" or "py_ecc", or "auto" for the native backend when it is installed
+CURVE_BACKEND: str = os.environ.get("CURVE_BACKEND", "auto")
+
+q: int = bls_opt.field_modulus  # The field modulus of the curve coordinates
+r: int = bls_opt.curve_order    # The order of G1 and G2
+
+# A point of the backend: a tuple of py_ecc field elements, or a native point
+Point = Any
+
+POW_2_381: int = 2 ** 381
+POW_2_382: int = 2 ** 382
+POW_2_383: int = 2 ** 383
+
+
+class CurveBackend:
+    """
+    The BLS12-381 operations of the scheme, over the points of a library.
+
+    The points are only exchanged in the formats of the scheme: compressed (ZCash) bytes, and the
+    projective (x, y, z) coordinates of the stored authenticators, so every backend reads the
+    files, the keys and the proofs of the others.
+    """
+
+    name: str = ""
+
+    def g1_generator(self) -> Point:
+        raise NotImplementedError
+
+    def g2_generator(self) -> Point:
+        raise NotImplementedError
+
+    def multiply_g1(self, point: Point, n: int) -> Point:
+        raise NotImplementedError
+
+    def multiply_g2(self, point: Point, n: int) -> Point:
+        raise NotImplementedError
+
+    def g1_identity(self) -> Point:
+        raise NotImplementedError
+
+    def add_g1(self, point1: Point, point2: Point) -> Point:
+        raise NotImplementedError
+
+    def multiexp_g1(self, points: Iterable[Point], scalars: Iterable[int]) -> Optional[Point]:
+        """
+        Return Π(P_i^(n_i)), or None for no points.
+        """
+        result: Optional[Point] = None
+        for point, n in zip(points, scalars):
+            point_power_n: Point = self.multiply_g1(point, n)
+            result = point_power_n if result is None else self.add_g1(result, point_power_n)
+
+        return result
+
+    def hash_to_g1(self, message: bytes, dst: bytes) -> Point:
+        """
+        Hash a message to G1 with SHA-256 and the SSWU map, as in the hash-to-curve RFC.
+        """
+        raise NotImplementedError
+
+    def hash_to_g1_batch(self, messages: Iterable[bytes], dst: bytes) -> list[Point]:
+        """
+        Hash messages to G1 as `hash_to_g1` does.
+        """
+        return [self.hash_to_g1(message, dst) for message in messages]
+
+    def pairings_equal(self, p1: Point, q1: Point, p2: Point, q2: Point) -> bool:
+        """
+        Check e(p1, q1) == e(p2, q2), for p1 and p2 in G1 and q1 and q2 in G2.
+        """
+        raise NotImplementedError
+
+    def compress_g1(self, point: Point) -> bytes:
+        raise NotImplementedError
+
+    def compress_g1_batch(self, points: Iterable[Point]) -> list[bytes]:
+        """
+        Compress G1 points as `compress_g1` does, normalizing them with a single inversion.
+        """
+        compressed_points: list[bytes] = []
+        for affine_point in self.to_affine_batch(points):
+            if affine_point is None:
+                # c_flag and b_flag, the identity
+                compressed_points.append((POW_2_383 + POW_2_382).to_bytes(48, 'big'))
+                continue
+
+            # c_flag, and a_flag for the larger of y and -y
+            x, y = affine_point
+            compressed_points.append((x + (y * 2) // q * POW_2_381 + POW_2_383).to_bytes(48, 'big'))
+
+        return compressed_points
+
+    def decompress_g1(self, data: bytes) -> Point:
+        """
+        Read a compressed G1 point, raises ValueError if it is not one.
+        """
+        raise NotImplementedError
+
+    def compress_g2(self, point: Point) -> bytes:
+        raise NotImplementedError
+
+    def decompress_g2(self, data: bytes) -> Point:
+        """
+        Read a compressed G2 point, raises ValueError if it is not one.
+        """
+        raise NotImplementedError
+
+    def to_projective(self, point: Point) -> tuple[int, int, int]:
+        """
+        Return projective coordinates (x = X / Z, y = Y / Z) of a G1 point, Z = 0 for the identity.
+        """
+        raise NotImplementedError
+
+    def to_affine_batch(self, points: Iterable[Point]) -> list[Optional[tuple[int, int]]]:
+        """
+        Return the affine coordinates of G1 points, None for the identity, with a single inversion.
+        """
+        coordinates: list[tuple[int, int, int]] = [self.to_projective(point) for point in points]
+        z_inverses: list[int] = batch_invert([z for _, _, z in coordinates])
+        return [(x * z_inverse % q, y * z_inverse % q) if z_inverse else None
+                for (x, y, _), z_inverse in zip(coordinates, z_inverses)]
+
+    def from_affine(self, x: int, y: int) -> Point:
+        """
+        Read a G1 point from affine coordinates in [0, q), raises ValueError if it is not on the curve.
+        """
+        raise NotImplementedError
+
+    def from_projective(self, x: int, y: int, z: int) -> Point:
+        """
+        Read a G1 point from projective coordinates, raises ValueError if it is not on the curve.
+        """
+        return self.from_projective_batch([(x, y, z)])[0]
+
+    def from_projective_batch(self, coordinates: Iterable[tuple[int, int, int]]) -> list[Point]:
+        """
+        Read G1 points from projective coordinates, normalizing them with a single inversion.
+        Raises ValueError if one is not on the curve.
+        """
+        coordinates = list(coordinates)
+        z_inverses: list[int] = batch_invert([z for _, _, z in coordinates])
+        return [self.from_affine(x * z_inverse % q, y * z_inverse % q) if z_inverse else self.g1_identity()
+                for (x, y, _), z_inverse in zip(coordinates, z_inverses)]
+
+
+class PyEccCurveBackend(CurveBackend):
+    """
+    The pure Python backend: py_ecc's optimized BLS12-381, with the GLV multiplication on G1.
+    """
+
+    name: str = "py_ecc"
+
+    def g1_generator(self) -> Point:
+        return bls_opt.G1
+
+    def g2_generator(self) -> Point:
+        return bls_opt.G2
+
+    def multiply_g1(self, point: Point, n: int) -> Point:
+        return glv_multiply_g1(point, n)
+
+    def g1_identity(self) -> Point:
+        return bls_opt.Z1
+
+    def multiply_g2(self, point: Point, n: int) -> Point:
+        return bls_opt.multiply(point, n % r)
+
+    def add_g1(self, point1: Point, point2: Point) -> Point:
+        return bls_opt.add(point1, point2)
+
+    def hash_to_g1(self, message: bytes, dst: bytes) -> Point:
+        return bls_hash.hash_to_G1(message, dst, sha256)
+
+    def hash_to_g1_batch(self, messages: Iterable[bytes], dst: bytes) -> list[Point]:
+        return hash_to_g1_batch(messages, dst)
+
+    def pairings_equal(self, p1: Point, q1: Point, p2: Point, q2: Point) -> bool:
+        return bls_opt.pairing(q1, p1) == bls_opt.pairing(q2, p2)
+
+    def compress_g1(self, point: Point) -> bytes:
+        return bls_comp.compress_G1(point).to_bytes(48, 'big')
+
+    def decompress_g1(self, data: bytes) -> Point:
+        try:
+            return bls_comp.decompress_G1(G1Compressed(int.from_bytes(data, 'big')))
+        except AssertionError as e:
+            raise ValueError(f"Invalid compressed G1 point: {e}")
+
+    def compress_g2(self, point: Point) -> bytes:
+        g2_comp: G2Compressed = bls_comp.compress_G2(point)
+        return g2_comp[0].to_bytes(48, 'big') + g2_comp[1].to_bytes(48, 'big')
+
+    def decompress_g2(self, data: bytes) -> Point:
+        try:
+            return bls_comp.decompress_G2(G2Compressed((int.from_bytes(data[:48], 'big'),
+                                                        int.from_bytes(data[48:], 'big'))))
+        except AssertionError as e:
+            raise ValueError(f"Invalid compressed G2 point: {e}")
+
+    def to_projective(self, point: Point) -> tuple[int, int, int]:
+        return int(point[0]), int(point[1]), int(point[2])
+
+    def from_affine(self, x: int, y: int) -> Point:
+        if (y * y - x * x * x - 4) % q:
+            raise ValueError("The point is not on the G1 curve")
+
+        return bls_opt.FQ(x), bls_opt.FQ(y), bls_opt.FQ.one()
+
+
+class ArkworksCurveBackend(CurveBackend):
+    """
+    The native backend: the Rust arkworks BLS12-381 of the py_arkworks_bls12381 binding.
+    """
+
+    name: str = "arkworks"
+
+    def __init__(self):
+        if arkworks is None:
+            raise ImportError("The arkworks curve backend requires py_arkworks_bls12381, "
+                              "install it with: pip install py_arkworks_bls12381")
+
+    def g1_generator(self) -> Point:
+        return arkworks.G1Point()
+
+    def g2_generator(self) -> Point:
+        return arkworks.G2Point()
+
+    def multiply_g1(self, point: Point, n: int) -> Point:
+        return point * arkworks.Scalar(n % r)
+
+    def multiply_g2(self, point: Point, n: int) -> Point:
+        return point * arkworks.Scalar(n % r)
+
+    def g1_identity(self) -> Point:
+        return arkworks.G1Point.identity()
+
+    def add_g1(self, point1: Point, point2: Point) -> Point:
+        return point1 + point2
+
+    def multiexp_g1(self, points: Iterable[Point], scalars: Iterable[int]) -> Optional[Point]:
+        points = list(points)
+        if not points:
+            return None
+
+        return arkworks.G1Point.multiexp_unchecked(points, [arkworks.Scalar(n % r) for n in scalars])
+
+    def hash_to_g1(self, message: bytes, dst: bytes) -> Point:
+        return arkworks.G1Point.hash_to_curve(message, dst)
+
+    def pairings_equal(self, p1: Point, q1: Point, p2: Point, q2: Point) -> bool:
+        # e(p1, q1) * e(-p2, q2) is the identity, with a single final exponentiation
+        return arkworks.GT.pairing_check([p1, -p2], [q1, q2])
+
+    def compress_g1(self, point: Point) -> bytes:
+        return bytes(point.to_compressed_bytes())
+
+    def compress_g1_batch(self, points: Iterable[Point]) -> list[bytes]:
+        # The native compression normalizes faster than the batch inversion in Python
+        return [self.compress_g1(point) for point in points]
+
+    def decompress_g1(self, data: bytes) -> Point:
+        return arkworks.G1Point.from_compressed_bytes(bytes(data))
+
+    def compress_g2(self, point: Point) -> bytes:
+        return bytes(point.to_compressed_bytes())
+
+    def decompress_g2(self, data: bytes) -> Point:
+        return arkworks.G2Point.from_compressed_bytes(bytes(data))
+
+    def to_projective(self, point: Point) -> tuple[int, int, int]:
+        if point == arkworks.G1Point.identity():
+            return 1, 1, 0
+
+        xy: bytes = bytes(point.to_xy_bytes_be())
+        return int.from_bytes(xy[:48], 'big'), int.from_bytes(xy[48:], 'big'), 1
+
+    def from_affine(self, x: int, y: int) -> Point:
+        # The binding reads (0, 0) as the identity, it is not a point of the curve
+        if x == 0 and y == 0:
+            raise ValueError("The point is not on the G1 curve")
+
+        return arkworks.G1Point.from_xy_bytes_unchecked_be(x.to_bytes(48, 'big') + y.to_bytes(48, 'big'))
+
+
+CURVE_BACKENDS: dict[str, type[CurveBackend]] = {
+    PyEccCurveBackend.name: PyEccCurveBackend,
+    ArkworksCurveBackend.name: ArkworksCurveBackend
+}
+
+
+def get_curve_backend(name: str = CURVE_BACKEND) -> CurveBackend:
+    """
+    Return the curve backend named `name`, or for "auto" the native backend when its binding is
+    installed and py_ecc otherwise.
+    """
+    if name == "auto":
+        name = ArkworksCurveBackend.name if arkworks is not None else PyEccCurveBackend.name
+
+    if name not in CURVE_BACKENDS:
+        raise ValueError(f"Unknown curve backend '{name}', expected one of {', '.join(CURVE_BACKENDS)} or auto")
+
+    return CURVE_BACKENDS[name]()
+
+
+# The backend of the process
+curve: CurveBackend = get_curve_backend()
@@ -0,0 +1,178 @@
+# Third-party library imports
+import py_ecc.optimized_bls12_381 as bls_opt
+from py_ecc.fields import optimized_bls12_381_FQ
+
+
+q: int = bls_opt.field_modulus  # The field modulus of the curve coordinates
+r: int = bls_opt.curve_order    # The order of G1
+
+# The GLV endomorphism of G1: φ(x, y) = (β * x, y) = λ * (x, y), with β a cube root of unity in F_q and
+# λ = z^2 - 1 a root of λ^2 + λ + 1 modulo r, z being the BLS parameter -0xd201000000010000.
+# As r = λ^2 + λ + 1, a scalar k < r splits into k mod λ and k // λ, both of 128 bits at most.
+GLV_BETA: int = 0x1a0111ea397fe699ec02408663d4de85aa0d857d89759ad4897d29650fb85f9b409427eb4f49fffd8bfd00000000aaac
+GLV_LAMBDA: int = 0xac45a4010001a40200000000ffffffff
+
+# Width of the NAF recoding, the precomputed tables hold the 2^(w - 2) odd multiples P, 3P, ..., (2^(w - 1) - 1)P
+WNAF_WINDOW: int = 4
+
+
+def batch_invert(values: list[int]) -> list[int]:
+    """
+    Invert field elements modulo q with a single inversion (Montgomery's trick).
+
+    The prefix products a_1, a_1 * a_2, ..., a_1 * ... * a_n are inverted once, then unwound from the
+    last element: 3 multiplications per element instead of an inversion each.
+
+    :param values: The field elements, the zeros are left as zeros.
+    :return: The inverses of the elements, in the same order.
+    """
+    prefix_products: list[int] = []
+    product: int = 1
+    for value in values:
+        if value % q:
+            product = product * value % q
+        prefix_products.append(product)
+
+    inverses: list[int] = [0] * len(values)
+    product_inverse: int = pow(product, -1, q)
+    for i in reversed(range(len(values))):
+        if values[i] % q == 0:
+            continue
+
+        # (a_1 * ... * a_i)^(-1) * (a_1 * ... * a_(i - 1)) = a_i^(-1)
+        inverses[i] = product_inverse * (prefix_products[i - 1] if i else 1) % q
+        product_inverse = product_inverse * values[i] % q
+
+    return inverses
+
+
+def _double(point: tuple[int, int, int]) -> tuple[int, int, int]:
+    """
+    Double a point in Jacobian coordinates (x = X / Z^2, y = Y / Z^3) of y^2 = x^3 + 4 (dbl-2009-l).
+    """
+    x, y, z = point
+    a: int = x * x % q
+    b: int = y * y % q
+    c: int = b * b % q
+    d: int = 2 * ((x + b) ** 2 - a - c) % q
+    e: int = 3 * a % q
+    x3: int = (e * e - 2 * d) % q
+    return x3, (e * (d - x3) - 8 * c) % q, 2 * y * z % q
+
+
+def _add_affine(point: tuple[int, int, int], x2: int, y2: int) -> tuple[int, int, int]:
+    """
+    Add an affine point to a point in Jacobian coordinates (madd-2007-bl).
+    """
+    x1, y1, z1 = point
+    z1z1: int = z1 * z1 % q
+    h: int = (x2 * z1z1 - x1) % q
+    s: int = 2 * (y2 * z1 * z1z1 - y1) % q
+    if h == 0:
+        # The same x: the same point, or its negation
+        return _double(point) if s == 0 else (1, 1, 0)
+
+    hh: int = h * h % q
+    i: int = 4 * hh % q
+    j: int = h * i % q
+    v: int = x1 * i % q
+    x3: int = (s * s - j - 2 * v) % q
+    return x3, (s * (v - x3) - 2 * y1 * j) % q, ((z1 + h) ** 2 - z1z1 - hh) % q
+
+
+def _to_affine(point: tuple[int, int, int]) -> tuple[int, int]:
+    """
+    Convert a finite point in Jacobian coordinates to affine coordinates.
+    """
+    x, y, z = point
+    z_inverse: int = pow(z, -1, q)
+    z_inverse_squared: int = z_inverse * z_inverse % q
+    return x * z_inverse_squared % q, y * z_inverse_squared * z_inverse % q
+
+
+def _wnaf(k: int, window: int = WNAF_WINDOW) -> list[int]:
+    """
+    Recode a non-negative scalar in width-w NAF, least significant digit first: the digits are 0 or
+    odd in (-2^(w - 1), 2^(w - 1)), and any w consecutive digits hold at most one nonzero digit.
+    """
+    digits: list[int] = []
+    while k:
+        digit: int = 0
+        if k & 1:
+            digit = k & ((1 << window) - 1)
+            if digit >= 1 << (window - 1):
+                digit -= 1 << window
+            k -= digit
+        digits.append(digit)
+        k >>= 1
+
+    return digits
+
+
+def _odd_multiples(x: int, y: int, window: int = WNAF_WINDOW) -> list[tuple[int, int]]:
+    """
+    The affine odd multiples P, 3P, ..., (2^(w - 1) - 1)P of an affine point P of G1.
+    """
+    double_point: tuple[int, int] = _to_affine(_double((x, y, 1)))
+    multiples: list[tuple[int, int]] = [(x, y)]
+    multiple: tuple[int, int, int] = (x, y, 1)
+    for _ in range((1 << (window - 2)) - 1):
+        multiple = _add_affine(multiple, *double_point)
+        multiples.append(_to_affine(multiple))
+
+    return multiples
+
+
+def multiply_g1(
+    point: tuple[optimized_bls12_381_FQ, optimized_bls12_381_FQ, optimized_bls12_381_FQ],
+    n: int
+) -> tuple[optimized_bls12_381_FQ, optimized_bls12_381_FQ, optimized_bls12_381_FQ]:
+    """
+    Multiply a point of G1 by a scalar, a drop-in for `bls_opt.multiply` on G1.
+
+    The scalar is split with the GLV endomorphism, n = k1 + k2 * λ with k1 and k2 of 128 bits, and
+    k1 * P + k2 * φ(P) is computed in a single pass of 128 doublings over the width-w NAF digits of
+    k1 and k2, with the odd multiples of P and φ(P) precomputed in affine coordinates. The field
+    arithmetic is done on plain integers, not on py_ecc's field elements.
+
+    The endomorphism acts as λ on the points of order r only: the point must be in G1, as the
+    points stored as authenticators and the hashes of the block indices are.
+
+    :param point: A point of G1 in py_ecc's projective coordinates (x = X / Z, y = Y / Z).
+    :param n: The scalar.
+    :return: The point n * P in py_ecc's projective coordinates, not normalized.
+    """
+    x, y, z = (int(coordinate) for coordinate in point)
+    n %= r
+    if z == 0 or n == 0:
+        return bls_opt.Z1
+
+    # The affine coordinates of P, then the tables of the odd multiples of P and φ(P) = (β * x, y)
+    z_inverse: int = pow(z, -1, q)
+    multiples: list[tuple[int, int]] = _odd_multiples(x * z_inverse % q, y * z_inverse % q)
+    endomorphism_multiples: list[tuple[int, int]] = [(GLV_BETA * mx % q, my) for mx, my in multiples]
+
+    k1_digits: list[int] = _wnaf(n % GLV_LAMBDA)
+    k2_digits: list[int] = _wnaf(n // GLV_LAMBDA)
+
+    # Double once per digit from the most significant, adding the table entry of every nonzero digit
+    result: tuple[int, int, int] = (1, 1, 0)
+    for i in reversed(range(max(len(k1_digits), len(k2_digits)))):
+        if result[2]:
+            result = _double(result)
+
+        for digits, table in ((k1_digits, multiples), (k2_digits, endomorphism_multiples)):
+            if i >= len(digits) or digits[i] == 0:
+                continue
+
+            mx, my = table[abs(digits[i]) >> 1]
+            if digits[i] < 0:
+                my = q - my
+            result = _add_affine(result, mx, my) if result[2] else (mx, my, 1)
+
+    # Jacobian (X, Y, Z) is (X * Z, Y, Z^3) in projective coordinates, without an inversion
+    rx, ry, rz = result
+    if rz == 0:
+        return bls_opt.Z1
+
+    return bls_opt.FQ(rx * rz), bls_opt.FQ(ry), bls_opt.FQ(rz * rz * rz)
@@ -1,2 +1,5 @@
 SOLANA_PRIVATE_KEY_BASE58_CHARACTERS_LEN: int = 88
 SOLANA_PUBLIC_KEY_BASE58_CHARACTERS_LEN: int = 44
+
+# Seconds to submit a proof after the generation of its queries, the PROOF_SUBMISSION_DEADLINE of the escrow program
+PROOF_SUBMISSION_DEADLINE: int = 30 * 60
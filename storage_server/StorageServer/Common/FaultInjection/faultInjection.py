@@ -0,0 +1,123 @@
+import mmap
+import os
+import random
+from typing import Optional
+
+
+BIT_FLIP: str = "bit_flip"    # Flip a single bit in the data part of a block
+BURST: str = "burst"          # Corrupt consecutive bytes in the data part of a block
+TRUNCATE: str = "truncate"    # Cut bytes off the end of the file, truncating its last blocks
+TAG_ONLY: str = "tag_only"    # Flip a single bit in the tag part of a block, leaving the data intact
+
+CORRUPTION_MODELS: tuple[str, ...] = (BIT_FLIP, BURST, TRUNCATE, TAG_ONLY)
+
+
+def inject_faults(
+        file_path: str,
+        model: str = BIT_FLIP,
+        block_size: int = 1024,
+        tag_size: int = 0,
+        fraction: float = 1.0,
+        offset: Optional[int] = None,
+        bit: Optional[int] = None,
+        length: int = 1,
+        seed: Optional[int] = None
+) -> dict:
+    """
+    Corrupts a file in place according to a corruption model, without loading it into memory.
+
+    The file is memory-mapped and only the pages of the corrupted bytes are touched, so the cost
+    depends on the number of corrupted blocks and not on the file size. The file is seen as
+    consecutive blocks of `block_size` bytes, of which the last `tag_size` bytes are the tag.
+
+    Args:
+        file_path (str): Path to the file to corrupt in place.
+        model (str): One of `CORRUPTION_MODELS`. Default is a bit flip.
+        block_size (int): Size of each block, tag included. Default is 1024 bytes.
+        tag_size (int): Size of the tag at the end of each block. Default is 0 (no tag).
+        fraction (float): Probability of each block to be corrupted. Default is 1.0 (every block).
+        offset (int, optional): Fixed offset of the corruption inside the data (or tag) part of a block, random if not given.
+        bit (int, optional): Fixed bit (0-7) flipped by the bit flip models, random if not given.
+        length (int): Bytes per burst for the burst model, bytes cut off for the truncate model. Default is 1.
+        seed (int, optional): Seed of the random choices, the same seed reproduces the same corruption.
+
+    Returns:
+        dict: A report with the model, seed, file size before the corruption, number of corrupted
+        bytes and the indices of the corrupted blocks.
+
+    Raises:
+        ValueError: If the model is unknown or the parameters do not fit the block layout.
+    """
+    if model not in CORRUPTION_MODELS:
+        raise ValueError(f"Unknown corruption model '{model}', expected one of {CORRUPTION_MODELS}.")
+    if not 0 <= tag_size < block_size:
+        raise ValueError("Tag size must be non-negative and smaller than the block size.")
+    if model == TAG_ONLY and tag_size == 0:
+        raise ValueError("The tag only model requires a tag size.")
+    if not 0 < fraction <= 1:
+        raise ValueError("Fraction must be greater than 0 and at most 1.")
+    if length < 1:
+        raise ValueError("Length must be at least 1.")
+    if bit is not None and not 0 <= bit < 8:
+        raise ValueError("Bit must be between 0 and 7.")
+
+    # The size of the part of a block the model corrupts, the fixed offset is inside it
+    region_size: int = tag_size if model == TAG_ONLY else block_size - tag_size
+    if offset is not None and not 0 <= offset < region_size:
+        raise ValueError(f"Offset must be non-negative and smaller than {region_size}, the size of the corrupted part "
+                         f"of a block.")
+
+    rng: random.Random = random.Random(seed)
+    file_size: int = os.path.getsize(file_path)
+
+    report = {
+        "model": model,
+        "seed": seed,
+        "file_size": file_size,
+        "corrupted_bytes": 0,
+        "corrupted_blocks": []
+    }
+
+    if model == TRUNCATE:
+        new_size: int = max(file_size - length, 0)
+        os.truncate(file_path, new_size)
+
+        report["corrupted_bytes"] = file_size - new_size
+        report["corrupted_blocks"] = list(range(new_size // block_size, -(-file_size // block_size)))
+        return report
+
+    if file_size == 0:
+        return report  # Nothing to corrupt, an empty file can not be memory-mapped
+
+    with open(file_path, "r+b") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE) as mapped_file:
+        for block_start in range(0, file_size, block_size):
+            if fraction < 1.0 and rng.random() >= fraction:
+                continue
+
+            # The region of the block the model corrupts: the data part, or the tag part
+            block_end: int = min(block_start + block_size, file_size)
+            data_end: int = max(block_end - tag_size, block_start)
+            region_start, region_end = (data_end, block_end) if model == TAG_ONLY else (block_start, data_end)
+            if region_start >= region_end:
+                continue  # A truncated last block may miss the region entirely
+
+            position: int = region_start + (offset if offset is not None else rng.randrange(region_end - region_start))
+            if position >= region_end:
+                continue  # The fixed offset is beyond this (shorter, last) block
+
+            if model == BURST:
+                burst_end: int = min(position + length, region_end)
+                # XOR with non-zero bytes, so every byte of the burst changes
+                mapped_file[position:burst_end] = bytes(byte ^ rng.randrange(1, 256)
+                                                        for byte in mapped_file[position:burst_end])
+                report["corrupted_bytes"] += burst_end - position
+            else:
+                flipped_bit: int = bit if bit is not None else rng.randrange(8)
+                mapped_file[position] ^= 1 << flipped_bit
+                report["corrupted_bytes"] += 1
+
+            report["corrupted_blocks"].append(block_start // block_size)
+
+        mapped_file.flush()
+
+    return report
@@ -1,8 +1,18 @@
+# Standard library imports
+import os
+import time
+from typing import Callable, Optional
+
+# Third-party library imports
 import requests
 
 
 # SOLANA_GATEWAY_BASE_URL: str = "http://127.0.0.1:3030"
-SOLANA_GATEWAY_BASE_URL: str = "http://host.docker.internal:3030"
+# The gateway, or the gateway simulator for offline runs, can be set with the SOLANA_GATEWAY_BASE_URL environment variable
+SOLANA_GATEWAY_BASE_URL: str = os.environ.get("SOLANA_GATEWAY_BASE_URL", "http://host.docker.internal:3030")
+
+# Callbacks notified after every request with (endpoint, status code or None on exception, elapsed seconds)
+request_observers: list[Callable[[str, Optional[int], float], None]] = []
 
 
 class SolanaGatewayClientProvider:
@@ -26,13 +36,23 @@ class SolanaGatewayClientProvider:
         """
         url: str = f"{SOLANA_GATEWAY_BASE_URL}/{endpoint}"
 
-        if method.upper() == "POST":
-            response = requests.post(url, headers=self.headers, json=payload)
-        elif method.upper() == "GET":
-            response = requests.get(url, headers=self.headers, params=payload)
-        else:
+        if method.upper() not in ("POST", "GET"):
             raise ValueError("Unsupported HTTP method")
 
+        start: float = time.perf_counter()
+        status_code: Optional[int] = None
+        try:
+            if method.upper() == "POST":
+                response = requests.post(url, headers=self.headers, json=payload)
+            else:
+                response = requests.get(url, headers=self.headers, params=payload)
+
+            status_code = response.status_code
+        finally:
+            elapsed: float = time.perf_counter() - start
+            for observer in request_observers:
+                observer(endpoint, status_code, elapsed)
+
         return response
 
     def start_subscription(self,
@@ -199,7 +219,7 @@ class SolanaGatewayClientProvider:
             seller_private_key (str): The seller's private key.
             escrow_public_key (str): The escrow account public key.
             sigma (str): The base64 encoded 48-byte value.
-            mu (str): The mu value as a string.
+            mu (str | list[str]): The mu value as a string, or the values μ_1..μ_s of a file of s > 1 sectors per block.
 
         Returns:
             response (requests.Response): The response object from the server.
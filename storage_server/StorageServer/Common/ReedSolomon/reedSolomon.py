@@ -1,7 +1,22 @@
+# Standard library imports
+import logging
+import shutil
+
+# Third-party library imports
 import reedsolo
 
+# Local imports
+from ..FaultInjection.faultInjection import inject_faults, BIT_FLIP
+
+
+logger = logging.getLogger(__name__)
+
+RS_ECC_SYMBOLS: int = 10    # Error correction bytes per codeword, corrects up to 5 byte errors
+RS_CODEWORD_SIZE: int = 255
+RS_DATA_SIZE: int = RS_CODEWORD_SIZE - RS_ECC_SYMBOLS
+
 
-def encode_file_with_rs(filepath: str, output_filepath: str, chunk_size: int = 245):
+def encode_file_with_rs(filepath: str, output_filepath: str, chunk_size: int = RS_DATA_SIZE):
     """
     Reads a file, applies Reed-Solomon encoding in chunks, and saves the encoded file.
 
@@ -14,9 +29,9 @@ def encode_file_with_rs(filepath: str, output_filepath: str, chunk_size: int = 2
         str: Path to the encoded file.
     """
     # Initialize Reed-Solomon codec with 10 error correction bytes and 255 total bytes per block
-    rs = reedsolo.RSCodec(10, nsize=255)
+    rs = reedsolo.RSCodec(RS_ECC_SYMBOLS, nsize=RS_CODEWORD_SIZE)
 
-    print(f"Starting file encoding for {filepath}...")
+    logger.debug("Starting file encoding for %s...", filepath)
 
     with open(filepath, "rb") as file, open(output_filepath, "wb") as encoded_file:
         while chunk := file.read(chunk_size):
@@ -24,7 +39,45 @@ def encode_file_with_rs(filepath: str, output_filepath: str, chunk_size: int = 2
             encoded_chunk = rs.encode(chunk)
             encoded_file.write(encoded_chunk)
 
-    print(f"File encoding completed. Encoded file saved at {output_filepath}")
+    logger.debug("File encoding completed. Encoded file saved at %s", output_filepath)
+    return output_filepath
+
+
+def encode_appended_file_with_rs(last_codeword: bytes, filepath: str, output_filepath: str, chunk_size: int = RS_DATA_SIZE):
+    """
+    Encodes data appended to a Reed-Solomon encoded file, the codewords to write from the start of
+    its last codeword.
+
+    The last codeword of an encoded file is the only short one, its data is decoded and encoded again
+    with the appended data, so the extended file is encoded as if the whole data was encoded at once.
+
+    Args:
+        last_codeword (bytes): The last codeword of the encoded file, empty if its last codeword is full.
+        filepath (str): Path to the appended data.
+        output_filepath (str): Path where the encoded data, replacing the last codeword, will be saved.
+        chunk_size (int): Size of each chunk to be encoded. Default is 245 bytes.
+
+    Returns:
+        str: Path to the encoded data.
+    """
+    rs = reedsolo.RSCodec(RS_ECC_SYMBOLS, nsize=RS_CODEWORD_SIZE)
+
+    logger.debug("Starting appended data encoding for %s...", filepath)
+
+    # A full codeword stays as it is, the appended data starts a new one
+    chunk: bytes = bytes(rs.decode(last_codeword)[0]) if 0 < len(last_codeword) < RS_CODEWORD_SIZE else b""
+
+    with open(filepath, "rb") as file, open(output_filepath, "wb") as encoded_file:
+        while data := file.read(chunk_size - len(chunk)):
+            chunk += data
+            if len(chunk) == chunk_size:
+                encoded_file.write(rs.encode(chunk))
+                chunk = b""
+
+        if chunk:
+            encoded_file.write(rs.encode(chunk))
+
+    logger.debug("Appended data encoding completed. Encoded data saved at %s", output_filepath)
     return output_filepath
 
 
@@ -32,6 +85,9 @@ def corrupt_file(input_filepath: str, output_filepath: str, block_size: int = 10
     """
     Corrupts the file by flipping the first byte of every 1024-byte block.
 
+    The corruption is done in place through `inject_faults`, without loading the file into memory;
+    when the paths differ the file is first copied to the output path.
+
     Args:
         input_filepath (str): Path to the file to be corrupted.
         output_filepath (str): Path where the corrupted file will be saved.
@@ -40,23 +96,19 @@ def corrupt_file(input_filepath: str, output_filepath: str, block_size: int = 10
     Returns:
         str: Path to the corrupted file.
     """
-    print(f"Starting file corruption for {input_filepath}...")
-
-    with open(input_filepath, "rb") as file:
-        data = bytearray(file.read())
+    logger.debug("Starting file corruption for %s...", input_filepath)
 
-    # Flip the first byte of each block of data
-    for i in range(0, len(data), block_size):
-        data[i] ^= 0x80  # Flip the first byte (XOR with 0x80)
+    if input_filepath != output_filepath:
+        shutil.copyfile(input_filepath, output_filepath)
 
-    with open(output_filepath, "wb") as corrupted_file:
-        corrupted_file.write(data)
+    # Flip the first byte of each block of data (XOR with 0x80)
+    inject_faults(output_filepath, model=BIT_FLIP, block_size=block_size, offset=0, bit=7)
 
-    print(f"File corruption completed. Corrupted file saved at {output_filepath}")
+    logger.debug("File corruption completed. Corrupted file saved at %s", output_filepath)
     return output_filepath
 
 
-def decode_file_with_rs(encoded_filepath: str, output_filepath: str, chunk_size: int = 255):
+def decode_file_with_rs(encoded_filepath: str, output_filepath: str, chunk_size: int = RS_CODEWORD_SIZE):
     """
     Reads a Reed-Solomon encoded file, decodes it in chunks, and saves the original file.
 
@@ -69,9 +121,9 @@ def decode_file_with_rs(encoded_filepath: str, output_filepath: str, chunk_size:
         str: Path to the decoded file.
     """
     # Initialize Reed-Solomon codec with 10 error correction bytes and 255 total bytes per block
-    rs = reedsolo.RSCodec(10, nsize=255)
+    rs = reedsolo.RSCodec(RS_ECC_SYMBOLS, nsize=RS_CODEWORD_SIZE)
 
-    print(f"Starting file decoding for {encoded_filepath}...")
+    logger.debug("Starting file decoding for %s...", encoded_filepath)
 
     with open(encoded_filepath, "rb") as encoded_file, open(output_filepath, "wb") as decoded_file:
         while chunk := encoded_file.read(chunk_size):
@@ -79,5 +131,24 @@ def decode_file_with_rs(encoded_filepath: str, output_filepath: str, chunk_size:
             decoded_chunk = rs.decode(chunk)
             decoded_file.write(decoded_chunk[0])  # Write the decoded content (first element of the tuple)
 
-    print(f"File decoding completed. Decoded file saved at {output_filepath}")
+    logger.debug("File decoding completed. Decoded file saved at %s", output_filepath)
     return output_filepath
+
+
+def correct_rs_codeword(codeword: bytes) -> bytes:
+    """
+    Corrects the errors of a single Reed-Solomon codeword, as written by `encode_file_with_rs`.
+
+    Args:
+        codeword (bytes): The (possibly damaged) codeword, up to 255 bytes (the last codeword of a file may be shorter).
+
+    Returns:
+        bytes: The corrected codeword, data and error correction bytes.
+
+    Raises:
+        reedsolo.ReedSolomonError: If the codeword has more errors than can be corrected.
+    """
+    rs = reedsolo.RSCodec(RS_ECC_SYMBOLS, nsize=RS_CODEWORD_SIZE)
+
+    # decode() returns (data, data + error correction bytes, errata positions)
+    return bytes(rs.decode(codeword)[1])
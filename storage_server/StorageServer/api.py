@@ -1,22 +1,52 @@
 # Standard library imports
+import base64
+import binascii
+import hashlib
 import os
+import time
 from datetime import datetime
 
 # Third-party library imports
-from flask import Blueprint, jsonify, request, send_file
-import py_ecc.optimized_bls12_381 as bls_opt
+from flask import Blueprint, Response, jsonify, request, send_file, stream_with_context
+from werkzeug.datastructures import MultiDict
 
 
 # Local imports
 from .constants import SELLER_PRIVATE_KEY
 from .storage import save_file
 from .storage import files_details_dict
+from .backends import get_backend
 from .Common.Providers.solanaApiGatewayProvider import SolanaGatewayClientProvider
+from .Common.helpers import normalize_challenge
+from .Common.Constants.SolanaConstants import PROOF_SUBMISSION_DEADLINE
 from .Common.ReedSolomon.reedSolomon import corrupt_file
+from .Common.FaultInjection.faultInjection import inject_faults
 from .config import UPLOAD_FOLDER
-from .BLS12_381.helpers import p, MAC_SIZE, BLOCK_SIZE, compress_g1_to_hex, MAC_SIZE_3D
+from .helpers import delete_file_from_storage_server
+from .BLS12_381.helpers import p, MAC_SIZE, compress_g1_to_hex, MAC_SIZE_3D, bytes_to_curve_field_elements, \
+    decompress_g1_from_hex, decompress_g2_from_hex, block_to_sectors
+from .BLS12_381.curve_backend import curve
+from .scrubber import scrub_metrics, scrub_metrics_lock, are_blocks_authentic, get_record_size, SCRUB_BATCH_BLOCKS
+from .metrics import render_metrics, proof_phase_duration_seconds, proofs_total, proof_bytes_read, \
+    transfer_bytes_total, transfer_duration_seconds
+from .tracing import span, profile_if_slow
+from .logger import get_logger
 
 
+logger = get_logger(__name__)
+
+
+# Default and maximal number of files in a page of /api/get_files
+GET_FILES_DEFAULT_LIMIT: int = 500
+GET_FILES_MAX_LIMIT: int = 1000
+
+# The blocks at the end of a stored file an append may replace: its last block may be short, and the last
+# Reed-Solomon codeword, encoded again with the appended data, spans 2 blocks at most
+APPEND_MAX_REPLACED_BLOCKS: int = 2
+
+# Messages of the Solana gateway on an accepted proof
+PROVE_SUCCESS_MESSAGES: tuple[str, ...] = ("Proof submitted successfully", "Subscription extended successfully")
+
 # Create a Blueprint for the API in the StorageServer2 app
 api_bp = Blueprint('api', __name__)
 
@@ -24,26 +54,60 @@ api_bp = Blueprint('api', __name__)
 @api_bp.route('/api/get_files', methods=['GET'])
 def get_files_endpoint():
     """
-    Endpoint to retrieve the list of stored files with their details.
+    Endpoint to retrieve a page of the stored files with their details.
+
+    This API endpoint lists the files stored in the `files_details_dict`, by file name, a page at a
+    time, with details such as the file name, escrow public key, validation frequency, and the last
+    verification date. The next page is listed with the `nextCursor` of the response.
+
+    The response has an ETag, the version of the store and a digest of the query parameters. A request
+    with a matching `If-None-Match` gets a 304 without a body while no file changed. With `since`, the version of a previous
+    response, only the files changed after it are listed, and the files removed after it.
 
-    This API endpoint iterates through the files stored in the `files_details_dict`
-    and retrieves details such as the file name, escrow public key, validation frequency,
-    and the last verification date. It returns a JSON response with all the necessary
-    file details, including an ID and formatted last verification date.
+    Query Parameters:
+        cursor (str, optional): The `nextCursor` of the previous page.
+        limit (int, optional): The number of files in the page, default 500, at most 1000.
+        escrow_public_key (str, optional): List only the files of this escrow.
+        overdue (bool, optional): `true` to list only the files whose validation is due, `false` for the others.
+        since (int, optional): List only the files changed after this `version`.
 
     Returns:
-        JSON: A list of file details with each file's name, escrow public key,
-              validation frequency, and last verification date in ISO 8601 format.
+        JSON: The page of file details with each file's name, escrow public key, validation frequency,
+              and last verification date in ISO 8601 format, the cursor of the next page, None for the
+              last page, and the version of the store.
     """
+    # Parse the query parameters
+    try:
+        cursor = request.args.get("cursor")
+        after = base64.urlsafe_b64decode(cursor.encode()).decode() if cursor else None
+        limit = min(request.args.get("limit", default=GET_FILES_DEFAULT_LIMIT, type=int), GET_FILES_MAX_LIMIT)
+        overdue = request.args.get("overdue")
+        is_overdue = None if overdue is None else {"true": True, "false": False}[overdue.lower()]
+        since = request.args.get("since", type=int)
+    except (ValueError, UnicodeDecodeError, binascii.Error, KeyError):
+        return jsonify({"error": "Invalid cursor or overdue filter"}), 400
+
+    if limit <= 0:
+        return jsonify({"error": "The limit must be positive"}), 400
+
+    # The version of the store identifies the listing, the overdue files also change with the time, and the query
+    # parameters select the page of the listing
+    escrow_public_key = request.args.get("escrow_public_key")
+    query_digest = hashlib.sha256(repr((after, limit, escrow_public_key, is_overdue, since)).encode()).hexdigest()[:16]
+    etag = f"{files_details_dict.version()}-{files_details_dict.count_overdue_files()}-{query_digest}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    listing = files_details_dict.list_files(after=after, limit=limit, escrow_public_key=escrow_public_key,
+                                            is_overdue=is_overdue, since=since)
 
     # Create a list to store the result
     result = []
 
-    # Initialize the index for each file
-    index: int = 0
-
-    # Iterate over each file's details in the files_details_dict
-    for filename, file_details in files_details_dict.items():
+    # Iterate over each file's details in the page
+    for file_id, filename, file_details in listing["files"]:
         # Extract necessary details from the file's details
         escrow_public_key = file_details.get("escrow_public_key")
         validate_every = file_details.get("validate_every")
@@ -54,22 +118,26 @@ def get_files_endpoint():
 
         # Append the file details to the result list
         result.append({
-            "id": index,  # Unique ID for each file in the response
+            "id": file_id,  # Unique ID for each file, stable across pages
             "file_name": filename,  # Name of the file
             "escrow_public_key": escrow_public_key,  # Public key associated with the escrow
             "validate_every": validate_every,  # Frequency of validation for the file
             "last_verify": last_verify_date.isoformat()  # Convert to ISO format string for consistency
         })
 
-        # Increment the index for the next file
-        index += 1
+    next_after = listing["next_after"]
+    data = {
+        "storageFiles": result,  # Wrap the list of file details in a 'storageFiles' key
+        "nextCursor": base64.urlsafe_b64encode(next_after.encode()).decode() if next_after is not None else None,
+        "version": listing["version"]
+    }
+    if listing["removed_files"] is not None:
+        data["removedFiles"] = listing["removed_files"]
 
-    # Return the list of files in JSON format
-    return jsonify({
-        "data": {
-            "storageFiles": result  # Wrap the list of file details in a 'storageFiles' key
-        }
-    })
+    # Return the page of files in JSON format
+    response = jsonify({"data": data})
+    response.set_etag(etag)
+    return response
 
 
 @api_bp.route('/api/delete_file', methods=['GET'])
@@ -106,15 +174,15 @@ def delete_file_endpoint():
     # Initialize Solana client and get escrow data
     client = SolanaGatewayClientProvider()
 
-    print("Starting request for funds from escrow using the Solana client.")
+    logger.info("Starting request for funds from escrow using the Solana client")
 
     # Use the client to request funds by providing the seller's private key and the escrow public key
     client.request_funds(SELLER_PRIVATE_KEY, escrow_pubkey)
 
-    print("Finished requesting funds from escrow using the Solana client.")
+    logger.info("Finished requesting funds from escrow using the Solana client")
 
-    # Remove the file entry from the dictionary
-    files_details_dict.pop(filename)
+    # Remove the file entry from the dictionary, and its content if no other file references it
+    delete_file_from_storage_server(filename)
 
     # Return success message in JSON format
     return jsonify({
@@ -142,21 +210,32 @@ def download_endpoint():
         jsonify (dict): A JSON response with error messages (in case of failure).
     """
     filename = request.args.get("filename")
-    print(f"Received download request for file: {filename}")
+    logger.info("Received download request for file %s", filename)
 
     if not filename:
-        print("Error: Filename not provided")
+        logger.warning("Filename not provided")
         return jsonify({"error": "Filename not provided"}), 400
 
-    file_path = os.path.abspath(os.path.join(UPLOAD_FOLDER, filename))
-    print(f"Constructed file path: {file_path}")
+    backend, key = files_details_dict.get_file_object(filename, UPLOAD_FOLDER)
+    logger.debug("Constructed file key: %s", key)
 
-    if not os.path.exists(file_path):
-        print(f"Error: File {filename} not found at {file_path}")
+    if not backend.exists(key):
+        logger.warning("File %s not found at %s", filename, key)
         return jsonify({"error": "File not found"}), 404
 
-    print(f"File {filename} found, sending for download...")
-    return send_file(file_path, as_attachment=True)
+    logger.debug("File %s found, sending for download", filename)
+    file_size = backend.size(key)
+    transfer_bytes_total.inc(file_size, direction="download")
+
+    file_path = backend.local_path(key)
+    if file_path is not None:
+        return send_file(os.path.abspath(file_path), as_attachment=True, download_name=filename)
+
+    # Stream the object from the object storage
+    return Response(stream_with_context(backend.iter_chunks(key)), mimetype="application/octet-stream", headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Content-Length": str(file_size)
+    })
 
 
 @api_bp.route("/api/upload", methods=["POST"])
@@ -168,83 +247,258 @@ def upload_endpoint():
     - Accepts a file upload via a POST request.
     - Retrieves the `escrow_public_key` from the request.
     - Fetches escrow data from the Solana Gateway Client.
-    - Validates the data and saves the file to the specified directory.
+    - Validates the data and saves the file to the specified directory, once per content: a file
+      whose content is already stored references the stored content.
     - Updates the metadata for the uploaded file in the `files_details_dict`.
 
+    The upload of a content that is already stored can be skipped: without a file, the request
+    gives the `filename` and the `content_hash` (SHA-256, hex) of the content. The content must be
+    stored for a file of the same owner, whose escrow has the same public key `v`.
+
+    A file tagged with s > 1 sectors per block gives its `sectors`, 1 by default.
+
     Args:
         None
 
     Returns:
         jsonify (dict): A response object containing success or error message.
     """
-    print("Received file upload request")
+    logger.info("Received file upload request")
 
-    # Check if a file is included in the request
-    if "file" not in request.files:
-        print("Error: No file provided in the request")
-        return jsonify({"error": "No file provided"}), 400
+    if request.is_json:
+        # A JSON object, read as the form-data with `get(key, type=...)`
+        if not isinstance(request.get_json(silent=True), dict):
+            logger.warning("The JSON body is not an object")
+            return jsonify({"error": "The request body must be a JSON object"}), 400
+
+        params = MultiDict(request.json)
+        logger.debug("Received parameters as JSON")
+    else:
+        params = request.form
+        logger.debug("Received parameters as form-data")
 
-    uploaded_file = request.files["file"]
+    uploaded_file = request.files.get("file")
+    content_hash = params.get("content_hash", type=str)
 
-    # Check if the uploaded file has a name
-    if uploaded_file.filename == "":
-        print("Error: Empty file name")
-        return jsonify({"error": "Empty file name"}), 400
+    if uploaded_file is not None:
+        filename = uploaded_file.filename
 
-    if request.content_type == "application/json":
-        params = request.json
-        print("Received parameters as JSON")
+        # Check if the uploaded file has a name
+        if filename == "":
+            logger.warning("Empty file name")
+            return jsonify({"error": "Empty file name"}), 400
     else:
-        params = request.form
-        print("Received parameters as form-data")
+        # Without a file, the content must already be stored, its upload is skipped
+        filename = params.get("filename", type=str)
+
+        if not filename or not content_hash:
+            logger.warning("No file provided in the request")
+            return jsonify({"error": "No file provided"}), 400
+
+        if not files_details_dict.has_object(content_hash):
+            logger.info("Content %s is not stored, the file must be uploaded", content_hash)
+            return jsonify({"error": "Content not stored, upload the file"}), 404
 
     escrow_pubkey = params.get("escrow_public_key", type=str)
-    print(f"Escrow public key: {escrow_pubkey}")
+    logger.debug("Escrow public key: %s", escrow_pubkey)
+
+    # Not with `type=int`, which falls back to the default on a malformed value
+    try:
+        sectors = int(params.get("sectors", 1))
+    except (TypeError, ValueError):
+        sectors = 0
+    if sectors < 1:
+        logger.warning("Invalid number of sectors")
+        return jsonify({"error": "The number of sectors must be a positive integer"}), 400
 
     try:
         # Initialize Solana client and get escrow data
         client = SolanaGatewayClientProvider()
-        print("Fetching escrow data using the Solana client")
+        logger.debug("Fetching escrow data using the Solana client")
         get_escrow_data_response = client.get_escrow_data(escrow_pubkey)
 
         # Check if the response from the Solana client is successful
         if 200 <= get_escrow_data_response.status_code < 300:
-            print("Successfully retrieved escrow data")
+            logger.debug("Successfully retrieved escrow data")
             get_escrow_data_response_json = get_escrow_data_response.json()
 
             # Extract the 'validate_every' parameter from the response
             validate_every = get_escrow_data_response_json.get("validate_every")
-            print(f"Validate every: {validate_every}")
+            logger.debug("Validate every: %s", validate_every)
+
+            # Keep the public parameters, the scrubber checks the stored blocks with them
+            u = get_escrow_data_response_json.get("u")
+            g = get_escrow_data_response_json.get("g")
+            v = get_escrow_data_response_json.get("v")
+
+            # The hash of a content is not a proof of its possession, the content of another owner is not
+            # disclosed, nor whether it is stored
+            if uploaded_file is None and not files_details_dict.has_object_of_owner(content_hash, v):
+                logger.info("Content %s is not stored for the owner of escrow %s", content_hash, escrow_pubkey)
+                return jsonify({"error": "Content not stored, upload the file"}), 404
         else:
-            print(f"Error: Failed to retrieve escrow data, status code: {get_escrow_data_response.status_code}")
+            logger.warning("Failed to retrieve escrow data", extra={"status_code": get_escrow_data_response.status_code})
             return jsonify({"error": f"Failed to retrieve escrow data"}), 500
 
     except Exception as e:
-        print(f"Exception while fetching escrow data: {str(e)}")
+        logger.exception("Exception while fetching escrow data")
         return jsonify({"error": f"Failed to fetch escrow data: {str(e)}"}), 500
 
-    # Save the uploaded file
+    # Save the uploaded file to the staging folder, hashing its content
+    staged_path = volume = None
+    if uploaded_file is not None:
+        try:
+            logger.debug("Saving file %s", filename)
+            volume = files_details_dict.choose_volume()
+            with transfer_duration_seconds.time(direction="upload"):
+                staged_path, content_hash = save_file(uploaded_file, get_backend(volume).staging_folder())
+            transfer_bytes_total.inc(os.path.getsize(staged_path), direction="upload")
+        except Exception as e:
+            logger.exception("Exception while saving file")
+            return jsonify({"error": f"Failed to save file: {str(e)}"}), 500
+
+    # Add the details of the file to the store, its content is stored once
     try:
-        print(f"Saving file: {uploaded_file.filename}")
-        file_path = save_file(uploaded_file, UPLOAD_FOLDER)
-        print(f"File saved at {file_path}")
-    except FileExistsError as e:
-        print(f"Error: File '{e.args[0]}' already exists in the directory")
-        return jsonify({"error": f"File '{e.args[0]}' already exists in the directory."}), 409
+        if staged_path is not None:
+            size = os.path.getsize(staged_path)
+        else:
+            object_backend, object_key = files_details_dict.get_object(content_hash)
+            size = object_backend.size(object_key)
+
+        is_deduplicated = files_details_dict.add_file(filename, {
+            "escrow_public_key": escrow_pubkey,
+            "validate_every": validate_every,
+            "last_verify": datetime.now(),
+            "u": u,
+            "g": g,
+            "v": v,
+            "sectors": sectors,
+            "number_of_blocks": -(-size // get_record_size(sectors))
+        }, content_hash, staged_path, volume)
+    except FileExistsError:
+        logger.warning("File '%s' already exists in the directory", filename)
+        return jsonify({"error": f"File '{filename}' already exists in the directory."}), 409
+    except FileNotFoundError:
+        logger.warning("Content %s was deleted before file %s referenced it", content_hash, filename)
+        return jsonify({"error": "Content not stored, upload the file"}), 404
     except Exception as e:
-        print(f"Exception while saving file: {str(e)}")
+        logger.exception("Exception while saving file")
         return jsonify({"error": f"Failed to save file: {str(e)}"}), 500
 
-    # Update the details of the uploaded file in the storage dictionary
-    files_details_dict[uploaded_file.filename] = {
-        "escrow_public_key": escrow_pubkey,
-        "validate_every": validate_every,
-        "last_verify": datetime.now()
-    }
-    print(f"Updated file details for {uploaded_file.filename}")
+    logger.info("Updated file details for %s", filename, extra={"content_hash": content_hash,
+                                                                "deduplicated": is_deduplicated})
 
     # Return a success message
-    return jsonify({"message": "File received and saved", "filename": uploaded_file.filename})
+    return jsonify({
+        "message": "File received and saved",
+        "filename": filename,
+        "content_hash": content_hash,
+        "deduplicated": is_deduplicated
+    })
+
+
+@api_bp.route("/api/append", methods=["POST"])
+def append_endpoint():
+    """
+    Handles the blocks appended to a stored file, tagged by the client with the keys of the file.
+
+    This function:
+    - Accepts the tagged blocks from the index of the first of them, the delta, via a POST request.
+    - Checks that they replace the end of the stored file from one of its last blocks, which may be
+      short, or extend it.
+    - Checks their authenticators with the public parameters of the file, before storing them.
+    - Stores the content of the file up to the first block with the delta, and its block count.
+
+    Args:
+        None
+
+    Returns:
+        jsonify (dict): A response object containing the new content hash and block count of the file, or an error message.
+    """
+    logger.info("Received file append request")
+
+    params = request.form
+    filename = params.get("filename", type=str)
+    first_block_index = params.get("first_block_index", type=int)
+    uploaded_file = request.files.get("file")
+
+    if not filename or first_block_index is None or uploaded_file is None:
+        logger.warning("Missing filename, first_block_index or file")
+        return jsonify({"error": "filename, first_block_index and file are required"}), 400
+
+    file_details = files_details_dict.get(filename)
+    if file_details is None:
+        logger.warning("File '%s' not found", filename)
+        return jsonify({"error": "File not found"}), 404
+
+    # The blocks before the first block of the delta are kept, they must all be full
+    sectors = file_details.get("sectors", 1)
+    record_size = get_record_size(sectors)
+    backend, key = files_details_dict.get_file_object(filename, UPLOAD_FOLDER)
+    stored_size = backend.size(key)
+    full_blocks = stored_size // record_size
+    min_first_block_index = max(-(-stored_size // record_size) - APPEND_MAX_REPLACED_BLOCKS, 0)
+    if not min_first_block_index <= first_block_index <= full_blocks:
+        logger.warning("Append to %s from block %s out of its last blocks", filename, first_block_index,
+                       extra={"full_blocks": full_blocks})
+        return jsonify({"error": f"The first block index must be between {min_first_block_index} and {full_blocks}"}), 400
+
+    # Save the delta to the staging folder of the volume of the new content
+    try:
+        volume = files_details_dict.choose_volume()
+        with transfer_duration_seconds.time(direction="upload"):
+            delta_path, _ = save_file(uploaded_file, get_backend(volume).staging_folder())
+        transfer_bytes_total.inc(os.path.getsize(delta_path), direction="upload")
+    except Exception as e:
+        logger.exception("Exception while saving file")
+        return jsonify({"error": f"Failed to save file: {str(e)}"}), 500
+
+    # Only authentic blocks are stored, the last block of the delta is the only short one
+    u = decompress_g1_from_hex(file_details["u"])
+    g = decompress_g2_from_hex(file_details["g"])
+    v = decompress_g2_from_hex(file_details["v"])
+
+    delta_blocks = 0
+    is_authentic = os.path.getsize(delta_path) > 0
+    with open(delta_path, "rb") as delta_file:
+        while is_authentic and (batch_data := delta_file.read(SCRUB_BATCH_BLOCKS * record_size)):
+            blocks = []
+            for offset in range(0, len(batch_data), record_size):
+                full_block = batch_data[offset:offset + record_size]
+                blocks.append((first_block_index + delta_blocks, full_block[:-MAC_SIZE_3D], full_block[-MAC_SIZE_3D:]))
+                delta_blocks += 1
+
+            is_authentic = len(full_block) > MAC_SIZE_3D and are_blocks_authentic(blocks, u, g, v, sectors)
+
+    if not is_authentic:
+        os.remove(delta_path)
+        logger.warning("The appended blocks of %s are not authentic", filename)
+        return jsonify({"error": "The appended blocks are not authentic"}), 400
+
+    # Store the content up to the first block with the delta, as a new object
+    try:
+        content_hash = files_details_dict.append_to_file(filename, file_details.get("content_hash"),
+                                                         first_block_index * record_size, delta_path, volume,
+                                                         number_of_blocks=first_block_index + delta_blocks)
+    except KeyError:
+        logger.warning("File '%s' was deleted meanwhile", filename)
+        return jsonify({"error": "File not found"}), 404
+    except ValueError as e:
+        logger.warning("Failed to append to %s: %s", filename, e)
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        logger.exception("Exception while appending to file")
+        return jsonify({"error": f"Failed to append to file: {str(e)}"}), 500
+
+    logger.info("Appended %s blocks to %s from block %s", delta_blocks, filename, first_block_index,
+                extra={"content_hash": content_hash})
+
+    return jsonify({
+        "message": "File appended",
+        "filename": filename,
+        "content_hash": content_hash,
+        "number_of_blocks": first_block_index + delta_blocks
+    })
 
 
 @api_bp.route("/api/calculate_and_prove", methods=["GET"])
@@ -277,11 +531,11 @@ def calculate_and_prove_endpoint():
         if not filename:
             return jsonify({"error": "Filename not provided"}), 400
 
-        # Construct the full file path
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
+        # Locate the content of the file
+        backend, key = files_details_dict.get_file_object(filename, UPLOAD_FOLDER)
 
         # Check if the file exists
-        if not os.path.exists(file_path):
+        if not backend.exists(key):
             return jsonify({"error": "File not found"}), 404
 
         # Calculate the values of σ and μ and check if the proof is valid
@@ -304,11 +558,21 @@ def corrupt_file_endpoint():
     This function:
     - Accepts a filename as a request parameter.
     - Checks if the filename is provided and if the file exists.
-    - If the file exists, it corrupts the file using the `corrupt_file_with_rs` function.
-    - If any errors occur during the process, it returns a 500 error with the exception message.
+    - If no corruption model is given, it corrupts the file using the `corrupt_file` function.
+    - Otherwise, it corrupts the file with `inject_faults`, treating the file as blocks with 3d point
+      authenticator tags, and returns the corruption report.
+    - The corrupted content is stored as a new object for this file only, the other files with the
+      same content keep the stored content.
+    - Parameters that do not fit the block layout, e.g. an offset past the data of a block, return a 400.
+    - If any other errors occur during the process, it returns a 500 error with the exception message.
 
-    Args:
-        None
+    Query Parameters:
+        filename (str): The name of the file to corrupt.
+        model (str, optional): The corruption model: bit_flip, burst, truncate or tag_only.
+        fraction (float, optional): Probability of each block to be corrupted (default 1.0).
+        offset (int, optional): Fixed offset of the corruption inside a block, random if not given.
+        length (int, optional): Burst length, or bytes cut off by the truncate model (default 1).
+        seed (int, optional): Seed that makes the corruption reproducible.
 
     Returns:
         jsonify (dict): A response object containing success or error message.
@@ -321,23 +585,96 @@ def corrupt_file_endpoint():
         if not file_name:
             return jsonify({"error": "Filename not provided"}), 400
 
-        file_path = os.path.join(UPLOAD_FOLDER, file_name)
+        backend, key = files_details_dict.get_file_object(file_name, UPLOAD_FOLDER)
 
-        if not os.path.exists(file_path):
+        if file_name not in files_details_dict or not backend.exists(key):
             return jsonify({"error": "File not found"}), 404
 
-        # corrupt the file by changing bytes
-        corrupt_file(file_path, file_path)
+        model = request.args.get("model")
+
+        # The content may be shared by other files with the same content, a copy of it is corrupted
+        if model is None:
+            # corrupt the file by changing bytes
+            files_details_dict.rewrite_file(file_name, lambda file_path: corrupt_file(file_path, file_path))
+
+            # Return the calculated values and the proof result
+            return jsonify({
+                "message": f'The file "{file_name}" corrupted.',
+            })
+
+        try:
+            report = files_details_dict.rewrite_file(file_name, lambda file_path: inject_faults(
+                file_path,
+                model=model,
+                block_size=get_record_size(files_details_dict.get(file_name, {}).get("sectors", 1)),
+                tag_size=MAC_SIZE_3D,
+                fraction=request.args.get("fraction", default=1.0, type=float),
+                offset=request.args.get("offset", type=int),
+                length=request.args.get("length", default=1, type=int),
+                seed=request.args.get("seed", type=int)))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        # Return the calculated values and the proof result
         return jsonify({
             "message": f'The file "{file_name}" corrupted.',
+            "report": report
         })
 
     except Exception as e:
         return jsonify({"error": f"An error occurred during calculation: {str(e)}"}), 500
 
 
+@api_bp.route("/api/scrub_status", methods=["GET"])
+def scrub_status_endpoint():
+    """
+    Returns the progress metrics of the background scrubber.
+
+    The scrubber periodically checks the blocks of the stored files against their authenticators
+    and repairs corrupt blocks with Reed-Solomon correction.
+
+    Args:
+        None
+
+    Returns:
+        jsonify (dict): The scrubber metrics: passes, files and blocks checked, bytes read, corrupt,
+        repaired and unrepairable blocks, the file being scrubbed and its progress.
+    """
+    with scrub_metrics_lock:
+        return jsonify(dict(scrub_metrics))
+
+
+@api_bp.route("/api/volumes", methods=["GET"])
+def volumes_endpoint():
+    """
+    Returns the usage of the storage volumes the stored contents are spread over.
+
+    Args:
+        None
+
+    Returns:
+        jsonify (dict): For each volume, its path, number of objects, stored bytes and free bytes.
+    """
+    return jsonify({"volumes": files_details_dict.volumes_usage()})
+
+
+@api_bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Exposes the server metrics in the Prometheus text exposition format.
+
+    The metrics cover the validation scheduler (run duration, lag, missed validation windows), the
+    phases of `calculate_sigma_mu_and_prove`, the Solana API Gateway round trips and the upload and
+    download throughput.
+
+    Args:
+        None
+
+    Returns:
+        Response: The metrics as plain text.
+    """
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
 def calculate_sigma_mu_and_prove(filename: str, escrow_public_key: str) -> bool:
     """
     Calculates the values of σ (sigma) and μ (mu) based on the provided file and escrow public key,
@@ -356,13 +693,34 @@ def calculate_sigma_mu_and_prove(filename: str, escrow_public_key: str) -> bool:
     Returns:
         bool: Returns True if the proof was successfully generated and verified, otherwise False.
     """
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
+    proof_start: float = time.perf_counter()
+    is_proved: bool = False
+    try:
+        with span("proof", filename=filename, escrow_public_key=escrow_public_key) as proof_span, \
+                profile_if_slow("proof"):
+            is_proved = _calculate_sigma_mu_and_prove(filename, escrow_public_key)
+            proof_span["attributes"]["is_proved"] = is_proved
+        return is_proved
+    finally:
+        proof_phase_duration_seconds.observe(time.perf_counter() - proof_start, phase="total")
+        proofs_total.inc(result="success" if is_proved else "failure")
+
+
+def _calculate_sigma_mu_and_prove(filename: str, escrow_public_key: str) -> bool:
+    """
+    Implements `calculate_sigma_mu_and_prove`, recording the duration of each of its phases.
+    """
+    backend, key = files_details_dict.get_file_object(filename, UPLOAD_FOLDER)
+    sectors: int = files_details_dict.get(filename, {}).get("sectors", 1)
 
     # Create client instance to interact with the Solana gateway
     client = SolanaGatewayClientProvider()
 
     # Fetch queries associated with the given escrow public key
-    generate_queries_response = client.generate_queries(SELLER_PRIVATE_KEY, escrow_public_key)
+    with span("generate_queries") as generate_queries_span, proof_phase_duration_seconds.time(phase="generate_queries"):
+        generate_queries_response = client.generate_queries(SELLER_PRIVATE_KEY, escrow_public_key)
+        generate_queries_span["attributes"]["status_code"] = generate_queries_response.status_code
+    queries_generation_time: float = time.monotonic()
 
     if 200 <= generate_queries_response.status_code < 300:
         # Assuming generate_queries_response is the response from the GET query
@@ -370,12 +728,14 @@ def calculate_sigma_mu_and_prove(filename: str, escrow_public_key: str) -> bool:
 
         # Fetch the 'message' key's value (for logging or debugging purposes)
         message = generate_queries_response_json.get("message")
-        print(message)
+        logger.info("%s", message)
     else:
         return False
 
     # Fetch existing queries associated with the escrow public key
-    get_queries_by_escrow_pubkey_response = client.get_queries_by_escrow(escrow_public_key)
+    with span("get_queries") as get_queries_span, proof_phase_duration_seconds.time(phase="get_queries"):
+        get_queries_by_escrow_pubkey_response = client.get_queries_by_escrow(escrow_public_key)
+        get_queries_span["attributes"]["status_code"] = get_queries_by_escrow_pubkey_response.status_code
 
     if 200 <= get_queries_by_escrow_pubkey_response.status_code < 300:
         # Assuming get_queries_response is the response from the GET query
@@ -386,61 +746,78 @@ def calculate_sigma_mu_and_prove(filename: str, escrow_public_key: str) -> bool:
     else:
         return False
 
-    # Separate the indices and coefficients from the queries
-    indices = [query[0] for query in queries]
-    coefficients = [int(query[1], 16) for query in queries]
+    # The challenged blocks in file order, the coefficients of a block queried several times are summed
+    challenge: dict[int, int] = normalize_challenge(((query[0], int(query[1], 16)) for query in queries), p)
+
+    # Initialize the variables for σ and μ, σ = Π(σ_i^(v_i)) is computed once the blocks are read
+    authenticators: list[bytes] = []
+    v_i_values: list[int] = []
+    μ_j_values: list[int] = [0] * sectors   # μ_j = Σ(v_i * m_ij), a single μ for a single sector
+
+    # Time spent reading blocks and computing, and the bytes read
+    read_seconds: float = 0.0
+    compute_seconds: float = 0.0
+    bytes_read: int = 0
+
+    # Process the file to calculate σ and μ, the reads and the EC math interleave so their times are attributes
+    with span("process_blocks", query_size=len(queries)) as process_blocks_span:
+        # Only the challenged blocks are read, ranged GETs on object storage
+        full_block_size: int = get_record_size(sectors)    # The block data, 128-byte * 3 for 3d point authenticator tag
+        full_blocks = backend.read_ranges(key, [(block_index * full_block_size, full_block_size)
+                                                for block_index in challenge])
+
+        for block_index, v_i in challenge.items():
+            # Read the next challenged block (data + authenticator)
+            read_start: float = time.perf_counter()
+            full_block: bytes = next(full_blocks)
+            compute_start: float = time.perf_counter()
+            read_seconds += compute_start - read_start
+            bytes_read += len(full_block)
 
-    # Initialize the variables for σ and μ
-    σ = None
-    μ: int = 0
-
-    # Process the file to calculate σ and μ
-    with open(file_path, "rb") as f:
-        block_index: int = 0
-
-        while True:
-            # Read the next block (data + authenticator)
-            full_block: bytes = f.read(BLOCK_SIZE + MAC_SIZE_3D)  # up-to 1024-byte data, 4-byte * 3 for 3d point authenticator tag
             if not full_block:
-                break  # End of file
+                break  # Past the end of file, as are the next challenged blocks
 
-            # Extract m_i from the block data
-            m_i: int = int.from_bytes(full_block[:-MAC_SIZE_3D], byteorder='big') % p
+            # Keep the 3D MAC of σ_i (x, y, z coordinates), the points are read together once the blocks are
+            authenticators.append(full_block[-MAC_SIZE_3D:])
+            v_i_values.append(v_i)
 
-            # Extract 3D MAC (x, y, z coordinates)
-            _3d_mac: bytes = full_block[-MAC_SIZE_3D:]
-            mac_x_coordinate: bytes = _3d_mac[0:MAC_SIZE]  # Bytes 0 - (MAC_SIZE - 1)
-            mac_y_coordinate: bytes = _3d_mac[MAC_SIZE:2 * MAC_SIZE]  # Bytes (MAC_SIZE) - (2 * MAC_SIZE - 1)
-            mac_z_coordinate: bytes = _3d_mac[2 * MAC_SIZE:3 * MAC_SIZE]  # Bytes (2 * MAC_SIZE) - (3 * MAC_SIZE - 1)
+            # Update each μ_j with the sector m_ij of the block data
+            for j, m_ij in enumerate(block_to_sectors(full_block[:-MAC_SIZE_3D], sectors, p)):
+                μ_j_values[j] = (μ_j_values[j] + v_i * m_ij) % p
 
-            # Convert MAC coordinates to integers
-            mac_x_coordinate_as_int = int.from_bytes(mac_x_coordinate, byteorder='big')
-            mac_y_coordinate_as_int = int.from_bytes(mac_y_coordinate, byteorder='big')
-            mac_z_coordinate_as_int = int.from_bytes(mac_z_coordinate, byteorder='big')
+            compute_seconds += time.perf_counter() - compute_start
 
-            # Create the σ_i tuple for the current block
-            σ_i = (bls_opt.FQ(mac_x_coordinate_as_int), bls_opt.FQ(mac_y_coordinate_as_int),
-                   bls_opt.FQ(mac_z_coordinate_as_int))
+        # Read the σ_i with a single field inversion, a damaged one cannot give a valid proof
+        compute_start = time.perf_counter()
+        try:
+            σ_i_values: list = bytes_to_curve_field_elements(authenticators, MAC_SIZE)
+        except ValueError:
+            logger.warning("An authenticator of the challenged blocks of file %s is not a curve point", filename)
+            return False
 
-            # If this block's index is part of the queries, calculate the corresponding values
-            if block_index in indices:
-                v_i: int = coefficients[indices.index(block_index)]
-                σ_i_power_v_i = bls_opt.multiply(σ_i, v_i)  # (σ_i)^(v_i)
+        # Aggregate σ = Π(σ_i^(v_i)) in a single multi-exponentiation
+        σ = curve.multiexp_g1(σ_i_values, v_i_values)
+        compute_seconds += time.perf_counter() - compute_start
 
-                # Aggregate the σ_i values
-                if σ is None:
-                    σ = σ_i_power_v_i
-                else:
-                    σ = bls_opt.add(σ, σ_i_power_v_i)
+        process_blocks_span["attributes"].update(blocks=len(challenge), bytes_read=bytes_read,
+                                                 read_seconds=read_seconds, compute_seconds=compute_seconds)
 
-                # Update μ with the corresponding value
-                v_i_multiply_m_i = (v_i * m_i) % p
-                μ = (μ + v_i_multiply_m_i) % p
+    proof_phase_duration_seconds.observe(read_seconds, phase="read_blocks")
+    proof_phase_duration_seconds.observe(compute_seconds, phase="compute")
+    proof_bytes_read.observe(bytes_read)
 
-            block_index += 1
+    # The program rejects a proof submitted past the deadline, the submission would only cost a transaction fee
+    if time.monotonic() - queries_generation_time > PROOF_SUBMISSION_DEADLINE:
+        logger.warning("The proof of file %s missed the submission deadline of %s seconds", filename,
+                       PROOF_SUBMISSION_DEADLINE)
+        return False
 
-    # Send the proof request to the Solana gateway
-    prove_response = client.prove(SELLER_PRIVATE_KEY, escrow_public_key, compress_g1_to_hex(σ), μ.to_bytes(32, 'big').hex())
+    # Send the proof request to the Solana gateway, μ_1..μ_s for a file of s > 1 sectors per block
+    μ_hex_values: list[str] = [μ_j.to_bytes(32, 'big').hex() for μ_j in μ_j_values]
+    with span("submit") as submit_span, proof_phase_duration_seconds.time(phase="submit"):
+        prove_response = client.prove(SELLER_PRIVATE_KEY, escrow_public_key, compress_g1_to_hex(σ),
+                                      μ_hex_values[0] if sectors == 1 else μ_hex_values)
+        submit_span["attributes"]["status_code"] = prove_response.status_code
 
     if 200 <= prove_response.status_code < 300:
         # Assuming prove_response is the response from the prove request
@@ -449,10 +826,10 @@ def calculate_sigma_mu_and_prove(filename: str, escrow_public_key: str) -> bool:
         try:
             # Fetch the 'message' from request body
             message = prove_response_json.get("message")
-            if message == "Subscription extended successfully":
+            if message in PROVE_SUCCESS_MESSAGES:
                 return True  # Return True to indicate the proof was successfully generated and verified
-        except Exception as e:
-            print(f"Exception occurred while parsing prove request: {str(e)}")
+        except Exception:
+            logger.exception("Exception occurred while parsing prove request")
             return False
 
     return False  # Return False if the proof request failed
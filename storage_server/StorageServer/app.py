@@ -0,0 +1,195 @@
+# Standard library imports
+from datetime import datetime, timedelta
+import atexit
+import logging
+
+# Third-party library imports
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import BaseScheduler
+from flask import Flask
+from flask_cors import CORS
+
+# Local imports
+from .api import api_bp, calculate_sigma_mu_and_prove
+from .Common.Providers.solanaApiGatewayProvider import request_observers
+from .helpers import delete_file_from_storage_server, end_subscription_by_seller, request_funds, get_escrow_data
+from .metrics import observe_gateway_request, scheduler_run_duration_seconds, scheduler_lag_seconds, \
+    validation_window_misses_total, stored_files
+from .tracing import span
+from .logger import get_logger
+from .scrubber import scrub_files, SCRUB_EVERY_IN_SECONDS
+from .storage import files_details_dict
+
+
+RUN_JOB_EVERY_IN_SECONDS: int = 20
+
+logger = get_logger(__name__)
+
+
+def create_app(run_scheduler: bool = True, end_subscriptions_on_exit: bool = False):
+    """
+    Creates the Flask app of the storage server.
+
+    Args:
+        run_scheduler (bool): Whether to run the validation and scrubbing jobs in the background of
+            this process. The production API workers do not, the scheduler process runs them.
+        end_subscriptions_on_exit (bool): Whether to end the subscriptions of the stored files when the
+            process exits. Only the development server does, as it starts from an empty storage.
+    """
+    # Initialize the Flask app
+    app = Flask(__name__)
+
+    # Enable CORS for all routes (or customize as needed)
+    CORS(app)
+
+    # Register the API Blueprint for the StorageServer2 app
+    app.register_blueprint(api_bp)
+
+    # Record the round-trip time of every Solana API Gateway request
+    if observe_gateway_request not in request_observers:
+        request_observers.append(observe_gateway_request)
+
+    if run_scheduler:
+        # Initialize the scheduler (used to run jobs in the background)
+        start_scheduler(BackgroundScheduler(), end_subscriptions_on_exit)
+
+    return app
+
+
+def end_subscriptions():
+    """
+    Ends the subscriptions of the stored files by the seller.
+    """
+    # Create a copy of the files details dictionary for safe iteration
+    files_details_dict_copy = files_details_dict.copy()
+
+    # Iterate over each file's details in the copy of the dictionary
+    for filename, file_details in files_details_dict_copy.items():
+        logger.debug("Processing file %s", filename)
+
+        escrow_public_key = file_details.get("escrow_public_key")
+        logger.debug("Escrow public key for %s: %s", filename, escrow_public_key)
+
+        # End the subscription by the seller (if applicable)
+        logger.info("Ending subscription for %s using escrow public key %s", filename, escrow_public_key)
+        end_subscription_by_seller(escrow_public_key)
+
+
+def start_scheduler(scheduler: BaseScheduler, end_subscriptions_on_exit: bool = False):
+    """
+    Adds the validation and scrubbing jobs to the scheduler and starts it.
+
+    A background scheduler starts in its own thread, a blocking scheduler runs the jobs until the
+    process is stopped. On exit, the scheduler is shut down, the subscriptions of the stored files
+    are kept unless `end_subscriptions_on_exit` is set: a restart or a deploy resumes the proofs.
+
+    Args:
+        scheduler (BaseScheduler): The scheduler to run the jobs.
+        end_subscriptions_on_exit (bool): Whether to end the subscriptions of the stored files on exit.
+    """
+    # Record the round-trip time of every Solana API Gateway request
+    if observe_gateway_request not in request_observers:
+        request_observers.append(observe_gateway_request)
+
+    # Function to check the files and trigger the handle function
+    def check_files_to_validate():
+        with span("validation_run"), scheduler_run_duration_seconds.time():
+            validate_files()
+
+    def validate_files():
+        logger.debug("Starting to validate files")
+
+        # Create a copy of the files details dictionary for safe iteration
+        files_details_dict_copy = files_details_dict.copy()
+        stored_files.set(len(files_details_dict_copy))
+
+        # Iterate over each file's details in the copy of the dictionary
+        for filename, file_details in files_details_dict_copy.items():
+            validate_every = file_details.get("validate_every")  # Time interval for validation
+            last_verify = file_details.get("last_verify")  # Last verification timestamp
+
+            # Debug line to track when validation is due, built only when debug logging is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Checking file %s", filename, extra={
+                    "last_verify": last_verify,
+                    "validate_every": timedelta(seconds=validate_every),
+                    "next_validation": last_verify + timedelta(seconds=validate_every)
+                })
+
+            # Check if it's time to validate the file
+            if last_verify + timedelta(seconds=validate_every) < datetime.now():
+                logger.info("Validating file %s", filename)
+
+                # How late the file is handled, past one scheduler run its validation window is missed
+                lag_in_seconds = (datetime.now() - (last_verify + timedelta(seconds=validate_every))).total_seconds()
+                scheduler_lag_seconds.observe(lag_in_seconds)
+                is_window_missed = lag_in_seconds > RUN_JOB_EVERY_IN_SECONDS
+
+                with span("validate_file", filename=filename, lag_in_seconds=lag_in_seconds):
+                    # Retrieve escrow details to check subscription status
+                    escrow_public_key = file_details.get("escrow_public_key")
+                    with span("get_escrow_data"):
+                        escrow_data = get_escrow_data(escrow_public_key)
+
+                    is_subscription_ended_by_buyer = escrow_data.get("is_subscription_ended_by_buyer")
+                    logger.debug("Subscription ended by buyer: %s", is_subscription_ended_by_buyer)
+
+                    # If the subscription has ended, request funds
+                    if is_subscription_ended_by_buyer:
+                        logger.info("Subscription of file %s ended, requesting funds", filename)
+                        with span("request_funds"):
+                            is_get_funds = request_funds(escrow_public_key)
+
+                        # If funds are successfully retrieved
+                        if is_get_funds:
+                            logger.info("Funds received, removing file %s", filename)
+                            delete_file_from_storage_server(filename)   # remove the file from the store and the storage server
+                            stored_files.set(len(files_details_dict))
+                    else:
+                        escrow_balance = escrow_data.get("balance")
+                        query_size = escrow_data.get("query_size")
+
+                        # Calculate the cost of proving
+                        prove_cost = 1.0 + 0.05 * query_size
+                        logger.debug("Escrow balance: %s, prove cost: %s", escrow_balance, prove_cost)
+
+                        # If there is enough balance, proceed with proving
+                        if escrow_balance >= prove_cost:
+                            logger.debug("Enough balance, proving for file %s", filename)
+                            is_proved = calculate_sigma_mu_and_prove(filename, escrow_public_key)
+
+                            # If proving is successful, update the last verification timestamp
+                            if is_proved:
+                                logger.info("File %s successfully proved, updating last verification timestamp", filename)
+                                files_details_dict.update_file_details(filename, last_verify=datetime.now())
+                            else:
+                                is_window_missed = True
+                        else:
+                            logger.warning("Not enough balance for proving for file %s", filename)
+
+                        if is_window_missed:
+                            validation_window_misses_total.inc()
+
+        logger.debug("File validation check complete")
+
+    logger.info("Adding job to scheduler to run every %s seconds", RUN_JOB_EVERY_IN_SECONDS)
+    scheduler.add_job(check_files_to_validate, 'interval', seconds=RUN_JOB_EVERY_IN_SECONDS, max_instances=1)
+
+    # The scrubber detects and repairs corrupt blocks, it reads under its own I/O budget
+    logger.info("Adding scrubbing job to scheduler to run every %s seconds", SCRUB_EVERY_IN_SECONDS)
+    scheduler.add_job(scrub_files, 'interval', seconds=SCRUB_EVERY_IN_SECONDS, max_instances=1)
+
+    # Graceful shutdown for the scheduler when the app stops
+    def shutdown_scheduler():
+        if end_subscriptions_on_exit:
+            end_subscriptions()
+
+        if scheduler.running:
+            logger.info("Shutting down scheduler")
+            scheduler.shutdown()
+            logger.info("Scheduler has been shut down")
+
+    # Register the shutdown function to be called when the app exits
+    atexit.register(shutdown_scheduler)
+
+    scheduler.start()
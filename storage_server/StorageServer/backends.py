@@ -0,0 +1,208 @@
+# Standard library imports
+import os
+import shutil
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+from urllib.parse import urlparse
+
+# Third-party library imports
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:     # The S3 backend is optional, the local backend needs nothing
+    boto3 = None
+
+# Local imports
+from .config import UPLOAD_FOLDER
+
+
+# Endpoint of an S3-compatible service, e.g. a MinIO server, the AWS endpoint if not set
+S3_ENDPOINT_URL: Optional[str] = os.environ.get("S3_ENDPOINT_URL")
+
+STAGING_FOLDER_NAME: str = ".staging"
+DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024
+
+
+class StorageBackend:
+    """
+    Stores objects by key on a volume: a local directory, or a bucket of an S3-compatible service.
+    """
+
+    def staging_folder(self) -> str:
+        """
+        Return the local folder the uploads are staged in before `put`.
+        """
+        raise NotImplementedError
+
+    def put(self, key: str, staged_path: str) -> None:
+        """
+        Store a staged file as an object, the staged file is consumed.
+        """
+        raise NotImplementedError
+
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        """
+        Read up to `length` bytes of an object at `offset`, fewer at its end, none past it.
+        """
+        raise NotImplementedError
+
+    def read_ranges(self, key: str, ranges: Iterable[tuple[int, int]]) -> Iterator[bytes]:
+        """
+        Read (offset, length) ranges of an object, in order.
+        """
+        for offset, length in ranges:
+            yield self.read_range(key, offset, length)
+
+    def iter_chunks(self, key: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Stream a whole object in chunks.
+        """
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def free_bytes(self) -> Optional[int]:
+        """
+        Return the free space of the volume, None if unlimited.
+        """
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """
+        Return the path of an object on the local file system, None if it is not a local file.
+
+        In-place operations, the scrubber repairs and the fault injection, need a local file.
+        """
+        return None
+
+
+class LocalBackend(StorageBackend):
+    """
+    Stores the objects as files under a local directory, the key is the relative path.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def staging_folder(self) -> str:
+        # On the volume itself, so storing a staged file is a rename
+        return os.path.join(self.root, STAGING_FOLDER_NAME)
+
+    def put(self, key: str, staged_path: str) -> None:
+        path: str = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged_path, path)
+
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        with open(self.local_path(key), "rb") as f:
+            return os.pread(f.fileno(), length, offset)
+
+    def read_ranges(self, key: str, ranges: Iterable[tuple[int, int]]) -> Iterator[bytes]:
+        # A single open for all the ranges
+        with open(self.local_path(key), "rb") as f:
+            for offset, length in ranges:
+                yield os.pread(f.fileno(), length, offset)
+
+    def iter_chunks(self, key: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.local_path(key), "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.local_path(key))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key: str) -> None:
+        if os.path.exists(self.local_path(key)):
+            os.remove(self.local_path(key))
+
+    def free_bytes(self) -> Optional[int]:
+        return shutil.disk_usage(self.root).free
+
+    def local_path(self, key: str) -> Optional[str]:
+        return os.path.join(self.root, key)
+
+
+class S3Backend(StorageBackend):
+    """
+    Stores the objects in a bucket of an S3-compatible service, under a key prefix.
+
+    Reads are ranged GETs, so a proof fetches only the challenged blocks of a file. Requires boto3,
+    the credentials are read by boto3 from its usual sources, e.g. AWS_ACCESS_KEY_ID.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = S3_ENDPOINT_URL):
+        if boto3 is None:
+            raise ImportError("The S3 storage backend requires boto3, install it with: pip install boto3")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def staging_folder(self) -> str:
+        return os.path.join(UPLOAD_FOLDER, STAGING_FOLDER_NAME)
+
+    def put(self, key: str, staged_path: str) -> None:
+        self.client.upload_file(staged_path, self.bucket, self._object_key(key))
+        os.remove(staged_path)
+
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key),
+                                              Range=f"bytes={offset}-{offset + length - 1}")
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "InvalidRange":
+                return b""  # The range starts past the end of the object
+            raise
+
+        return response["Body"].read()
+
+    def iter_chunks(self, key: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        yield from response["Body"].iter_chunks(chunk_size)
+
+    def size(self, key: str) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))["ContentLength"]
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+        return True
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def free_bytes(self) -> Optional[int]:
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_backend(volume: str) -> StorageBackend:
+    """
+    Return the backend of a storage volume: s3://bucket/prefix for an S3 bucket, a local directory otherwise.
+    """
+    parsed_volume = urlparse(volume)
+    if parsed_volume.scheme == "s3":
+        return S3Backend(parsed_volume.netloc, parsed_volume.path)
+
+    return LocalBackend(volume)
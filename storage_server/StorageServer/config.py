@@ -4,17 +4,65 @@ import os
 # Third-party library imports
 import shutil
 
+# Local imports
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
+
 # Directory to save uploaded files
-UPLOAD_FOLDER = 'StorageDirectory'
-
-# Check if the folder already exists
-if os.path.exists(UPLOAD_FOLDER):
-    print(f"Directory '{UPLOAD_FOLDER}' exists. Removing it...")
-    # Remove the existing directory and all its contents
-    shutil.rmtree(UPLOAD_FOLDER)
-    print(f"Directory '{UPLOAD_FOLDER}' has been removed.")
-else:
-    print(f"Directory '{UPLOAD_FOLDER}' does not exist. Creating it...")
-    # Ensure the directory exists
-    os.makedirs(UPLOAD_FOLDER)
-    print(f"Directory '{UPLOAD_FOLDER}' has been created.")
+UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", 'StorageDirectory')
+
+# Directories, typically on distinct disks, or s3://bucket/prefix object storages, the contents of the files are
+# spread over, separated by commas
+STORAGE_VOLUMES = os.environ["STORAGE_VOLUMES"].split(",") if os.environ.get("STORAGE_VOLUMES") else [UPLOAD_FOLDER]
+
+# SQLite database of the stored files details, shared by the API workers and the scheduler process
+METADATA_DB_PATH = os.environ.get("METADATA_DB_PATH", 'metadata.db')
+
+
+def reset_storage():
+    """
+    Removes the stored files and their details, the development server starts from an empty storage.
+    """
+    # Check if the folder already exists
+    if os.path.exists(UPLOAD_FOLDER):
+        logger.info("Directory '%s' exists. Removing it...", UPLOAD_FOLDER)
+        # Remove the existing directory and all its contents
+        shutil.rmtree(UPLOAD_FOLDER)
+        logger.info("Directory '%s' has been removed.", UPLOAD_FOLDER)
+
+    # The volumes may be mount points, only their contents are removed
+    for volume in STORAGE_VOLUMES:
+        if "://" not in volume and os.path.isdir(volume):
+            logger.info("Removing the contents of volume '%s'...", volume)
+            for entry in os.scandir(volume):
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+
+    # Remove the database with its write-ahead log files
+    for path in (METADATA_DB_PATH, f"{METADATA_DB_PATH}-wal", f"{METADATA_DB_PATH}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    ensure_storage()
+
+
+def ensure_storage():
+    """
+    Creates the upload folder and the storage volumes if they do not exist.
+    """
+    for folder in dict.fromkeys([UPLOAD_FOLDER, *STORAGE_VOLUMES]):
+        if "://" in folder:
+            continue    # An object storage volume, e.g. s3://bucket/prefix
+
+        if not os.path.exists(folder):
+            logger.info("Directory '%s' does not exist. Creating it...", folder)
+            # Ensure the directory exists
+            os.makedirs(folder, exist_ok=True)
+            logger.info("Directory '%s' has been created.", folder)
+
+
+ensure_storage()
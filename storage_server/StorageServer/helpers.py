@@ -5,6 +5,11 @@ import os
 from .Common.Providers.solanaApiGatewayProvider import SolanaGatewayClientProvider
 from .config import UPLOAD_FOLDER
 from .constants import SELLER_PRIVATE_KEY
+from .storage import files_details_dict
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
 
 
 def get_escrow_data(escrow_public_key: str):
@@ -25,21 +30,21 @@ def get_escrow_data(escrow_public_key: str):
     try:
         # Initialize Solana client and get escrow data
         client = SolanaGatewayClientProvider()
-        print(f"Fetching escrow data for escrow public key: {escrow_public_key} using the Solana client")
+        logger.debug("Fetching escrow data using the Solana client", extra={"escrow_public_key": escrow_public_key})
 
         # Send the request to fetch escrow data
         get_escrow_data_response = client.get_escrow_data(escrow_public_key)
 
         # Check if the response from the Solana client is successful
         if 200 <= get_escrow_data_response.status_code < 300:
-            print("Successfully fetched escrow data.")
+            logger.debug("Successfully fetched escrow data")
             return get_escrow_data_response.json()
         else:
-            print(f"Failed to fetch escrow data, status code: {get_escrow_data_response.status_code}")
+            logger.warning("Failed to fetch escrow data", extra={"status_code": get_escrow_data_response.status_code})
             return None
 
-    except Exception as e:
-        print(f"Exception occurred while fetching escrow data: {str(e)}")
+    except Exception:
+        logger.exception("Exception occurred while fetching escrow data")
         return None
 
 
@@ -61,7 +66,7 @@ def request_funds(escrow_public_key: str) -> bool:
     try:
         # Initialize Solana client and send request for funds
         client = SolanaGatewayClientProvider()
-        print(f"Requesting funds from escrow public key: {escrow_public_key} using the Solana client")
+        logger.info("Requesting funds using the Solana client", extra={"escrow_public_key": escrow_public_key})
 
         # Send the request to the Solana client for funds
         request_funds_response = client.request_funds(SELLER_PRIVATE_KEY, escrow_public_key)
@@ -70,14 +75,14 @@ def request_funds(escrow_public_key: str) -> bool:
         if 200 <= request_funds_response.status_code < 300:
             request_funds_response_json = request_funds_response.json()
             message = request_funds_response_json.get("message")
-            print(f"Fund request successful. Message: {message}")
+            logger.info("Fund request successful: %s", message)
             return True
         else:
-            print(f"Request Fund Failed. Status Code: {request_funds_response.status_code}")
+            logger.warning("Fund request failed", extra={"status_code": request_funds_response.status_code})
             return False
 
-    except Exception as e:
-        print(f"Exception occurred while requesting funds: {str(e)}")
+    except Exception:
+        logger.exception("Exception occurred while requesting funds")
         return False
 
 
@@ -99,7 +104,7 @@ def end_subscription_by_seller(escrow_public_key: str) -> bool:
     try:
         # Initialize Solana client and send request to end subscription
         client = SolanaGatewayClientProvider()
-        print(f"Ending subscription for escrow public key: {escrow_public_key} using the Solana client")
+        logger.info("Ending subscription using the Solana client", extra={"escrow_public_key": escrow_public_key})
 
         # Send the request to the Solana client to end the subscription
         request_funds_response = client.end_subscription_by_seller(SELLER_PRIVATE_KEY, escrow_public_key)
@@ -108,14 +113,14 @@ def end_subscription_by_seller(escrow_public_key: str) -> bool:
         if 200 <= request_funds_response.status_code < 300:
             request_funds_response_json = request_funds_response.json()
             message = request_funds_response_json.get("message")
-            print(f"Subscription ended successfully. Message: {message}")
+            logger.info("Subscription ended successfully: %s", message)
             return True
         else:
-            print(f"End Subscription Failed. Status Code: {request_funds_response.status_code}")
+            logger.warning("End subscription failed", extra={"status_code": request_funds_response.status_code})
             return False
 
-    except Exception as e:
-        print(f"Exception occurred while ending subscription: {str(e)}")
+    except Exception:
+        logger.exception("Exception occurred while ending subscription")
         return False
 
 
@@ -124,7 +129,8 @@ def delete_file_from_storage_server(file_name: str):
     Deletes a file from the storage server.
 
     This function:
-    - Constructs the full file path based on the provided filename.
+    - Removes the file details from the store, with the stored content once no other file references it.
+    - Otherwise, for a file stored under its name, constructs the full file path based on the provided filename.
     - Checks if the file exists in the storage directory.
     - Deletes the file if it exists and logs the success message.
     - Logs an error message if the file does not exist.
@@ -135,16 +141,21 @@ def delete_file_from_storage_server(file_name: str):
     Returns:
         None
     """
+    file_details = files_details_dict.remove_file(file_name)
+    if file_details is not None and file_details.get("content_hash"):
+        logger.info("File %s deleted successfully", file_name, extra={"content_hash": file_details["content_hash"]})
+        return
+
     file_path = os.path.join(UPLOAD_FOLDER, file_name)
-    print(f"Attempting to delete file: {file_path}")
+    logger.debug("Attempting to delete file %s", file_path)
 
     # Check if the file exists at the specified path
     if os.path.exists(file_path):
         try:
             # Remove the file
             os.remove(file_path)
-            print(f"File {file_path} deleted successfully.")
-        except Exception as e:
-            print(f"Error deleting file {file_path}: {str(e)}")
+            logger.info("File %s deleted successfully", file_path)
+        except Exception:
+            logger.exception("Error deleting file %s", file_path)
     else:
-        print(f"The file {file_path} does not exist.")
+        logger.warning("The file %s does not exist", file_path)
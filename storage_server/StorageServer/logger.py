@@ -0,0 +1,116 @@
+# Standard library imports
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime
+from typing import Optional
+
+
+# Level and format of the server logs, "text" is one line of key=value pairs per record, "json" one JSON object
+LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT: str = os.environ.get("LOG_FORMAT", "text")
+
+# The root logger of the server, the loggers of its subsystems are its children, e.g. StorageServer.api
+ROOT_LOGGER_NAME: str = "StorageServer"
+
+# The attributes every LogRecord has, anything else comes from `extra` and is a structured field
+_RECORD_ATTRIBUTES: frozenset[str] = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _record_fields(record: logging.LogRecord) -> dict:
+    """
+    Return the structured fields of a record, the `extra` passed to the logging call.
+    """
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Formats a record as a line: time, level, logger, message and the structured fields as key=value.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        line: str = (f"{datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds')} "
+                     f"{record.levelname:<7} {record.name}: {record.getMessage()}")
+
+        fields: dict = _record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a JSON object: time, level, logger, message and the structured fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_record_fields(record)
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT) -> None:
+    """
+    Configure the server logging, once: the loggers only enqueue records, a background thread formats
+    them and writes them to stdout.
+
+    Writing to stdout is the slow part of logging and is done off the request and job threads, so a
+    log call costs merging its message and an enqueue. Records below the level are dropped by the
+    logger itself, before the message is merged, so disabled debug lines in hot loops cost a level
+    check as long as they pass their values as arguments and not as f-strings.
+
+    Args:
+        level (str): The minimum level of the logged records, e.g. "DEBUG" or "INFO".
+        log_format (str): "text" or "json".
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    # The queue is unbounded, the logging calls never block
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+    root_logger = logging.getLogger(ROOT_LOGGER_NAME)
+    root_logger.setLevel(level)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.propagate = False
+
+    # Flush the queued records when the server exits
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Return the logger of a subsystem of the server, configuring the logging on first use.
+
+    Args:
+        name (str): The module name, `__name__`, which is under the `StorageServer` root logger.
+
+    Returns:
+        logging.Logger: The logger.
+    """
+    configure_logging()
+    return logging.getLogger(name)
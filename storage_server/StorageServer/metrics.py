@@ -0,0 +1,332 @@
+# Standard library imports
+import atexit
+import copy
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+# The worker processes of the production API each keep their own metrics. With this directory set, every
+# process writes a snapshot of its metrics to it, and /metrics renders the metrics of all of them merged
+METRICS_MULTIPROCESS_DIR: Optional[str] = os.environ.get("METRICS_MULTIPROCESS_DIR") or None
+SNAPSHOT_INTERVAL_IN_SECONDS: float = 1.0   # The snapshot of a process follows its changes within this delay
+
+DEFAULT_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS: tuple[float, ...] = tuple(float(1024 * 4 ** i) for i in range(12))    # 1 KiB to 4 GiB
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...], extra: str = "") -> str:
+    """
+    Format label names and values in the Prometheus text format, e.g. {phase="submit",le="0.5"}.
+    """
+    labels: list[str] = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        labels.append(extra)
+
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_value(value: float) -> str:
+    """
+    Format a sample value in the Prometheus text format.
+    """
+    if math.isinf(value):
+        return "+Inf"
+
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    Base class of the metrics: a name, a help text, label names and one series per label values.
+    """
+
+    metric_type: str = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], object] = {}
+
+        registry.append(self)
+
+    def _label_values(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} expects the labels {self.label_names}, got {tuple(labels)}.")
+
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _render_series(self, series: dict) -> list[str]:
+        raise NotImplementedError
+
+    def _merge_series(self, merged: dict, label_values: tuple[str, ...], value) -> None:
+        """
+        Merge the value of a series in the snapshot of a process into the merged series.
+        """
+        raise NotImplementedError
+
+    def snapshot(self) -> list[list]:
+        """
+        Return the series of the metric as [label values, value] pairs, for the snapshot of the process.
+        """
+        with self._lock:
+            return [[list(label_values), copy.deepcopy(value)] for label_values, value in self._series.items()]
+
+    def render(self, series: Optional[dict] = None) -> str:
+        """
+        Render the metric in the Prometheus text exposition format, its own series, or the given series,
+        merged from the snapshots of the processes.
+        """
+        with self._lock:
+            lines: list[str] = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+            lines.extend(self._render_series(self._series if series is None else series))
+
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, such as a number of requests or of bytes read.
+    """
+
+    metric_type: str = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        label_values: tuple[str, ...] = self._label_values(labels)
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+        _schedule_snapshot()
+
+    def _merge_series(self, merged: dict, label_values: tuple[str, ...], value) -> None:
+        # The counts of the processes add up
+        merged[label_values] = merged.get(label_values, 0) + value
+
+    def _render_series(self, series: dict) -> list[str]:
+        return [f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+                for label_values, value in series.items()]
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, such as the number of stored files.
+    """
+
+    metric_type: str = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        label_values: tuple[str, ...] = self._label_values(labels)
+        with self._lock:
+            self._series[label_values] = value
+        _schedule_snapshot()
+
+    def _merge_series(self, merged: dict, label_values: tuple[str, ...], value) -> None:
+        # The snapshots are merged from the oldest, the most recent value wins
+        merged[label_values] = value
+
+    def _render_series(self, series: dict) -> list[str]:
+        return [f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+                for label_values, value in series.items()]
+
+
+class Histogram(Metric):
+    """
+    A distribution of observed values, such as latencies, counted in cumulative buckets.
+    """
+
+    metric_type: str = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        label_values: tuple[str, ...] = self._label_values(labels)
+        with self._lock:
+            # Per series: a count per bucket, the sum and the count of the observed values
+            series = self._series.setdefault(label_values, [[0] * len(self.buckets), 0.0, 0])
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+        _schedule_snapshot()
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """
+        Observe the duration of the `with` block in seconds.
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _merge_series(self, merged: dict, label_values: tuple[str, ...], value) -> None:
+        # The bucket counts, the sums and the counts of the processes add up
+        bucket_counts, total, count = value
+        if label_values not in merged:
+            merged[label_values] = [list(bucket_counts), total, count]
+            return
+
+        series = merged[label_values]
+        series[0] = [merged_count + bucket_count for merged_count, bucket_count in zip(series[0], bucket_counts)]
+        series[1] += total
+        series[2] += count
+
+    def _render_series(self, series: dict) -> list[str]:
+        lines: list[str] = []
+        for label_values, (bucket_counts, total, count) in series.items():
+            cumulative_count: int = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative_count += bucket_count
+                le: str = f'le="{_format_value(upper_bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, label_values, le)} {cumulative_count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, label_values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, label_values)} {count}")
+
+        return lines
+
+
+registry: list[Metric] = []
+
+_snapshot_lock = threading.Lock()
+_snapshot_timer: Optional[threading.Timer] = None
+_snapshot_names: dict[int, str] = {}
+
+
+def _schedule_snapshot() -> None:
+    """
+    Schedule a snapshot of the metrics of the process after a change, at most one per interval.
+    """
+    global _snapshot_timer
+    if METRICS_MULTIPROCESS_DIR is None:
+        return
+
+    with _snapshot_lock:
+        if _snapshot_timer is None:
+            _snapshot_timer = threading.Timer(SNAPSHOT_INTERVAL_IN_SECONDS, write_snapshot)
+            _snapshot_timer.daemon = True
+            _snapshot_timer.start()
+
+
+def write_snapshot() -> None:
+    """
+    Write the snapshot of the metrics of the process to `METRICS_MULTIPROCESS_DIR`, atomically.
+
+    The snapshot of a process is named by its pid and a random suffix, so a worker started with the pid
+    of a stopped one does not replace its snapshot, and the counters of the stopped workers stay counted.
+    """
+    global _snapshot_timer
+    with _snapshot_lock:
+        _snapshot_timer = None
+
+    pid: int = os.getpid()
+    name: str = _snapshot_names.setdefault(pid, f"{pid}_{uuid.uuid4().hex}.json")
+    snapshot: dict = {"time": time.time(), "metrics": {metric.name: metric.snapshot() for metric in registry}}
+
+    os.makedirs(METRICS_MULTIPROCESS_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=METRICS_MULTIPROCESS_DIR, suffix=".tmp", delete=False) as f:
+        json.dump(snapshot, f)
+    os.replace(f.name, os.path.join(METRICS_MULTIPROCESS_DIR, name))
+
+
+def _read_snapshots() -> list[dict]:
+    """
+    Read the snapshots of the processes, from the oldest.
+    """
+    snapshots: list[dict] = []
+    for name in os.listdir(METRICS_MULTIPROCESS_DIR):
+        if not name.endswith(".json"):
+            continue
+
+        try:
+            with open(os.path.join(METRICS_MULTIPROCESS_DIR, name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue    # Removed meanwhile
+
+    return sorted(snapshots, key=lambda snapshot: snapshot["time"])
+
+
+def render_metrics() -> str:
+    """
+    Render all the registered metrics in the Prometheus text exposition format.
+
+    With `METRICS_MULTIPROCESS_DIR` set, the metrics of all the processes writing their snapshots to it,
+    merged: the counters and the histograms summed, the most recent value of the gauges.
+    """
+    if METRICS_MULTIPROCESS_DIR is None:
+        return "\n\n".join(metric.render() for metric in registry) + "\n"
+
+    write_snapshot()
+    snapshots: list[dict] = _read_snapshots()
+
+    rendered_metrics: list[str] = []
+    for metric in registry:
+        merged: dict = {}
+        for snapshot in snapshots:
+            for label_values, value in snapshot["metrics"].get(metric.name, []):
+                metric._merge_series(merged, tuple(label_values), value)
+        rendered_metrics.append(metric.render(merged))
+
+    return "\n\n".join(rendered_metrics) + "\n"
+
+
+# The last changes of a process stopping gracefully, e.g. a gunicorn worker restarted, are kept
+if METRICS_MULTIPROCESS_DIR is not None:
+    atexit.register(write_snapshot)
+
+
+# Scheduler
+scheduler_run_duration_seconds = Histogram(
+    "storage_scheduler_run_duration_seconds", "Duration of a run of the file validation job.")
+scheduler_lag_seconds = Histogram(
+    "storage_scheduler_lag_seconds", "Delay between a file becoming due for validation and its handling.")
+validation_window_misses_total = Counter(
+    "storage_validation_window_misses_total",
+    "Due files that were not proved within one scheduler run after their validate_every window.")
+stored_files = Gauge("storage_stored_files", "Number of files stored on the server.")
+
+# Prover
+proof_phase_duration_seconds = Histogram(
+    "storage_proof_phase_duration_seconds",
+    "Duration of the phases of calculate_sigma_mu_and_prove: query generation and fetch, block reads, "
+    "EC math, proof submission, and the total.",
+    label_names=("phase",))
+proofs_total = Counter("storage_proofs_total", "Proofs computed, by result.", label_names=("result",))
+proof_bytes_read = Histogram(
+    "storage_proof_bytes_read", "Bytes read from disk per proof.", buckets=BYTES_BUCKETS)
+
+# Solana API Gateway
+gateway_request_duration_seconds = Histogram(
+    "storage_gateway_request_duration_seconds", "Round-trip time of the Solana API Gateway requests.",
+    label_names=("endpoint", "status"))
+
+# Uploads and downloads
+transfer_bytes_total = Counter(
+    "storage_transfer_bytes_total", "Bytes uploaded to and downloaded from the server.", label_names=("direction",))
+transfer_duration_seconds = Histogram(
+    "storage_transfer_duration_seconds", "Duration of the uploads and downloads.", label_names=("direction",))
+
+
+def observe_gateway_request(endpoint: str, status_code: Optional[int], elapsed_seconds: float) -> None:
+    """
+    Record a Solana API Gateway request, registered as an observer of `SolanaGatewayClientProvider`.
+
+    :param endpoint: The endpoint of the request.
+    :param status_code: The HTTP status code, None if the request raised an exception.
+    :param elapsed_seconds: The round-trip time of the request.
+    """
+    status: str = str(status_code) if status_code is not None else "error"
+    gateway_request_duration_seconds.observe(elapsed_seconds, endpoint=endpoint, status=status)
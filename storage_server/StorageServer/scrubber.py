@@ -0,0 +1,345 @@
+# Standard library imports
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+# Third-party library imports
+from reedsolo import ReedSolomonError
+
+# Local imports
+from .BLS12_381.helpers import p, MAC_SIZE, MAC_SIZE_3D, bytes_to_curve_field_elements, hash_indices_to_G1, \
+    decompress_g1_from_hex, decompress_g2_from_hex, get_block_size, block_to_sectors, get_sector_generators
+from .BLS12_381.curve_backend import curve
+from .Common.ReedSolomon.reedSolomon import RS_CODEWORD_SIZE, correct_rs_codeword
+from .config import UPLOAD_FOLDER
+from .storage import files_details_dict
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
+
+SCRUB_EVERY_IN_SECONDS: int = 600
+SCRUB_BATCH_BLOCKS: int = 64    # Blocks checked together with a single pair of pairings
+SCRUB_MAX_BYTES_PER_SECOND: int = 4 * 1024 * 1024    # Read budget, keeps the disk available for the prover
+BATCH_COEFFICIENT_BITS: int = 64    # Random coefficients of the batch check, soundness error 2^-64
+
+RECORD_SIZE: int = get_block_size(1) + MAC_SIZE_3D    # up-to 1024-byte data, 128-byte * 3 for 3d point authenticator tag
+
+# Progress metrics of the scrubber, exposed by the /api/scrub_status endpoint
+scrub_metrics = {
+    "passes_completed": 0,
+    "files_scrubbed": 0,
+    "blocks_checked": 0,
+    "bytes_read": 0,
+    "corrupt_blocks_found": 0,
+    "blocks_repaired": 0,
+    "unrepairable_blocks": 0,
+    "current_file": None,
+    "current_file_progress": 0.0,
+    "last_pass_started": None,
+    "last_pass_finished": None,
+    "last_corrupt_blocks": {}
+}
+scrub_metrics_lock = threading.Lock()
+
+
+class IoThrottle:
+    """
+    Token bucket limiting the number of bytes the scrubber reads per second.
+    """
+
+    def __init__(self, max_bytes_per_second: int):
+        self.max_bytes_per_second = max_bytes_per_second
+        self.allowance: float = max_bytes_per_second
+        self.last_check: float = time.monotonic()
+
+    def consume(self, number_of_bytes: int) -> None:
+        """
+        Account for `number_of_bytes` read, sleeping until the budget allows it.
+        """
+        now: float = time.monotonic()
+        self.allowance = min(self.max_bytes_per_second,
+                             self.allowance + (now - self.last_check) * self.max_bytes_per_second)
+        self.last_check = now
+
+        self.allowance -= number_of_bytes
+        if self.allowance < 0:
+            time.sleep(-self.allowance / self.max_bytes_per_second)
+
+
+def _update_metrics(**increments) -> None:
+    """
+    Add the given increments to the counters of `scrub_metrics`.
+    """
+    with scrub_metrics_lock:
+        for metric, increment in increments.items():
+            scrub_metrics[metric] += increment
+
+
+def _set_metrics(**values) -> None:
+    """
+    Set the given values in `scrub_metrics`.
+    """
+    with scrub_metrics_lock:
+        scrub_metrics.update(values)
+
+
+def get_record_size(sectors: int) -> int:
+    """
+    Returns the size of a stored block with its authenticator, for a file of s sectors per block.
+    """
+    return get_block_size(sectors) + MAC_SIZE_3D
+
+
+def are_blocks_authentic(blocks: list[tuple[int, bytes, bytes]], u, g, v, sectors: int = 1) -> bool:
+    """
+    Checks the authenticators of several blocks at once, using the public parameters only.
+
+    Each block satisfies e(σ_i, g) = e(H(i) * Π u_j^(m_ij), v). With random coefficients r_i the whole
+    batch is checked with two pairings: e(Π σ_i^(r_i), g) = e(Π H(i)^(r_i) * Π u_j^(Σ r_i * m_ij), v).
+
+    Args:
+        blocks (list[tuple[int, bytes, bytes]]): The blocks to check, as (block index, data, authenticator bytes).
+        u: The public G1 point u of the file.
+        g: The public G2 point g of the file.
+        v: The public G2 point v = g^x of the file.
+        sectors (int): The number of sectors s per block of the file.
+
+    Returns:
+        bool: True if every block in the batch is authentic, otherwise False.
+    """
+    try:
+        # The σ_i normalized with a single field inversion
+        σ_i_values: list = bytes_to_curve_field_elements([authenticator for _, _, authenticator in blocks], MAC_SIZE)
+    except ValueError:
+        return False    # A damaged authenticator may not be a curve point
+
+    H_i_values: list = hash_indices_to_G1(block_index for block_index, _, _ in blocks)
+    r_i_values: list[int] = []
+    μ_j_values: list[int] = [0] * sectors
+
+    for _, data, _ in blocks:
+        r_i: int = secrets.randbits(BATCH_COEFFICIENT_BITS) | 1
+        r_i_values.append(r_i)
+
+        for j, m_ij in enumerate(block_to_sectors(data, sectors, p)):
+            μ_j_values[j] = (μ_j_values[j] + r_i * m_ij) % p
+
+    σ = curve.multiexp_g1(σ_i_values, r_i_values)  # Π σ_i^(r_i)
+    Π_H_i = curve.multiexp_g1(H_i_values, r_i_values)  # Π H(i)^(r_i)
+    Π_u_j = curve.multiply_g1(u, μ_j_values[0]) if sectors == 1 else \
+        curve.multiexp_g1(get_sector_generators(u, sectors), μ_j_values)  # Π u_j^(μ_j)
+
+    # e(σ, g) == e(Π(H(i)^(r_i)) * Π(u_j^(μ_j)), v)
+    return curve.pairings_equal(σ, g, curve.add_g1(Π_H_i, Π_u_j), v)
+
+
+def find_corrupt_blocks(blocks: list[tuple[int, bytes, bytes]], u, g, v, sectors: int = 1) -> list[int]:
+    """
+    Finds the corrupt blocks of a batch by bisecting the batches that fail the batch check.
+
+    Args:
+        blocks (list[tuple[int, bytes, bytes]]): The blocks to check, as (block index, data, authenticator bytes).
+        u, g, v: The public parameters of the file.
+        sectors (int): The number of sectors s per block of the file.
+
+    Returns:
+        list[int]: The indices of the corrupt blocks.
+    """
+    if are_blocks_authentic(blocks, u, g, v, sectors):
+        return []
+
+    if len(blocks) == 1:
+        return [blocks[0][0]]
+
+    middle: int = len(blocks) // 2
+    return find_corrupt_blocks(blocks[:middle], u, g, v, sectors) + find_corrupt_blocks(blocks[middle:], u, g, v, sectors)
+
+
+def _data_offset_to_file_offset(data_offset: int, sectors: int = 1) -> int:
+    """
+    Map an offset of the data stream (the file without the authenticators) to its offset in the stored file.
+    """
+    block_size: int = get_block_size(sectors)
+    return (data_offset // block_size) * get_record_size(sectors) + data_offset % block_size
+
+
+def _read_data_stream(f, data_offset: int, length: int, sectors: int = 1) -> bytes:
+    """
+    Read `length` bytes of the data stream, skipping the authenticators between the blocks.
+    """
+    block_size: int = get_block_size(sectors)
+    data: bytearray = bytearray()
+    while length > 0:
+        f.seek(_data_offset_to_file_offset(data_offset, sectors))
+        chunk: bytes = f.read(min(length, block_size - data_offset % block_size))
+        if not chunk:
+            break
+
+        data += chunk
+        data_offset += len(chunk)
+        length -= len(chunk)
+
+    return bytes(data)
+
+
+def repair_block(f, block_index: int, data_stream_size: int, authenticator: bytes, u, g, v, sectors: int = 1) -> bool:
+    """
+    Repairs a corrupt block of a copy of a stored file with the Reed-Solomon codewords that overlap it.
+
+    The data is restored whenever its codewords can be decoded. The authenticators themselves can
+    not be restored, the storage server does not hold the private key x, so a block whose
+    authenticator is damaged stays unrepairable.
+
+    Args:
+        f: The copy of the stored file, opened in "r+b" mode.
+        block_index (int): The index of the corrupt block.
+        data_stream_size (int): The size of the file without the authenticators.
+        authenticator (bytes): The stored authenticator of the block.
+        u, g, v: The public parameters of the file.
+        sectors (int): The number of sectors s per block of the file.
+
+    Returns:
+        bool: True if the block matches its authenticator after the repair, otherwise False.
+    """
+    block_start: int = block_index * get_block_size(sectors)
+    block_end: int = min(block_start + get_block_size(sectors), data_stream_size)
+
+    # The codewords that overlap the block
+    codewords_start: int = (block_start // RS_CODEWORD_SIZE) * RS_CODEWORD_SIZE
+    codewords_end: int = min(-(-block_end // RS_CODEWORD_SIZE) * RS_CODEWORD_SIZE, data_stream_size)
+
+    codewords: bytes = _read_data_stream(f, codewords_start, codewords_end - codewords_start, sectors)
+
+    try:
+        corrected_codewords: bytes = b"".join(
+            correct_rs_codeword(codewords[offset:offset + RS_CODEWORD_SIZE])
+            for offset in range(0, len(codewords), RS_CODEWORD_SIZE)
+        )
+    except ReedSolomonError:
+        return False
+
+    corrected_block: bytes = corrected_codewords[block_start - codewords_start:block_end - codewords_start]
+    stored_block: bytes = codewords[block_start - codewords_start:block_end - codewords_start]
+
+    # Restore the data the codewords decoded to, even when the authenticator itself is damaged
+    if corrected_block != stored_block:
+        f.seek(_data_offset_to_file_offset(block_start, sectors))
+        f.write(corrected_block)
+
+    return are_blocks_authentic([(block_index, corrected_block, authenticator)], u, g, v, sectors)
+
+
+def scrub_file(filename: str, file_details: dict, throttle: IoThrottle) -> list[int]:
+    """
+    Checks every block of a stored file against its authenticator and repairs the corrupt blocks.
+
+    The stored objects are shared by the files with the same content, the corrupt blocks are repaired
+    in a copy of the content, stored by `rewrite_file`.
+
+    Args:
+        filename (str): The name of the stored file.
+        file_details (dict): The details of the file, holding the compressed public parameters u, g and v,
+            and its number of sectors per block.
+        throttle (IoThrottle): The read budget shared by the scrubbing pass.
+
+    Returns:
+        list[int]: The indices of the corrupt blocks that could not be repaired.
+    """
+    backend, key = files_details_dict.get_file_object(filename, UPLOAD_FOLDER)
+    file_path: Optional[str] = backend.local_path(key)
+    if file_path is None:
+        return []   # Only the files stored on local volumes are scrubbed, under the read budget of their disks
+
+    u = decompress_g1_from_hex(file_details["u"])
+    g = decompress_g2_from_hex(file_details["g"])
+    v = decompress_g2_from_hex(file_details["v"])
+    sectors: int = file_details.get("sectors", 1)
+    record_size: int = get_record_size(sectors)
+
+    file_size: int = os.path.getsize(file_path)
+    number_of_blocks: int = -(-file_size // record_size)
+    data_stream_size: int = file_size - number_of_blocks * MAC_SIZE_3D
+
+    # The authenticators of the corrupt blocks, by block index
+    corrupt_blocks_authenticators: dict[int, bytes] = {}
+
+    with open(file_path, "rb") as f:
+        for first_block_index in range(0, number_of_blocks, SCRUB_BATCH_BLOCKS):
+            f.seek(first_block_index * record_size)
+            batch_data: bytes = f.read(SCRUB_BATCH_BLOCKS * record_size)
+            throttle.consume(len(batch_data))
+
+            blocks: list[tuple[int, bytes, bytes]] = []
+            for offset in range(0, len(batch_data), record_size):
+                full_block: bytes = batch_data[offset:offset + record_size]
+                blocks.append((first_block_index + offset // record_size, full_block[:-MAC_SIZE_3D], full_block[-MAC_SIZE_3D:]))
+
+            corrupt_blocks: list[int] = find_corrupt_blocks(blocks, u, g, v, sectors)
+            authenticators: dict[int, bytes] = {block_index: authenticator for block_index, _, authenticator in blocks}
+            corrupt_blocks_authenticators.update((block_index, authenticators[block_index]) for block_index in corrupt_blocks)
+
+            _update_metrics(blocks_checked=len(blocks),
+                            bytes_read=len(batch_data),
+                            corrupt_blocks_found=len(corrupt_blocks))
+            _set_metrics(current_file_progress=min(first_block_index + SCRUB_BATCH_BLOCKS, number_of_blocks) / number_of_blocks)
+
+    if not corrupt_blocks_authenticators:
+        return []
+
+    def repair_blocks(copy_path: str) -> list[int]:
+        unrepairable_blocks: list[int] = []
+        with open(copy_path, "r+b") as copy:
+            for block_index, authenticator in corrupt_blocks_authenticators.items():
+                if not repair_block(copy, block_index, data_stream_size, authenticator, u, g, v, sectors):
+                    unrepairable_blocks.append(block_index)
+
+        return unrepairable_blocks
+
+    unrepairable_blocks: list[int] = files_details_dict.rewrite_file(filename, repair_blocks)
+    _update_metrics(blocks_repaired=len(corrupt_blocks_authenticators) - len(unrepairable_blocks),
+                    unrepairable_blocks=len(unrepairable_blocks))
+
+    return unrepairable_blocks
+
+
+def scrub_files() -> None:
+    """
+    Runs one scrubbing pass over all the stored files whose public parameters are known.
+    """
+    logger.info("Starting scrubbing pass")
+    _set_metrics(last_pass_started=datetime.now().isoformat())
+
+    throttle: IoThrottle = IoThrottle(SCRUB_MAX_BYTES_PER_SECOND)
+    last_corrupt_blocks: dict[str, list[int]] = {}
+
+    # Create a copy of the files details dictionary for safe iteration
+    files_details_dict_copy = files_details_dict.copy()
+
+    for filename, file_details in files_details_dict_copy.items():
+        if not all(file_details.get(param) for param in ("u", "g", "v")):
+            continue    # Public parameters unknown, the file can not be checked
+
+        _set_metrics(current_file=filename, current_file_progress=0.0)
+
+        try:
+            unrepairable_blocks: list[int] = scrub_file(filename, file_details, throttle)
+        except Exception:
+            logger.exception("Exception occurred while scrubbing file %s", filename)
+            continue
+
+        if unrepairable_blocks:
+            logger.warning("File %s has %d unrepairable blocks", filename, len(unrepairable_blocks))
+            last_corrupt_blocks[filename] = unrepairable_blocks
+
+        _update_metrics(files_scrubbed=1)
+
+    _set_metrics(current_file=None,
+                 current_file_progress=0.0,
+                 last_pass_finished=datetime.now().isoformat(),
+                 last_corrupt_blocks=last_corrupt_blocks)
+    _update_metrics(passes_completed=1)
+    logger.info("Scrubbing pass complete")
@@ -1,26 +1,874 @@
 # Standard library imports
+import hashlib
+import json
 import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, Optional
 
+# Local imports
+from .backends import StorageBackend, LocalBackend, get_backend
+from .config import METADATA_DB_PATH, UPLOAD_FOLDER, STORAGE_VOLUMES
 
-files_details_dict = {}
+
+# SQLite waits up to this long for a lock held by another process before failing
+METADATA_DB_TIMEOUT_IN_SECONDS: float = 30.0
+
+# The stored contents are objects named by their SHA-256, under objects/<first 2 hex digits>/ of a storage volume
+OBJECTS_FOLDER_NAME: str = "objects"
+HASH_CHUNK_SIZE: int = 1024 * 1024
+
+# New objects are placed on volumes with at least this free space, if any
+VOLUME_MIN_FREE_BYTES: int = int(os.environ.get("VOLUME_MIN_FREE_BYTES", 1024 ** 3))
+
+
+def _encode_details(file_details: dict) -> str:
+    """
+    Serialize the details of a file to JSON, datetimes as tagged ISO 8601 strings.
+    """
+    return json.dumps({key: {"__datetime__": value.isoformat()} if isinstance(value, datetime) else value
+                       for key, value in file_details.items()})
+
+
+def _decode_details(encoded_details: str) -> dict:
+    """
+    Deserialize the details of a file serialized by `_encode_details`.
+    """
+    return {key: datetime.fromisoformat(value["__datetime__"]) if isinstance(value, dict) and "__datetime__" in value else value
+            for key, value in json.loads(encoded_details).items()}
+
+
+def _object_key(content_hash: str) -> str:
+    """
+    Return the key of the object of a content on its volume.
+    """
+    return f"{OBJECTS_FOLDER_NAME}/{content_hash[:2]}/{content_hash}"
+
+
+def _indexed_columns(file_details: dict) -> tuple[Optional[str], Optional[float]]:
+    """
+    Return the details of a file the listing filters on: its escrow and when its next validation is due, as a
+    timestamp, None if it is never due.
+    """
+    last_verify = file_details.get("last_verify")
+    validate_every = file_details.get("validate_every")
+
+    due_at: Optional[float] = None
+    if isinstance(last_verify, datetime) and validate_every is not None:
+        due_at = (last_verify + timedelta(seconds=validate_every)).timestamp()
+
+    return file_details.get("escrow_public_key"), due_at
+
+
+class FilesDetailsStore(MutableMapping):
+    """
+    The details of the stored files, by filename, persisted in SQLite.
+
+    The store behaves as the dict it replaces, but its values are snapshots: changing a returned
+    details dict does not change the store, use `update_file_details` or assign the whole details.
+    The API workers and the scheduler process share the store through the database file, each
+    thread has its own connection and writes are atomic.
+
+    The contents of the files are deduplicated: a content is stored once, as an object named by its
+    hash, whatever the number of files referencing it. `add_file`, `append_to_file` and `remove_file`
+    keep the reference count of the objects, an object is deleted with its last file, unless an
+    upload of the same content reserved it meanwhile.
+
+    The objects are spread over several storage volumes, the store indexes the volume of each
+    object. `choose_volume` places a new object on the least loaded volume with enough free space.
+    A volume is a local directory or an S3 bucket, see `get_backend`.
+
+    Every change of a file, including its removal, increments the version of the store and is
+    stamped with it, so `list_files` returns the changes since a version seen by a client.
+    """
+
+    def __init__(self, db_path: str, volumes: list[str]):
+        self.db_path = db_path
+        self.volumes = volumes
+        self._local = threading.local()
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=METADATA_DB_TIMEOUT_IN_SECONDS, isolation_level=None)
+            # Write-ahead logging lets the readers of other processes read while a writer writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS files_details (filename TEXT PRIMARY KEY, details TEXT NOT NULL)")
+            # The version of the store, and the removed files by the version of their removal
+            connection.execute("CREATE TABLE IF NOT EXISTS store_version (id INTEGER PRIMARY KEY CHECK (id = 0), "
+                               "version INTEGER NOT NULL)")
+            connection.execute("INSERT OR IGNORE INTO store_version (id, version) VALUES (0, 0)")
+            connection.execute("CREATE TABLE IF NOT EXISTS removed_files (filename TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            self._add_listing_columns(connection)
+            connection.execute("CREATE TABLE IF NOT EXISTS objects (content_hash TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                               "references_count INTEGER NOT NULL, volume TEXT)")
+            # Objects stored before the volumes have no volume column, they are on the first volume
+            if "volume" not in [column[1] for column in connection.execute("PRAGMA table_info(objects)")]:
+                connection.execute("ALTER TABLE objects ADD COLUMN volume TEXT")
+            # The files referencing an object, see `has_object_of_owner`
+            connection.execute("CREATE INDEX IF NOT EXISTS files_details_content_hash "
+                               "ON files_details (json_extract(details, '$.content_hash'))")
+            # The objects being put on a volume, not indexed yet, see `_reserve_object`
+            connection.execute("CREATE TABLE IF NOT EXISTS object_reservations (content_hash TEXT NOT NULL, "
+                               "volume TEXT NOT NULL, reservations_count INTEGER NOT NULL, PRIMARY KEY (content_hash, volume))")
+            self._local.connection = connection
+
+        return connection
+
+    @staticmethod
+    def _add_listing_columns(connection: sqlite3.Connection) -> None:
+        """
+        Add the columns the listing filters on and the versions of the files, filled from the details of the files
+        stored before them.
+        """
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if "version" not in [column[1] for column in connection.execute("PRAGMA table_info(files_details)")]:
+                connection.execute("ALTER TABLE files_details ADD COLUMN escrow_public_key TEXT")
+                connection.execute("ALTER TABLE files_details ADD COLUMN due_at REAL")
+                connection.execute("ALTER TABLE files_details ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                for filename, details in connection.execute("SELECT filename, details FROM files_details").fetchall():
+                    connection.execute("UPDATE files_details SET escrow_public_key = ?, due_at = ? WHERE filename = ?",
+                                       (*_indexed_columns(_decode_details(details)), filename))
+
+            connection.execute("CREATE INDEX IF NOT EXISTS files_details_escrow ON files_details (escrow_public_key)")
+            connection.execute("CREATE INDEX IF NOT EXISTS files_details_due_at ON files_details (due_at)")
+            connection.execute("CREATE INDEX IF NOT EXISTS files_details_version ON files_details (version)")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _next_version(connection: sqlite3.Connection) -> int:
+        """
+        Increment the version of the store, within the write transaction of a change.
+        """
+        connection.execute("UPDATE store_version SET version = version + 1 WHERE id = 0")
+        return connection.execute("SELECT version FROM store_version WHERE id = 0").fetchone()[0]
+
+    def _write_details(self, connection: sqlite3.Connection, filename: str, file_details: dict) -> None:
+        """
+        Insert or replace the details of a file, within a write transaction.
+        """
+        connection.execute("INSERT INTO files_details (filename, details, escrow_public_key, due_at, version) "
+                           "VALUES (?, ?, ?, ?, ?) ON CONFLICT (filename) DO UPDATE SET details = excluded.details, "
+                           "escrow_public_key = excluded.escrow_public_key, due_at = excluded.due_at, version = excluded.version",
+                           (filename, _encode_details(file_details), *_indexed_columns(file_details),
+                            self._next_version(connection)))
+        connection.execute("DELETE FROM removed_files WHERE filename = ?", (filename,))
+
+    def _delete_details(self, connection: sqlite3.Connection, filename: str) -> bool:
+        """
+        Delete the details of a file, within a write transaction, its removal is kept for the incremental listings.
+
+        Returns:
+            bool: False if the file is not in the store.
+        """
+        if connection.execute("DELETE FROM files_details WHERE filename = ?", (filename,)).rowcount == 0:
+            return False
+
+        connection.execute("INSERT OR REPLACE INTO removed_files (filename, version) VALUES (?, ?)",
+                           (filename, self._next_version(connection)))
+        return True
+
+    def __getitem__(self, filename: str) -> dict:
+        row = self._connection.execute("SELECT details FROM files_details WHERE filename = ?", (filename,)).fetchone()
+        if row is None:
+            raise KeyError(filename)
+
+        return _decode_details(row[0])
+
+    def __setitem__(self, filename: str, file_details: dict) -> None:
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_details(connection, filename, file_details)
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        connection.execute("COMMIT")
+
+    def __delitem__(self, filename: str) -> None:
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            is_deleted: bool = self._delete_details(connection, filename)
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        connection.execute("COMMIT")
+        if not is_deleted:
+            raise KeyError(filename)
+
+    def __contains__(self, filename: object) -> bool:
+        return self._connection.execute("SELECT 1 FROM files_details WHERE filename = ?", (filename,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self._connection.execute("SELECT filename FROM files_details ORDER BY rowid")])
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM files_details").fetchone()[0]
+
+    def copy(self) -> dict:
+        """
+        Return a snapshot of the store as a dict, read in a single query.
+        """
+        return {filename: _decode_details(details)
+                for filename, details in self._connection.execute("SELECT filename, details FROM files_details ORDER BY rowid")}
+
+    def items(self):
+        return self.copy().items()
+
+    def update_file_details(self, filename: str, **fields) -> bool:
+        """
+        Update some details of a file atomically, e.g. its last verification time.
+
+        Args:
+            filename (str): The name of the file.
+            **fields: The details to update.
+
+        Returns:
+            bool: False if the file is not in the store, e.g. deleted meanwhile by another process.
+        """
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT details FROM files_details WHERE filename = ?", (filename,)).fetchone()
+            if row is not None:
+                self._write_details(connection, filename, {**_decode_details(row[0]), **fields})
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        connection.execute("COMMIT")
+        return row is not None
+
+    def version(self) -> int:
+        """
+        Return the version of the store, incremented by every change of a file.
+        """
+        return self._connection.execute("SELECT version FROM store_version WHERE id = 0").fetchone()[0]
+
+    def count_overdue_files(self, now: Optional[float] = None) -> int:
+        """
+        Return the number of files whose validation is due, it changes with the time without a new version.
+        """
+        return self._connection.execute("SELECT COUNT(*) FROM files_details WHERE due_at < ?",
+                                        (time.time() if now is None else now,)).fetchone()[0]
+
+    def list_files(self, after: Optional[str] = None, limit: Optional[int] = None, escrow_public_key: Optional[str] = None,
+                   is_overdue: Optional[bool] = None, since: Optional[int] = None) -> dict:
+        """
+        List a page of the files, by filename, read from a single snapshot of the store.
+
+        Args:
+            after (str, optional): List the files after this filename, the last one of the previous page.
+            limit (int, optional): The maximal number of files in the page, all of them by default.
+            escrow_public_key (str, optional): List only the files of this escrow.
+            is_overdue (bool, optional): List only the files whose validation is due, or only those not due.
+            since (int, optional): List only the files changed after this version of the store, and the files
+                removed after it.
+
+        Returns:
+            dict: The `files` as (id, filename, details) tuples, the `removed_files` names if `since` is given
+                (in the first page), the filename to list the next page `after`, None for the last page, and the `version` of the
+                snapshot, the `since` of the next incremental listing.
+        """
+        conditions: list[str] = []
+        parameters: list = []
+        if after is not None:
+            conditions.append("filename > ?")
+            parameters.append(after)
+        if escrow_public_key is not None:
+            conditions.append("escrow_public_key = ?")
+            parameters.append(escrow_public_key)
+        if is_overdue is not None:
+            conditions.append("due_at < ?" if is_overdue else "(due_at IS NULL OR due_at >= ?)")
+            parameters.append(time.time())
+        if since is not None:
+            conditions.append("version > ?")
+            parameters.append(since)
+
+        query: str = "SELECT rowid, filename, details FROM files_details"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY filename"
+        if limit is not None:
+            # One more file tells whether there is a next page
+            query += " LIMIT ?"
+            parameters.append(limit + 1)
+
+        connection = self._connection
+        # A read transaction, the version and the files are read from the same snapshot
+        connection.execute("BEGIN")
+        try:
+            version: int = connection.execute("SELECT version FROM store_version WHERE id = 0").fetchone()[0]
+            rows: list = connection.execute(query, parameters).fetchall()
+
+            # The removals are listed with the first page
+            removed_files: Optional[list[str]] = None
+            if since is not None and after is None:
+                removed_files = [row[0] for row in connection.execute(
+                    "SELECT filename FROM removed_files WHERE version > ? ORDER BY filename", (since,))]
+        finally:
+            connection.execute("COMMIT")
+
+        next_after: Optional[str] = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_after = rows[-1][1]
+
+        return {
+            "files": [(row_id, filename, _decode_details(details)) for row_id, filename, details in rows],
+            "removed_files": removed_files,
+            "next_after": next_after,
+            "version": version
+        }
+
+    def get_object(self, content_hash: str) -> tuple[StorageBackend, str]:
+        """
+        Return the backend of the volume indexed for the object of a content, and the key of the object.
+        """
+        row = self._connection.execute("SELECT volume FROM objects WHERE content_hash = ?", (content_hash,)).fetchone()
+        volume: str = row[0] if row is not None and row[0] is not None else self.volumes[0]
+
+        return get_backend(volume), _object_key(content_hash)
+
+    def _object_volume(self, content_hash: str) -> Optional[str]:
+        """
+        Return the volume indexed for the object of a content, None if it is not stored.
+        """
+        row = self._connection.execute("SELECT volume FROM objects WHERE content_hash = ?", (content_hash,)).fetchone()
+        if row is None:
+            return None
+
+        return row[0] if row[0] is not None else self.volumes[0]
+
+    def _release_object(self, connection: sqlite3.Connection, content_hash: str) -> Optional[str]:
+        """
+        Drop a reference to the object of a content, within a write transaction.
+
+        Returns:
+            str: The volume of the object if this was its last reference, the object is to be deleted with
+                `_delete_object_unless_referenced` once the transaction commits, otherwise None.
+        """
+        volume: Optional[str] = self._object_volume(content_hash)
+        connection.execute("UPDATE objects SET references_count = references_count - 1 WHERE content_hash = ?",
+                           (content_hash,))
+        if connection.execute("DELETE FROM objects WHERE content_hash = ? AND references_count <= 0",
+                              (content_hash,)).rowcount == 1:
+            return volume
+
+        return None
+
+    def _reserve_object(self, content_hash: str, volume: str) -> None:
+        """
+        Reserve the object of a content on a volume, out of any transaction, before putting it.
+
+        The objects are put outside of the write transactions, so a slow upload to an object storage
+        does not hold the write lock of the database that every process shares. Until the transaction
+        indexing the object releases its reservation, the removal of the last file of the same content
+        does not delete the object put meanwhile.
+        """
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("INSERT INTO object_reservations (content_hash, volume, reservations_count) VALUES (?, ?, 1) "
+                               "ON CONFLICT (content_hash, volume) DO UPDATE SET reservations_count = reservations_count + 1",
+                               (content_hash, volume))
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _release_reservation(connection: sqlite3.Connection, content_hash: str, volume: str) -> None:
+        """
+        Release a reservation of `_reserve_object`, within a write transaction.
+        """
+        connection.execute("UPDATE object_reservations SET reservations_count = reservations_count - 1 "
+                           "WHERE content_hash = ? AND volume = ?", (content_hash, volume))
+        connection.execute("DELETE FROM object_reservations WHERE content_hash = ? AND volume = ? AND reservations_count <= 0",
+                           (content_hash, volume))
+
+    def _delete_object_unless_referenced(self, content_hash: str, volume: str, is_reserved: bool = False) -> None:
+        """
+        Delete the object of a content from a volume, unless the store indexes it on this volume or an
+        upload reserved it there, e.g. an upload of the same content meanwhile.
+
+        An object is deleted once the transaction that dropped its last reference committed, or when the
+        transaction that was to index it rolled back. The object is deleted within a write transaction,
+        so no upload reserves it between the check and the deletion: an upload reserving it afterwards
+        puts it again.
+
+        Args:
+            content_hash (str): The SHA-256 of the content, in hex.
+            volume (str): The volume of the object.
+            is_reserved (bool): Whether the caller reserved the object, its reservation is released.
+        """
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if is_reserved:
+                self._release_reservation(connection, content_hash, volume)
+
+            is_referenced: bool = self._object_volume(content_hash) == volume or connection.execute(
+                "SELECT 1 FROM object_reservations WHERE content_hash = ? AND volume = ?",
+                (content_hash, volume)).fetchone() is not None
+            if not is_referenced:
+                get_backend(volume).delete(_object_key(content_hash))
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        connection.execute("COMMIT")
+
+    def volumes_usage(self) -> list[dict]:
+        """
+        Return the usage of each volume: its objects, their bytes, and the free space of the volume.
+        """
+        stored = {volume: (objects, stored_bytes) for volume, objects, stored_bytes in self._connection.execute(
+            "SELECT COALESCE(volume, ?), COUNT(*), SUM(size) FROM objects GROUP BY COALESCE(volume, ?)",
+            (self.volumes[0], self.volumes[0]))}
+
+        return [{
+            "volume": volume,
+            "objects": stored.get(volume, (0, 0))[0],
+            "stored_bytes": stored.get(volume, (0, 0))[1],
+            "free_bytes": get_backend(volume).free_bytes()     # None if unlimited
+        } for volume in self.volumes]
+
+    def choose_volume(self) -> str:
+        """
+        Choose the volume of a new object.
+
+        Among the volumes with at least `VOLUME_MIN_FREE_BYTES` free, the one with the fewest stored
+        bytes, so the proofs, which read the stored files periodically, spread their reads over the
+        disks. Ties go to the volume with the most free space. If every volume is below the minimum,
+        the one with the most free space. The S3 volumes have unlimited free space.
+        """
+        usage: list[dict] = self.volumes_usage()
+        for volume_usage in usage:
+            if volume_usage["free_bytes"] is None:
+                volume_usage["free_bytes"] = float("inf")
+
+        candidates: list[dict] = [volume_usage for volume_usage in usage if volume_usage["free_bytes"] >= VOLUME_MIN_FREE_BYTES]
+        if not candidates:
+            return max(usage, key=lambda volume_usage: volume_usage["free_bytes"])["volume"]
+
+        return min(candidates, key=lambda volume_usage: (volume_usage["stored_bytes"], -volume_usage["free_bytes"]))["volume"]
+
+    def has_object(self, content_hash: str) -> bool:
+        """
+        Return whether a content is already stored, an upload of it can be skipped.
+        """
+        return self._connection.execute("SELECT 1 FROM objects WHERE content_hash = ?", (content_hash,)).fetchone() is not None
+
+    def has_object_of_owner(self, content_hash: str, v: Optional[str]) -> bool:
+        """
+        Return whether a content is stored for a file of the owner of a public key, a new file of this owner
+        can reference it without uploading it. The content of the files of the other owners is not
+        disclosed to whoever knows its hash.
+
+        Args:
+            content_hash (str): The SHA-256 of the content, in hex.
+            v (str): The compressed public key v of the owner, the content was tagged with its private key.
+        """
+        return v is not None and self._connection.execute(
+            "SELECT 1 FROM files_details WHERE json_extract(details, '$.content_hash') = ? AND json_extract(details, '$.v') = ?",
+            (content_hash, v)).fetchone() is not None
+
+    def add_file(self, filename: str, file_details: dict, content_hash: str, staged_path: Optional[str] = None,
+                 volume: Optional[str] = None) -> bool:
+        """
+        Add a file, referencing the object of its content.
+
+        If the content is already stored, the staged copy is discarded and the object gets one more
+        reference. Otherwise, the staged copy becomes the object. The staged copy is discarded if
+        the file can not be added.
+
+        Args:
+            filename (str): The name of the file, its lookup key.
+            file_details (dict): The details of the file, its content hash is added to them.
+            content_hash (str): The SHA-256 of the content, in hex.
+            staged_path (str, optional): A copy of the content, staged by `save_file` for the volume.
+                Without it, the content must already be stored.
+            volume (str, optional): The volume of the staged copy, by default the first volume.
+
+        Returns:
+            bool: True if the content was already stored.
+
+        Raises:
+            FileExistsError: If a file with this name exists.
+            FileNotFoundError: If the content is not stored and no staged copy is given.
+        """
+        volume = volume or self.volumes[0]
+        connection = self._connection
+        is_put: bool = False
+        while True:
+            # The staged copy is stored before the transaction, under the key of its content, so storing it
+            # again is harmless
+            if staged_path is not None and not is_put and not self.has_object(content_hash):
+                size: int = os.path.getsize(staged_path)
+                self._reserve_object(content_hash, volume)
+                try:
+                    get_backend(volume).put(_object_key(content_hash), staged_path)
+                except Exception:
+                    self._delete_object_unless_referenced(content_hash, volume, is_reserved=True)
+                    if os.path.exists(staged_path):
+                        os.remove(staged_path)
+                    raise
+                is_put = True
+
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if connection.execute("SELECT 1 FROM files_details WHERE filename = ?", (filename,)).fetchone() is not None:
+                    raise FileExistsError(filename)
+
+                is_deduplicated: bool = connection.execute(
+                    "UPDATE objects SET references_count = references_count + 1 WHERE content_hash = ?",
+                    (content_hash,)).rowcount == 1
+
+                if not is_deduplicated:
+                    if staged_path is None:
+                        raise FileNotFoundError(f"Content {content_hash} is not stored.")
+
+                    if not is_put:
+                        # The object was deleted since it was found stored, store the staged copy
+                        connection.execute("ROLLBACK")
+                        continue
+
+                    connection.execute("INSERT INTO objects (content_hash, size, references_count, volume) "
+                                       "VALUES (?, ?, 1, ?)", (content_hash, size, volume))
+
+                # The object is referenced, or indexed on another volume
+                if is_put:
+                    self._release_reservation(connection, content_hash, volume)
+
+                self._write_details(connection, filename, {**file_details, "content_hash": content_hash})
+            except Exception:
+                connection.execute("ROLLBACK")
+                if is_put:
+                    self._delete_object_unless_referenced(content_hash, volume, is_reserved=True)
+                elif staged_path is not None and os.path.exists(staged_path):
+                    os.remove(staged_path)
+                raise
+
+            connection.execute("COMMIT")
+            break
+
+        # The content was stored meanwhile, on another volume the copy stored is not indexed
+        if is_deduplicated and is_put:
+            self._delete_object_unless_referenced(content_hash, volume)
+        elif is_deduplicated and staged_path is not None:
+            os.remove(staged_path)
+
+        return is_deduplicated
+
+    def remove_file(self, filename: str) -> Optional[dict]:
+        """
+        Remove a file, and the object of its content if no other file references it.
+
+        Args:
+            filename (str): The name of the file.
+
+        Returns:
+            dict: The details of the removed file, None if there is no such file.
+        """
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT details FROM files_details WHERE filename = ?", (filename,)).fetchone()
+            if row is None:
+                connection.execute("ROLLBACK")
+                return None
+
+            file_details: dict = _decode_details(row[0])
+            self._delete_details(connection, filename)
+
+            content_hash: Optional[str] = file_details.get("content_hash")
+            released_volume: Optional[str] = self._release_object(connection, content_hash) \
+                if content_hash is not None else None
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        connection.execute("COMMIT")
+
+        # The object is deleted once its last reference is dropped for good
+        if released_volume is not None:
+            self._delete_object_unless_referenced(content_hash, released_volume)
+
+        return file_details
+
+    def append_to_file(self, filename: str, content_hash: Optional[str], offset: int, delta_path: str,
+                       volume: Optional[str] = None, **fields) -> str:
+        """
+        Replace the content of a file from an offset with a delta, e.g. appended blocks.
+
+        The objects are shared by the files with the same content, so the content of the file up to
+        the offset and the delta are written to a new object, and the file references it instead of
+        its previous object. The delta is discarded in any case.
+
+        Args:
+            filename (str): The name of the file.
+            content_hash (str): The SHA-256 of the content the delta applies to, in hex, None for a
+                file stored before the deduplication.
+            offset (int): The offset of the delta in the content, at most its size.
+            delta_path (str): The delta, staged by `save_file`.
+            volume (str, optional): The volume of the new object, by default the first volume.
+            **fields: The details of the file to update with its content.
+
+        Returns:
+            str: The SHA-256 of the new content, in hex.
+
+        Raises:
+            KeyError: If the file is not in the store.
+            ValueError: If the content of the file is not the content the delta applies to, e.g. after
+                another change meanwhile.
+        """
+        volume = volume or self.volumes[0]
+        staging_folder: str = get_backend(volume).staging_folder()
+        os.makedirs(staging_folder, exist_ok=True)
+
+        backend, key = self.get_file_object(filename)
+        new_content_hash = hashlib.sha256()
+        staged_file = tempfile.NamedTemporaryFile(dir=staging_folder, delete=False)
+        try:
+            with staged_file, open(delta_path, "rb") as delta_file:
+                # The content up to the offset, read by ranges as the object may be on object storage
+                for chunk_offset in range(0, offset, HASH_CHUNK_SIZE):
+                    chunk: bytes = backend.read_range(key, chunk_offset, min(HASH_CHUNK_SIZE, offset - chunk_offset))
+                    if len(chunk) < min(HASH_CHUNK_SIZE, offset - chunk_offset):
+                        raise ValueError(f"The content of {filename} is shorter than the offset {offset}")
+
+                    new_content_hash.update(chunk)
+                    staged_file.write(chunk)
+
+                while chunk := delta_file.read(HASH_CHUNK_SIZE):
+                    new_content_hash.update(chunk)
+                    staged_file.write(chunk)
+        except Exception:
+            os.remove(staged_file.name)
+            raise
+        finally:
+            os.remove(delta_path)
+
+        stored_content_hash: str = new_content_hash.hexdigest()
+        self._replace_content(filename, content_hash, staged_file.name, stored_content_hash, volume, fields)
+        return stored_content_hash
+
+    def rewrite_file(self, filename: str, rewrite: Callable[[str], Any]) -> Any:
+        """
+        Rewrite the content of a file, e.g. to corrupt it or to repair it, without changing the other files.
+
+        The objects are shared by the files with the same content and are named by their content, so
+        they are never changed in place: the content is copied, rewritten, and stored as a new object
+        the file references instead of its previous object. If the rewritten content is the content
+        the object is named by, e.g. repaired after a disk fault, the object itself is replaced.
+
+        Args:
+            filename (str): The name of the file.
+            rewrite (Callable[[str], Any]): Rewrites in place the copy of the content at the given path.
+
+        Returns:
+            Any: The result of `rewrite`.
+
+        Raises:
+            KeyError: If the file is not in the store.
+            ValueError: If the content of the file changed while it was rewritten.
+        """
+        file_details: Optional[dict] = self.get(filename)
+        if file_details is None:
+            raise KeyError(filename)
+
+        content_hash: Optional[str] = file_details.get("content_hash")
+        volume: str = (self._object_volume(content_hash) if content_hash is not None else None) or self.volumes[0]
+        staging_folder: str = get_backend(volume).staging_folder()
+        os.makedirs(staging_folder, exist_ok=True)
+
+        backend, key = self.get_file_object(filename)
+        staged_file = tempfile.NamedTemporaryFile(dir=staging_folder, delete=False)
+        try:
+            with staged_file:
+                for chunk in backend.iter_chunks(key, HASH_CHUNK_SIZE):
+                    staged_file.write(chunk)
+
+            result: Any = rewrite(staged_file.name)
+
+            new_content_hash = hashlib.sha256()
+            with open(staged_file.name, "rb") as f:
+                while chunk := f.read(HASH_CHUNK_SIZE):
+                    new_content_hash.update(chunk)
+        except Exception:
+            os.remove(staged_file.name)
+            raise
+
+        stored_content_hash: str = new_content_hash.hexdigest()
+        if stored_content_hash != content_hash:
+            self._replace_content(filename, content_hash, staged_file.name, stored_content_hash, volume, {})
+            return result
+
+        # The object is restored, for all the files referencing it
+        self._reserve_object(content_hash, volume)
+        try:
+            get_backend(volume).put(_object_key(content_hash), staged_file.name)
+        finally:
+            # Deleted if the last file referencing it was removed meanwhile
+            self._delete_object_unless_referenced(content_hash, volume, is_reserved=True)
+            if os.path.exists(staged_file.name):
+                os.remove(staged_file.name)
+
+        return result
+
+    def _replace_content(self, filename: str, content_hash: Optional[str], staged_path: str, stored_content_hash: str,
+                         volume: str, fields: dict) -> None:
+        """
+        Store a staged content as the new content of a file, the file references its object instead of its
+        previous one. The staged content is consumed in any case.
+
+        Args:
+            filename (str): The name of the file.
+            content_hash (str): The SHA-256 of the previous content, in hex, None for a file stored before the
+                deduplication.
+            staged_path (str): The new content, staged for the volume.
+            stored_content_hash (str): The SHA-256 of the new content, in hex.
+            volume (str): The volume of the new object.
+            fields (dict): The details of the file to update with its content.
+
+        Raises:
+            KeyError: If the file is not in the store.
+            ValueError: If the content of the file is not the previous content, e.g. after another change meanwhile.
+        """
+        backend, key = self.get_file_object(filename)
+        connection = self._connection
+        is_put: bool = False
+        while True:
+            # The new content is stored before the transaction, as the uploads in `add_file`
+            if not is_put and not self.has_object(stored_content_hash):
+                size: int = os.path.getsize(staged_path)
+                self._reserve_object(stored_content_hash, volume)
+                try:
+                    get_backend(volume).put(_object_key(stored_content_hash), staged_path)
+                except Exception:
+                    self._delete_object_unless_referenced(stored_content_hash, volume, is_reserved=True)
+                    if os.path.exists(staged_path):
+                        os.remove(staged_path)
+                    raise
+                is_put = True
+
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT details FROM files_details WHERE filename = ?", (filename,)).fetchone()
+                if row is None:
+                    raise KeyError(filename)
+
+                file_details: dict = _decode_details(row[0])
+                if file_details.get("content_hash") != content_hash:
+                    raise ValueError(f"The content of {filename} changed meanwhile")
+
+                is_deduplicated: bool = connection.execute(
+                    "UPDATE objects SET references_count = references_count + 1 WHERE content_hash = ?",
+                    (stored_content_hash,)).rowcount == 1
+                if not is_deduplicated:
+                    if not is_put:
+                        # The object was deleted since it was found stored, store the new content
+                        connection.execute("ROLLBACK")
+                        continue
+
+                    connection.execute("INSERT INTO objects (content_hash, size, references_count, volume) "
+                                       "VALUES (?, ?, 1, ?)", (stored_content_hash, size, volume))
+
+                if is_put:
+                    self._release_reservation(connection, stored_content_hash, volume)
+
+                self._write_details(connection, filename, {**file_details, **fields, "content_hash": stored_content_hash})
+
+                # The previous object loses the reference of the file
+                released_volume: Optional[str] = self._release_object(connection, content_hash) \
+                    if content_hash is not None else None
+            except Exception:
+                connection.execute("ROLLBACK")
+                if is_put:
+                    self._delete_object_unless_referenced(stored_content_hash, volume, is_reserved=True)
+                elif os.path.exists(staged_path):
+                    os.remove(staged_path)
+                raise
+
+            connection.execute("COMMIT")
+            break
+
+        if is_deduplicated and is_put:
+            self._delete_object_unless_referenced(stored_content_hash, volume)
+        elif is_deduplicated:
+            os.remove(staged_path)
+
+        # The previous content is deleted once the file references the new one for good, a file stored under
+        # its name is replaced
+        if content_hash is None:
+            backend.delete(key)
+        elif released_volume is not None:
+            self._delete_object_unless_referenced(content_hash, released_volume)
+
+    def get_file_object(self, filename: str, upload_folder: str = UPLOAD_FOLDER) -> tuple[StorageBackend, str]:
+        """
+        Return the backend and the key of the content of a file, on the volume indexed for its object.
+
+        Files without a content hash, stored before the deduplication, are stored under their name.
+
+        Args:
+            filename (str): The name of the file.
+            upload_folder (str): The folder of the files stored under their name.
+
+        Returns:
+            tuple[StorageBackend, str]: The backend of the volume of the content and its key.
+        """
+        file_details: Optional[dict] = self.get(filename)
+        if file_details is not None and file_details.get("content_hash"):
+            return self.get_object(file_details["content_hash"])
+
+        return LocalBackend(upload_folder), filename
+
+
+files_details_dict = FilesDetailsStore(METADATA_DB_PATH, STORAGE_VOLUMES)
 
 
 # Function to save uploaded files to the specified directory
-def save_file(file, upload_folder):
-    # Ensure the directory exists
-    if not os.path.exists(upload_folder):
-        os.makedirs(upload_folder)
+def save_file(file, staging_folder) -> tuple[str, str]:
+    """
+    Writes an uploaded file to a staging folder, hashing it on the way.
+
+    The staged copy is added to the store with `FilesDetailsStore.add_file`, which stores it as the
+    object of its content on a volume, or discards it if the content is already stored.
 
-    file_path = os.path.join(upload_folder, file.filename)
+    Args:
+        file (FileStorage): The uploaded file.
+        staging_folder (str): The staging folder of the volume, `StorageBackend.staging_folder`.
 
-    # Check if the file already exists
-    if os.path.exists(file_path):
-        print("FileExistsError")
-        raise FileExistsError(f"File '{file.filename}' already exists in the directory.")
+    Returns:
+        tuple[str, str]: The path of the staged copy and the SHA-256 of the content, in hex.
+    """
+    os.makedirs(staging_folder, exist_ok=True)
 
+    content_hash = hashlib.sha256()
+    staged_file = tempfile.NamedTemporaryFile(dir=staging_folder, delete=False)
     try:
-        file.save(file_path)
+        with staged_file:
+            while chunk := file.stream.read(HASH_CHUNK_SIZE):
+                content_hash.update(chunk)
+                staged_file.write(chunk)
     except Exception as e:
+        os.remove(staged_file.name)
         raise Exception(f"Failed to save file: {str(e)}")
 
-    return file_path
+    return staged_file.name, content_hash.hexdigest()
@@ -0,0 +1,226 @@
+# Standard library imports
+import atexit
+import contextvars
+import cProfile
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Third-party library imports
+import requests
+
+# Local imports
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+# Tracing is off unless enabled, then this fraction of the traces is recorded, decided at their root span
+TRACING_ENABLED: bool = os.environ.get("TRACING_ENABLED", "0") == "1"
+TRACE_SAMPLE_RATE: float = float(os.environ.get("TRACE_SAMPLE_RATE", 1.0))
+
+# Spans are appended as JSON lines to this file, rotated past its size limit, or posted to the collector when
+# its URL is set
+TRACE_EXPORT_PATH: str = os.environ.get("TRACE_EXPORT_PATH", "traces.jsonl")
+TRACE_EXPORT_MAX_BYTES: int = int(os.environ.get("TRACE_EXPORT_MAX_BYTES", 10 * 1024 * 1024))
+TRACE_EXPORT_BACKUP_COUNT: int = int(os.environ.get("TRACE_EXPORT_BACKUP_COUNT", 3))
+TRACE_COLLECTOR_URL: Optional[str] = os.environ.get("TRACE_COLLECTOR_URL")
+
+# The traces waiting for export, beyond this the new traces are dropped
+TRACE_QUEUE_SIZE: int = 1000
+
+# Proofs slower than the threshold are profiled, the profile is saved in the profiles directory
+SLOW_PROOF_THRESHOLD_IN_SECONDS: float = float(os.environ.get("SLOW_PROOF_THRESHOLD_IN_SECONDS", 10))
+PROFILE_SLOW_PROOFS: bool = os.environ.get("PROFILE_SLOW_PROOFS", "0") == "1"
+PROFILES_DIRECTORY: str = os.environ.get("PROFILES_DIRECTORY", "profiles")
+
+
+class JsonLinesExporter:
+    """
+    Appends each finished span as a JSON line to a local file, rotated as the log files of a
+    `RotatingFileHandler`: past `max_bytes` the file is renamed to `<path>.1`, the previous ones shifted
+    up to `<path>.<backup_count>`.
+    """
+
+    def __init__(self, path: str, max_bytes: int = TRACE_EXPORT_MAX_BYTES, backup_count: int = TRACE_EXPORT_BACKUP_COUNT):
+        self.path = path
+        self._handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                             delay=True)
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def export(self, spans: list[dict]) -> None:
+        for span in spans:
+            self._handler.handle(logging.makeLogRecord({"msg": json.dumps(span, default=str)}))
+
+
+class CollectorExporter:
+    """
+    Posts the finished spans as JSON to a collector, e.g. an OTLP/HTTP collector stand-in.
+
+    Export failures are reported and dropped, tracing must never fail a proof.
+    """
+
+    def __init__(self, url: str, timeout_in_seconds: float = 2.0):
+        self.url = url
+        self.timeout_in_seconds = timeout_in_seconds
+
+    def export(self, spans: list[dict]) -> None:
+        try:
+            requests.post(self.url, json={"spans": spans}, timeout=self.timeout_in_seconds)
+        except requests.RequestException as e:
+            logger.warning("Failed to export %d spans to %s: %s", len(spans), self.url, e)
+
+
+class BackgroundExporter:
+    """
+    Exports the traces from a background thread, so a slow collector or disk does not delay the proofs.
+
+    The queue is bounded, the traces are dropped while it is full, e.g. while the collector is down,
+    with a warning when it fills up. The queued traces are exported when the server exits.
+    """
+
+    def __init__(self, exporter, queue_size: int = TRACE_QUEUE_SIZE):
+        self.exporter = exporter
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._is_dropping: bool = False
+
+    def export(self, spans: list[dict]) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+        try:
+            self._queue.put_nowait(spans)
+            self._is_dropping = False
+        except queue.Full:
+            if not self._is_dropping:
+                logger.warning("The trace export queue is full, the traces are dropped until it drains")
+            self._is_dropping = True
+
+    def _run(self) -> None:
+        while (spans := self._queue.get()) is not None:
+            try:
+                self.exporter.export(spans)
+            except Exception:
+                logger.exception("Failed to export %d spans", len(spans))
+
+    def stop(self, timeout_in_seconds: float = 5.0) -> None:
+        """
+        Export the queued traces and stop the thread.
+        """
+        try:
+            self._queue.put(None, timeout=timeout_in_seconds)
+        except queue.Full:
+            return  # The collector is not keeping up, the queued traces are dropped
+
+        self._thread.join(timeout_in_seconds)
+
+
+exporter = BackgroundExporter(CollectorExporter(TRACE_COLLECTOR_URL) if TRACE_COLLECTOR_URL
+                              else JsonLinesExporter(TRACE_EXPORT_PATH))
+
+# The innermost open span of the current thread (or task)
+_current_span: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[dict]:
+    """
+    Trace the `with` block as a span, nested in the currently open span if any.
+
+    The span is a dict with the trace id, span id, parent span id, name, start time, duration in
+    seconds, status and attributes. Attributes can be added to the yielded span inside the block.
+    The spans of a trace are exported together when its root span ends, so a trace is never
+    exported partially. With `TRACING_ENABLED` unset, or for the traces left out by
+    `TRACE_SAMPLE_RATE`, the spans are still yielded but not exported.
+
+    Args:
+        name (str): The name of the span.
+        **attributes: Initial attributes of the span.
+
+    Yields:
+        dict: The span.
+    """
+    parent: Optional[dict] = _current_span.get()
+    current: dict = {
+        "trace_id": parent["trace_id"] if parent else secrets.token_hex(16),
+        "span_id": secrets.token_hex(8),
+        "parent_id": parent["span_id"] if parent else None,
+        "name": name,
+        "start_time": time.time(),
+        "duration_in_seconds": None,
+        "status": "ok",
+        "attributes": dict(attributes),
+        # The spans of the trace, None if the trace is not recorded
+        "_finished_spans": parent["_finished_spans"] if parent else
+        [] if TRACING_ENABLED and random.random() < TRACE_SAMPLE_RATE else None
+    }
+
+    token = _current_span.set(current)
+    start: float = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current["status"] = "error"
+        current["attributes"]["exception"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current["duration_in_seconds"] = time.perf_counter() - start
+        _current_span.reset(token)
+
+        finished_spans: Optional[list[dict]] = current.pop("_finished_spans")
+        if finished_spans is not None:
+            finished_spans.append(current)
+            if parent is None:
+                exporter.export(finished_spans)
+
+
+@contextmanager
+def profile_if_slow(name: str, threshold_in_seconds: float = SLOW_PROOF_THRESHOLD_IN_SECONDS) -> Iterator[None]:
+    """
+    Profile the `with` block with cProfile and keep the profile only if the block is slow.
+
+    Whether the block is slow is only known once it ends, so the whole block is profiled and the
+    profile is dropped when the block ends within the threshold. Profiling is enabled with
+    `PROFILE_SLOW_PROOFS=1`, as it slows down the pure Python EC math. The path of a saved profile,
+    readable with `pstats` or `snakeviz`, is added to the current span.
+
+    Args:
+        name (str): Name of the profiled block, used in the profile file name.
+        threshold_in_seconds (float): Duration above which the profile is saved.
+    """
+    if not PROFILE_SLOW_PROOFS:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    start: float = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed: float = time.perf_counter() - start
+
+        if elapsed > threshold_in_seconds:
+            os.makedirs(PROFILES_DIRECTORY, exist_ok=True)
+            profile_path: str = os.path.join(PROFILES_DIRECTORY, f"{name}-{int(time.time())}-{secrets.token_hex(4)}.prof")
+            profiler.dump_stats(profile_path)
+            logger.warning("%s took %.2f seconds, profile saved at %s", name, elapsed, profile_path)
+
+            current: Optional[dict] = _current_span.get()
+            if current is not None:
+                current["attributes"]["profile_path"] = profile_path
@@ -0,0 +1,26 @@
+# Standard library imports
+import os
+import shutil
+import tempfile
+
+
+# Gunicorn configuration of the production API server: gunicorn -c gunicorn.conf.py wsgi:app
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+# Uploads and downloads are I/O bound, each worker process serves several of them with threads
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 * (os.cpu_count() or 1) + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("THREADS", 4))
+
+# Each worker keeps its own metrics, /metrics answers with the metrics of all the workers merged from the
+# snapshots they write to this directory (see StorageServer/metrics.py). The workers inherit it from the master.
+os.environ.setdefault("METRICS_MULTIPROCESS_DIR", os.path.join(tempfile.gettempdir(), "storage_server_metrics"))
+
+# Large uploads and the on-demand proofs of /api/calculate_and_prove take longer than the default 30 seconds
+timeout = int(os.environ.get("TIMEOUT", 300))
+graceful_timeout = 30
+
+
+def on_starting(server):
+    # The snapshots of a previous run are discarded, the counters restart from zero as with a single process
+    shutil.rmtree(os.environ["METRICS_MULTIPROCESS_DIR"], ignore_errors=True)
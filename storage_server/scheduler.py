@@ -0,0 +1,73 @@
+# Standard library imports
+import argparse
+import json
+import os
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Third-party library imports
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+# Local imports
+from StorageServer import start_scheduler, end_subscriptions
+from StorageServer.logger import get_logger
+from StorageServer.metrics import render_metrics
+from StorageServer.scrubber import scrub_metrics, scrub_metrics_lock
+
+
+# The scheduler process serves its own metrics, the API workers do not run the jobs
+METRICS_PORT: int = int(os.environ.get("SCHEDULER_METRICS_PORT", 8001))
+
+logger = get_logger("StorageServer.scheduler")
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the metrics of the scheduler process: /metrics and /api/scrub_status, as the API does.
+    """
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = render_metrics().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/api/scrub_status":
+            with scrub_metrics_lock:
+                body, content_type = json.dumps(dict(scrub_metrics)).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def stop_on_sigterm(signum, frame):
+    # Raised in the main thread, stops the blocking scheduler and runs the exit handlers, the subscriptions of the
+    # stored files are kept for the next scheduler process
+    raise SystemExit(0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the validation and scrubbing jobs of the storage server")
+    parser.add_argument("--end-subscriptions", action="store_true",
+                        help="End the subscriptions of the stored files and exit, when the server is decommissioned")
+    args = parser.parse_args()
+
+    if args.end_subscriptions:
+        end_subscriptions()
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+
+    metrics_server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), MetricsRequestHandler)
+    threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+    logger.info("Serving the scheduler metrics on port %s", METRICS_PORT)
+
+    # Runs the validation and scrubbing jobs until the process is stopped
+    start_scheduler(BlockingScheduler())
@@ -0,0 +1,41 @@
+# Standard library imports
+import os
+import shutil
+import sys
+import tempfile
+
+# The storage and its database are created in a temporary directory when the StorageServer modules are imported
+STORAGE_ROOT: str = tempfile.mkdtemp(prefix="storage_server_tests_")
+os.environ["UPLOAD_FOLDER"] = os.path.join(STORAGE_ROOT, "StorageDirectory")
+os.environ["METADATA_DB_PATH"] = os.path.join(STORAGE_ROOT, "metadata.db")
+os.environ["VOLUME_MIN_FREE_BYTES"] = "0"
+os.environ.pop("STORAGE_VOLUMES", None)
+os.environ.pop("METRICS_MULTIPROCESS_DIR", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Third-party library imports
+import pytest
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(STORAGE_ROOT, ignore_errors=True)
+
+
+@pytest.fixture
+def client():
+    from StorageServer import create_app
+
+    return create_app(run_scheduler=False).test_client()
+
+
+@pytest.fixture
+def store(tmp_path):
+    """
+    A store of its own, in an empty database and volume.
+    """
+    from StorageServer.storage import FilesDetailsStore
+
+    volume = str(tmp_path / "volume")
+    os.makedirs(volume)
+    return FilesDetailsStore(str(tmp_path / "metadata.db"), [volume])
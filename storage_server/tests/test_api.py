@@ -0,0 +1,81 @@
+# Standard library imports
+import hashlib
+import io
+from datetime import datetime
+
+# Local imports
+from StorageServer import api
+from StorageServer.storage import files_details_dict
+
+
+def add_files(count: int, tmp_path):
+    for i in range(count):
+        staged_path = tmp_path / f"staged-{i}"
+        staged_path.write_bytes(b"file %d" % i)
+        files_details_dict.add_file(f"file-{i:03}", {"escrow_public_key": "escrow", "validate_every": 3600,
+                                                      "last_verify": datetime.now(), "sectors": 1},
+                                    f"{i:064x}", str(staged_path))
+
+
+def test_get_files_etag_is_distinct_for_each_page(client, tmp_path):
+    add_files(3, tmp_path)
+
+    first_page = client.get("/api/get_files?limit=2")
+    assert first_page.status_code == 200
+    etag = first_page.headers["ETag"]
+
+    # The same page is not modified
+    assert client.get("/api/get_files?limit=2", headers={"If-None-Match": etag}).status_code == 304
+
+    # The next page and other filters are listed
+    next_cursor = first_page.json["data"]["nextCursor"]
+    second_page = client.get(f"/api/get_files?limit=2&cursor={next_cursor}", headers={"If-None-Match": etag})
+    assert second_page.status_code == 200
+    assert [file["file_name"] for file in second_page.json["data"]["storageFiles"]] == ["file-002"]
+
+    for query in ("limit=3", "limit=2&escrow_public_key=other", "limit=2&overdue=true", "limit=2&since=0"):
+        assert client.get(f"/api/get_files?{query}", headers={"If-None-Match": etag}).status_code == 200
+
+
+class GatewayClient:
+    """
+    The escrows of two owners, with the public keys v of their own.
+    """
+
+    ESCROWS: dict[str, dict] = {
+        "escrow-a": {"validate_every": 3600, "u": "u", "g": "g", "v": "owner-a"},
+        "escrow-a2": {"validate_every": 3600, "u": "u", "g": "g", "v": "owner-a"},
+        "escrow-b": {"validate_every": 3600, "u": "u", "g": "g", "v": "owner-b"}
+    }
+
+    def get_escrow_data(self, escrow_public_key: str):
+        class Response:
+            status_code = 200
+
+            @staticmethod
+            def json():
+                return self.ESCROWS[escrow_public_key]
+
+        return Response()
+
+
+def test_hash_only_upload_requires_a_file_of_the_same_owner(client, monkeypatch):
+    monkeypatch.setattr(api, "SolanaGatewayClientProvider", GatewayClient)
+    content = b"content of owner a"
+    content_hash = hashlib.sha256(content).hexdigest()
+
+    response = client.post("/api/upload", data={"file": (io.BytesIO(content), "owner-a.bin"),
+                                                 "escrow_public_key": "escrow-a"})
+    assert response.status_code == 200
+
+    # Another owner knowing the hash does not get the file
+    response = client.post("/api/upload", json={"filename": "owner-b.bin", "content_hash": content_hash,
+                                                 "escrow_public_key": "escrow-b"})
+    assert response.status_code == 404
+    assert "owner-b.bin" not in files_details_dict
+
+    # The same owner, under another escrow, skips the upload
+    response = client.post("/api/upload", json={"filename": "owner-a2.bin", "content_hash": content_hash,
+                                                 "escrow_public_key": "escrow-a2"})
+    assert response.status_code == 200
+    assert files_details_dict["owner-a2.bin"]["content_hash"] == content_hash
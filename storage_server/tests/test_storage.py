@@ -0,0 +1,97 @@
+# Standard library imports
+import hashlib
+import os
+
+# Local imports
+from StorageServer import storage
+from StorageServer.backends import get_backend
+
+
+CONTENT: bytes = b"the same content"
+CONTENT_HASH: str = hashlib.sha256(CONTENT).hexdigest()
+
+
+def stage(store, name: str) -> str:
+    staging_folder = get_backend(store.volumes[0]).staging_folder()
+    os.makedirs(staging_folder, exist_ok=True)
+    staged_path = os.path.join(staging_folder, name)
+    with open(staged_path, "wb") as staged_file:
+        staged_file.write(CONTENT)
+
+    return staged_path
+
+
+def overwrite_first_byte(path: str, first_byte: bytes) -> str:
+    with open(path, "r+b") as f:
+        f.write(first_byte)
+
+    return first_byte.decode()
+
+
+def test_upload_keeps_its_object_when_a_delete_interleaves(store, monkeypatch):
+    """
+    Two uploads of the same content put its object, the first one is added and deleted while the second
+    one is between its put and its transaction: the object stays for the second one.
+    """
+    put = get_backend(store.volumes[0]).put
+    interleaved: list[str] = []
+
+    class InterleavingBackend:
+        def __getattr__(self, name):
+            return getattr(get_backend(store.volumes[0]), name)
+
+        def put(self, key: str, staged_path: str) -> None:
+            put(key, staged_path)
+            if not interleaved:
+                interleaved.append(key)
+                # The first upload, then its deletion, run between the put and the transaction of the second one
+                store.add_file("first", {}, CONTENT_HASH, stage(store, "first"))
+                store.remove_file("first")
+
+    monkeypatch.setattr(storage, "get_backend", lambda volume: InterleavingBackend())
+
+    assert not store.add_file("second", {}, CONTENT_HASH, stage(store, "second"))
+    assert interleaved
+
+    backend, key = store.get_file_object("second")
+    assert backend.read_range(key, 0, len(CONTENT) + 1) == CONTENT
+    assert store._connection.execute("SELECT references_count FROM objects").fetchall() == [(1,)]
+    assert store._connection.execute("SELECT COUNT(*) FROM object_reservations").fetchone()[0] == 0
+
+    # The object is deleted with its last file
+    store.remove_file("second")
+    assert not os.path.exists(backend.local_path(key))
+
+
+def test_rewrite_file_does_not_change_the_other_files(store):
+    store.add_file("first", {}, CONTENT_HASH, stage(store, "first"))
+    store.add_file("second", {}, CONTENT_HASH, stage(store, "second"))
+
+    assert store.rewrite_file("first", lambda path: overwrite_first_byte(path, b"T")) == "T"
+
+    backend, key = store.get_file_object("first")
+    assert backend.read_range(key, 0, len(CONTENT)) == b"T" + CONTENT[1:]
+    assert store["first"]["content_hash"] == hashlib.sha256(b"T" + CONTENT[1:]).hexdigest()
+
+    backend, key = store.get_file_object("second")
+    assert backend.read_range(key, 0, len(CONTENT)) == CONTENT
+    assert store["second"]["content_hash"] == CONTENT_HASH
+
+    # Restored, the file references the shared object again, and its corrupted copy is deleted
+    corrupted_path = backend.local_path(store.get_file_object("first")[1])
+    store.rewrite_file("first", lambda path: overwrite_first_byte(path, CONTENT[:1]))
+    assert store["first"]["content_hash"] == CONTENT_HASH
+    assert not os.path.exists(corrupted_path)
+    assert store._connection.execute("SELECT content_hash, references_count FROM objects").fetchall() == [(CONTENT_HASH, 2)]
+
+
+def test_rewrite_file_restores_the_object_named_by_its_content(store):
+    store.add_file("first", {}, CONTENT_HASH, stage(store, "first"))
+    backend, key = store.get_file_object("first")
+
+    # A disk fault
+    overwrite_first_byte(backend.local_path(key), b"T")
+
+    store.rewrite_file("first", lambda path: overwrite_first_byte(path, CONTENT[:1]))
+    assert backend.read_range(key, 0, len(CONTENT) + 1) == CONTENT
+    assert store._connection.execute("SELECT COUNT(*) FROM object_reservations").fetchone()[0] == 0
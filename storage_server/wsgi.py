@@ -0,0 +1,6 @@
+# Local imports
+from StorageServer import create_app
+
+
+# The API app of the production server, the jobs run in the scheduler process (see scheduler.py)
+app = create_app(run_scheduler=False)
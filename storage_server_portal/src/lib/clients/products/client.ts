@@ -13,6 +13,8 @@ const errorMessageMap: Record<number, string> = {
   500: 'Something went wrong, please try again later',
 };
 
+const getFilesPageSize: number = 1000;
+
 export interface GetProductDetailsParams {
   url: string;
 }
@@ -25,18 +27,26 @@ export interface PublishProductsParams {
 class StorageFilesClient {
   async GetStorageFiles(): Promise<{ data?: any[] | null; error?: ErrorStatus }> {
     const getFilesEndoint: string = 'api/get_files';
-    const response = await getRequest<ResultWithData<GetStorageFilesResponseDto>>(getFilesEndoint);
+    const storageFiles: StorageFile[] = [];
 
-    if (response.statusCode >= 400 && response.statusCode < 600) {
-      return {
-        error: {
-          statusCode: response.statusCode,
-          message: errorMessageMap[response.statusCode] ?? errorMessageMap[0],
-        },
-      };
-    }
+    // The files are listed a page at a time, follow the cursors up to the last page
+    let cursor: string | null = null;
+    do {
+      const query: string = cursor ? `limit=${getFilesPageSize}&cursor=${encodeURIComponent(cursor)}` : `limit=${getFilesPageSize}`;
+      const response = await getRequest<ResultWithData<GetStorageFilesResponseDto>>(getFilesEndoint, query);
+
+      if (response.statusCode >= 400 && response.statusCode < 600) {
+        return {
+          error: {
+            statusCode: response.statusCode,
+            message: errorMessageMap[response.statusCode] ?? errorMessageMap[0],
+          },
+        };
+      }
 
-    const storageFiles: StorageFile[] = response.result.data.storageFiles;
+      storageFiles.push(...response.result.data.storageFiles);
+      cursor = response.result.data.nextCursor;
+    } while (cursor);
 
     return {
       data: storageFiles,
@@ -2,4 +2,7 @@ import { StorageFile } from '@/types/storage-files/storage-file';
 
 export interface GetStorageFilesResponseDto {
   storageFiles: StorageFile[];
+  nextCursor: string | null;
+  version: number;
+  removedFiles?: string[];
 }